@@ -0,0 +1,34 @@
+"""add_message_history_index
+
+Revision ID: 61fa666325f5
+Revises: 95bd48e8edb1
+Create Date: 2026-10-19 10:12:31.408215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '61fa666325f5'
+down_revision: Union[str, Sequence[str], None] = '95bd48e8edb1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination of channel history; the (channel) index is a prefix of it.
+    # Built concurrently so writes to messages aren't blocked on large tables.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_messages_channel_timestamp_id', 'messages', ['channel', 'timestamp', 'id'], unique=False, postgresql_concurrently=True)
+        op.drop_index(op.f('ix_messages_channel'), table_name='messages', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_messages_channel'), 'messages', ['channel'], unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_messages_channel_timestamp_id', table_name='messages', postgresql_concurrently=True)
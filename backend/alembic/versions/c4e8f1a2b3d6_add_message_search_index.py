@@ -0,0 +1,33 @@
+"""add_message_search_index
+
+Revision ID: c4e8f1a2b3d6
+Revises: b7c1d2e3f4a5
+Create Date: 2026-10-19 12:20:05.640913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8f1a2b3d6'
+down_revision: Union[str, Sequence[str], None] = 'b7c1d2e3f4a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # GIN index on the tsvector expression used by message search (no stored
+    # column, so the table isn't rewritten). Built concurrently so writes to
+    # messages aren't blocked on large tables.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_messages_content_fts', 'messages', [sa.text("to_tsvector('english'::regconfig, content)")], unique=False, postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_messages_content_fts', table_name='messages', postgresql_concurrently=True)
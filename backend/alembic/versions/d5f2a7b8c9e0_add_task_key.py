@@ -0,0 +1,30 @@
+"""add_task_key
+
+Revision ID: d5f2a7b8c9e0
+Revises: c4e8f1a2b3d6
+Create Date: 2026-10-19 16:40:12.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f2a7b8c9e0'
+down_revision: Union[str, Sequence[str], None] = 'c4e8f1a2b3d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tasks', sa.Column('key', sa.String(), nullable=True))
+    op.create_index('ix_tasks_kind_key', 'tasks', ['kind', 'key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_kind_key', table_name='tasks')
+    op.drop_column('tasks', 'key')
@@ -4,7 +4,7 @@ from sqlalchemy.future import select
 from sqlalchemy import desc
 from database import get_db
 from models import Activity, ActivityType
-from api.messages import sio
+from api.socket_instance import emit_to_user
 import json
 
 router = APIRouter(prefix="/activity", tags=["activity"])
@@ -65,13 +65,13 @@ async def log_activity(
     await db.refresh(activity)
     
     # Emit real-time activity event
-    await sio.emit("new_activity", {
+    await emit_to_user("new_activity", {
         "id": activity.id,
         "user_id": user_id,
         "type": activity_type.value,
         "description": description,
         "extra_data": extra_data or {},
         "created_at": activity.created_at.isoformat()
-    })
+    }, user_id)
     
     return activity
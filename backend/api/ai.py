@@ -1,12 +1,13 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import os
+from .providers import gemini_api_key
 
 # import elevenlabs  # Mocking for now as per minimal requirements or use requests
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_API_KEY = gemini_api_key()
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 
 class CodeReviewRequest(BaseModel):
@@ -19,8 +20,41 @@ class AudioRequest(BaseModel):
 
 @router.post("/review/generate")
 async def generate_code_review(request: CodeReviewRequest):
-    from .ai_utils import analyze_diff
-    return await analyze_diff(request.diff, request.pr_title)
+    from .ai_utils import review_diff
+    return await review_diff(request.diff, request.pr_title)
+
+@router.get("/metrics")
+async def get_ai_metrics():
+    from .ai_utils import llm_flight, file_poller
+    from .template_cache import template_cache
+    from .media_transcode import transcode_stats
+    from .circuit_breaker import breakers
+    from .llm_usage import usage_tracker
+    from .ai_chat import reply_scheduler
+    from . import task_queue
+    from .socket_instance import sio
+    return {
+        "single_flight": llm_flight.stats(),
+        "project_templates": template_cache.stats(),
+        "media_files": file_poller.stats(),
+        "media_transcode": transcode_stats.to_dict(),
+        "circuit_breakers": breakers.stats(),
+        "llm_usage": usage_tracker.stats(),
+        "reply_scheduler": reply_scheduler.stats(),
+        "task_worker": task_queue.task_worker.stats() if task_queue.task_worker else None,
+        "socketio": sio.stats()
+    }
+
+@router.get("/usage")
+async def get_llm_usage(user_id: int = None):
+    """Token/cost rollup for one user, or for every user seen so far."""
+    from .llm_usage import usage_tracker
+    return usage_tracker.user_rollup(user_id)
+
+@router.get("/usage/recent")
+async def get_recent_llm_calls(limit: int = 50):
+    from .llm_usage import usage_tracker
+    return list(usage_tracker.recent)[-limit:][::-1]
 
 @router.post("/audio/generate")
 async def generate_audio(request: AudioRequest):
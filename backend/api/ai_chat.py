@@ -1,22 +1,23 @@
 import os
 import random
 import asyncio
-from google import genai
-from sqlalchemy.future import select
+import uuid
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from models import User, Message
 from database import AsyncSessionLocal
-from .socket_instance import sio
-from .ai_utils import process_pr_link
+from .socket_instance import emit_to_channel
+from .ai_utils import process_pr_link, stream_text
+from .reply_scheduler import ReplyScheduler
+from .task_queue import enqueue, task_handler
+from .providers import gemini_api_key
 from datetime import datetime
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_API_KEY = gemini_api_key()
 
 MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
 
-client = None
-if GEMINI_API_KEY:
-    client = genai.Client(api_key=GEMINI_API_KEY, http_options={'api_version': 'v1beta'})
-
 
 AI_TEAMMATES = [
     {"name": "Sarah", "role": "HR Manager", "style": "Friendly, welcoming, helpful, emojis", "github_id": "ai_sarah", "avatar_url": "https://api.dicebear.com/7.x/avataaars/svg?seed=Sarah"},
@@ -36,175 +37,244 @@ CONVERSATION_STARTERS = [
     "Just say hello and wish them a productive day."
 ]
 
-async def get_or_create_ai_user(db, teammate):
-    # Lookup by username since github_id is removed
-    stmt = select(User).where(User.username == teammate["name"])
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
-    
-    if not user:
-        # Create AI user if not exists
-        user = User(
-            username=teammate["name"],
-            avatar_url=teammate["avatar_url"],
-            # No github_id or access_token needed for AI in new schema
-            xp=1000,
-            level=10,
-            hashed_password="AI_BOT_NO_LOGIN" # Placeholder
+class TeammateIdentity(NamedTuple):
+    id: int
+    username: str
+    avatar_url: str
+
+# name -> TeammateIdentity, resolved once at startup (read-only afterwards)
+teammate_identities: Mapping[str, TeammateIdentity] = MappingProxyType({})
+_identities_lock = asyncio.Lock()
+
+async def load_teammate_identities() -> Mapping[str, TeammateIdentity]:
+    """
+    Upserts the AI_TEAMMATES users in one statement and caches their ids and
+    avatars. ON CONFLICT makes concurrent startups (several workers) safe.
+    """
+    global teammate_identities
+    rows = [
+        {"username": t["name"], "avatar_url": t["avatar_url"], "xp": 1000, "level": 10, "hashed_password": "AI_BOT_NO_LOGIN"}
+        for t in AI_TEAMMATES
+    ]
+    stmt = pg_insert(User).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.username],
+        set_={"avatar_url": stmt.excluded.avatar_url}
+    ).returning(User.id, User.username, User.avatar_url)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(stmt)
+        identities = {row.username: TeammateIdentity(row.id, row.username, row.avatar_url) for row in result}
+        await db.commit()
+    teammate_identities = MappingProxyType(identities)
+    return teammate_identities
+
+async def teammate_identity(teammate: dict) -> TeammateIdentity:
+    """Cached identity of an AI teammate (loads the roster once if startup couldn't)."""
+    identity = teammate_identities.get(teammate["name"])
+    if identity is None:
+        async with _identities_lock:
+            if teammate["name"] not in teammate_identities:
+                await load_teammate_identities()
+        identity = teammate_identities[teammate["name"]]
+    return identity
+
+CHANNEL_CONTEXT = {
+    "general": "You are hanging out in the #general channel. Keep it casual, fun, and broad. Answer in a general way.",
+    "dev": "You are in the #dev channel. Be weirdly specific, technical, and use software engineering jargon. Assume everyone knows how to code.",
+    "code-review": "You are in the #code-review channel. Be picky, ask critical questions, or ask for code reviews. Act like a senior engineer reviewing a junior's PR.",
+    "random": "You are in the #random channel. Ignore work topics. Tell jokes, share random facts, or talk about conspiracy theories. Be funny and weird."
+}
+
+def find_pr_links(messages: list) -> list:
+    """GitHub PR links in a batch of messages, in order, without duplicates."""
+    links = []
+    for message in messages:
+        for word in message["content"].split():
+            if "github.com" in word and "/pull/" in word and word not in links:
+                links.append(word)
+    return links
+
+async def post_bot_message(channel: str, user: TeammateIdentity, content: str, stream_id: str = None) -> dict:
+    """Persists a teammate's message and emits it to the channel (closing its stream, if any)."""
+    async with AsyncSessionLocal() as db:
+        msg = Message(
+            channel=channel,
+            content=content,
+            is_bot=True,
+            sender_id=user.id
         )
-        db.add(user)
+        db.add(msg)
         await db.commit()
-        await db.refresh(user)
-        
-    return user
+        await db.refresh(msg)
+
+    data = {
+        "id": msg.id,
+        "channel": msg.channel,
+        "content": msg.content,
+        "sender_id": user.id,
+        "is_bot": True,
+        "timestamp": msg.timestamp.isoformat(),
+        "sender_name": user.username,
+        "sender_avatar": user.avatar_url
+    }
+    if stream_id:
+        data["stream_id"] = stream_id
+    try:
+        await emit_to_channel("new_message", data, channel)
+    except Exception as e:
+        # Already committed: clients get it with the history, and raising would make a retry post it twice
+        print(f"Could not emit message {msg.id} to {channel}: {e}")
+    print(f"DEBUG AI: Sent response: {data['content'][:50]}...")
+    return data
 
-async def trigger_ai_response_task(channel: str, user_message: str):
-    print(f"DEBUG AI: Triggered for channel={channel}, message='{user_message}'")
-    # Random delay 2-5s
-    await asyncio.sleep(random.randint(2, 5))
-    
+async def stream_bot_message(channel: str, user: TeammateIdentity, produce) -> dict:
+    """
+    Posts the message `await produce(on_delta)` returns, streaming it while
+    it is generated: every `on_delta(text)` is emitted to the channel as a
+    message_delta, and the persisted new_message carries the same stream_id
+    so clients replace their draft with it. If produce fails, the draft is
+    aborted (message_delta with "aborted": true) and the error re-raised.
+    """
+    draft = {
+        "stream_id": uuid.uuid4().hex,
+        "channel": channel,
+        "sender_id": user.id,
+        "is_bot": True,
+        "sender_name": user.username,
+        "sender_avatar": user.avatar_url
+    }
+
+    async def on_delta(text: str):
+        await emit_to_channel("message_delta", {**draft, "delta": text}, channel)
+
+    try:
+        content = await produce(on_delta)
+    except Exception:
+        await emit_to_channel("message_delta", {**draft, "delta": "", "aborted": True}, channel)
+        raise
+    return await post_bot_message(channel, user, content, stream_id=draft["stream_id"])
+
+async def reply_to_messages(channel: str, messages: list, progress: dict = None):
+    """
+    One teammate reply to a burst of messages ({"sender", "content"}) in a
+    channel, as batched by reply_scheduler. Each PR link posted in
+    #code-review still gets its own review.
+    `progress` records what has been sent (the task payload, so it survives
+    retries): a retry keeps the same teammate, doesn't repeat the
+    acknowledgement and only reviews the links that failed.
+    """
+    print(f"DEBUG AI: Replying in channel={channel} to {len(messages)} message(s)")
     if not GEMINI_API_KEY:
         print("Skipping AI response (No API Key)")
         return
+    if progress is None:
+        progress = {}
 
-    # 100% chance for MVP demonstration, random teammate
-    
     try:
-        async with AsyncSessionLocal() as db:
-            # Picking a teammate early if needed for immediate feedback
-            teammate = random.choice(AI_TEAMMATES)
-            user = await get_or_create_ai_user(db, teammate)
+        name = progress.setdefault("teammate", random.choice(AI_TEAMMATES)["name"])
+        teammate = next((t for t in AI_TEAMMATES if t["name"] == name), AI_TEAMMATES[0])
+        user = await teammate_identity(teammate)
+
+        # SPECIAL HANDLING FOR CODE REVIEW
+        if channel == "code-review":
+            links = find_pr_links(messages)
+            posted = progress.setdefault("posted_links", [])
+            if links and not progress.get("acknowledged"):
+                # Emit immediate feedback from THE SAME USER
+                immediate_data = {
+                    "id": random.randint(100000, 999999), # Temporary ID
+                    "ephemeral": True, # not persisted, so kept out of the history buffer
+                    "channel": channel,
+                    "content": f"Thanks! Give me a minute, I'll take a look at {'this PR' if len(links) == 1 else 'these PRs'} for you. 🔍",
+                    "sender_id": user.id,
+                    "is_bot": True,
+                    "timestamp": datetime.now().isoformat(),
+                    "sender_name": user.username,
+                    "sender_avatar": user.avatar_url
+                }
+                await emit_to_channel("new_message", immediate_data, channel)
+                progress["acknowledged"] = True
+
+            if links:
+                async def review(link):
+                    await stream_bot_message(channel, user, lambda on_delta: process_pr_link(link, on_delta=on_delta))
+                    posted.append(link)
+
+                # Each review streams as its own draft and is posted when it completes
+                pending = [link for link in links if link not in posted]
+                results = await asyncio.gather(*[review(link) for link in pending], return_exceptions=True)
+                errors = [result for result in results if isinstance(result, Exception)]
+                if errors:
+                    raise errors[0]
+                return
+            if any("review" in m["content"].lower() and "pr" in m["content"].lower() for m in messages):
+                await post_bot_message(channel, user, "Sure! Paste the GitHub PR link comfortably here, and I'll do a quick review.")
+                return
+
+        specific_context = CHANNEL_CONTEXT.get(channel, "You are in a chat channel.")
+        if len(messages) == 1:
+            sent = f'A teammate just sent: "{messages[0]["content"]}"'
+        else:
+            sent = "Teammates just sent these messages:\n" + "\n".join(f'- {m["sender"]}: "{m["content"]}"' for m in messages)
+
+        prompt = f"""
+        Act as {teammate['name']}, a {teammate['role']} at a tech startup.
+        Style: {teammate['style']}
+        Context: {specific_context}
+        
+        {sent}
+        
+        Respond to them in a single message. Keep it short (1-2 sentences).
+        """
+        await stream_bot_message(channel, user, lambda on_delta: stream_text(prompt, on_delta, caller="reply_to_messages"))
 
-            # SPECIAL HANDLING FOR CODE REVIEW
-            content = None
-            
-            if channel == "code-review":
-                if "github.com" in user_message and "/pull/" in user_message:
-                    # Emit immediate feedback from THE SAME USER
-                    immediate_data = {
-                        "id": random.randint(100000, 999999), # Temporary ID
-                        "channel": channel,
-                        "content": f"Thanks! Give me a minute, I'll take a look at this PR for you. 🔍",
-                        "sender_id": user.id,
-                        "is_bot": True,
-                        "timestamp": datetime.now().isoformat(),
-                        "sender_name": user.username,
-                        "sender_avatar": user.avatar_url
-                    }
-                    await sio.emit("new_message", immediate_data)
-                    
-                    # Extract URL and process
-                    words = user_message.split()
-                    for word in words:
-                        if "github.com" in word and "/pull/" in word:
-                            content = await process_pr_link(word)
-                            break
-                elif "review" in user_message.lower() and "pr" in user_message.lower():
-                    content = "Sure! Paste the GitHub PR link comfortably here, and I'll do a quick review."
-
-            if not content:
-            
-                channel_context = {
-                "general": "You are hanging out in the #general channel. Keep it casual, fun, and broad. Answer in a general way.",
-                "dev": "You are in the #dev channel. Be weirdly specific, technical, and use software engineering jargon. Assume everyone knows how to code.",
-                "code-review": "You are in the #code-review channel. Be picky, ask critical questions, or ask for code reviews. Act like a senior engineer reviewing a junior's PR.",
-                "random": "You are in the #random channel. Ignore work topics. Tell jokes, share random facts, or talk about conspiracy theories. Be funny and weird."
-            }
-            
-                specific_context = channel_context.get(channel, "You are in a chat channel.")
-
-                prompt = f"""
-                Act as {teammate['name']}, a {teammate['role']} at a tech startup.
-                Style: {teammate['style']}
-                Context: {specific_context}
-                
-                A teammate just sent: "{user_message}"
-                
-                Respond to them. Keep it short (1-2 sentences).
-                """
-                
-                # In a real environment, this might take time, so we already sent the "thanks" for PRs
-                response = client.models.generate_content(model=MODEL, contents=prompt)
-                content = response.text
-            
-            msg = Message(
-                channel=channel,
-                content=content,
-                is_bot=True,
-                sender_id=user.id
-            )
-            db.add(msg)
-            await db.commit()
-            await db.refresh(msg)
-            
-            data = {
-                "id": msg.id,
-                "channel": msg.channel,
-                "content": msg.content,
-                "sender_id": user.id,
-                "is_bot": True,
-                "timestamp": msg.timestamp.isoformat(),
-                "sender_name": user.username,
-                "sender_avatar": user.avatar_url
-            }
-            
-            await sio.emit("new_message", data)
-            print(f"DEBUG AI: Sent response: {data['content'][:50]}...")
-            
     except Exception as e:
         print(f"Error in AI response: {e}")
         import traceback
         traceback.print_exc()
+        raise  # the task queue retries it
 
-async def trigger_proactive_message(channel: str, prompt_context: str, user_name: str = "Teammate"):
-    """Trigger an AI message without a user prompt (proactive)"""
+def merge_reply_payloads(queued: dict, new: dict) -> dict:
+    return {**queued, "messages": queued["messages"] + new["messages"]}
+
+async def enqueue_reply(channel: str, messages: list):
+    # One reply runs per channel; messages arriving meanwhile are merged into the channel's waiting task
+    await enqueue("ai_reply", {"channel": channel, "messages": messages}, key=channel, merge=merge_reply_payloads)
+
+# Debounces bursts of chat messages into one queued reply per channel
+reply_scheduler = ReplyScheduler(enqueue_reply)
+
+@task_handler("ai_reply")
+async def run_reply_task(payload: dict):
+    await reply_to_messages(payload["channel"], payload["messages"], progress=payload)
+
+async def trigger_proactive_message(channel: str, prompt_context: str, user_name: str = "Teammate", db=None):
+    """Queue an AI message without a user prompt (proactive); with `db` it is queued when the caller commits"""
     if not GEMINI_API_KEY:
         return
-
     # Random delay 2-5s to feel natural
-    await asyncio.sleep(random.randint(2, 5))
+    await enqueue("proactive_message", {"channel": channel, "prompt_context": prompt_context, "user_name": user_name},
+                  delay=random.randint(2, 5), db=db)
 
+@task_handler("proactive_message")
+async def send_proactive_message(payload: dict):
+    channel, prompt_context, user_name = payload["channel"], payload["prompt_context"], payload["user_name"]
     try:
-        async with AsyncSessionLocal() as db:
-            teammate = random.choice(AI_TEAMMATES)
-            user = await get_or_create_ai_user(db, teammate)
-            
-            
-            prompt = f"""
-            Act as {teammate['name']}, a {teammate['role']} at a tech startup.
-            Style: {teammate['style']}
-            
-            Context: {prompt_context}
-            User involved: {user_name}
-            
-            Write a short message (1 sentence) to the channel or the user.
-            """
-            
-            response = client.models.generate_content(model=MODEL, contents=prompt)
-            content = response.text
-            
-            msg = Message(
-                channel=channel,
-                content=content,
-                is_bot=True,
-                sender_id=user.id
-            )
-            db.add(msg)
-            await db.commit()
-            await db.refresh(msg)
-            
-            data = {
-                "id": msg.id,
-                "channel": msg.channel,
-                "content": msg.content,
-                "sender_id": user.id,
-                "is_bot": True,
-                "timestamp": msg.timestamp.isoformat(),
-                "sender_name": user.username,
-                "sender_avatar": user.avatar_url
-            }
-            
-            await sio.emit("new_message", data)
+        teammate = random.choice(AI_TEAMMATES)
+        user = await teammate_identity(teammate)
+
+        prompt = f"""
+        Act as {teammate['name']}, a {teammate['role']} at a tech startup.
+        Style: {teammate['style']}
+        
+        Context: {prompt_context}
+        User involved: {user_name}
+        
+        Write a short message (1 sentence) to the channel or the user.
+        """
+
+        await stream_bot_message(channel, user, lambda on_delta: stream_text(prompt, on_delta, model=MODEL, caller="trigger_proactive_message"))
             
     except Exception as e:
         print(f"Error in proactive AI response: {e}")
+        raise
@@ -1,21 +1,157 @@
-from google import genai
+from google.genai import types
 from fastapi import HTTPException
 import os
+import sys
+import copy
 import json
 import asyncio
-from gtts import gTTS
-import io
-import httpx
+import hashlib
+import time
+from .diff_utils import split_diff, merge_reviews
+from .pr_cache import diff_cache, review_cache
+from .singleflight import SingleFlight
+from .providers import AI_PROVIDER, gemini_api_key, make_genai_client, gemini_upload_url, http_client, synthesize_speech
+from .circuit_breaker import breakers, is_backend_failure, LLM_MEDIA_CALL_TIMEOUT, LLM_STREAM_TIMEOUT
+from .llm_usage import usage_tracker, usage_counts
+from .file_poller import FilePoller
+from .storage_utils import iter_file_chunks
+from .media_transcode import preprocess_audio, preprocess_video, discard_preprocessed, transcode_stats
+from .structured_output import (
+    IncrementalJSONParser, parse_json_response,
+    REVIEW_SCHEMA, PROJECT_SCHEMA, TRUTHFULNESS_SCHEMA, TRUTHFULNESS_BATCH_SCHEMA,
+)
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_API_KEY = gemini_api_key()
 
 MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
 
-client = None
-if GEMINI_API_KEY:
-    client = genai.Client(api_key=GEMINI_API_KEY, http_options={'api_version': 'v1beta'})
+# Max concurrent Gemini generations from this process (shared by PR review shards etc.)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
 
-async def analyze_diff(diff: str, pr_title: str) -> dict:
+# Seconds to memoize results of opt-in prompts (retries, bursts of identical requests)
+LLM_MEMO_TTL = float(os.getenv("LLM_MEMO_TTL", "30"))
+
+# Resumable upload endpoint of the Gemini Files API (media is streamed here in chunks)
+GEMINI_UPLOAD_URL = gemini_upload_url(os.getenv("GEMINI_UPLOAD_URL", "https://generativelanguage.googleapis.com/upload/v1beta/files"))
+
+client = make_genai_client()
+
+# files.list pages read per status check before falling back to per-file gets
+FILE_LIST_MAX_PAGES = int(os.getenv("FILE_LIST_MAX_PAGES", "5"))
+
+# Concurrent byte-identical prompts share one upstream call
+llm_flight = SingleFlight()
+
+async def generate_text(prompt: str, model: str = MODEL, memo_ttl: float = 0, config: dict = None, caller: str = None) -> str:
+    """
+    Runs a Gemini generation through the single-flight layer.
+    Identical (model, prompt, config) calls that are in flight at the same time
+    are collapsed into one call; memo_ttl > 0 also reuses the result for that long.
+    Usage is recorded under `caller` (default: the calling function's name).
+    """
+    caller = caller or sys._getframe(1).f_code.co_name
+    config_key = json.dumps(config, sort_keys=True) if config else ""
+    key = hashlib.sha256(f"{model}\0{config_key}\0{prompt}".encode()).hexdigest()
+    breaker = breakers.get(AI_PROVIDER, model)
+    upstream = {}
+
+    async def _call():
+        upstream["tokens"] = (0, 0)
+        # While the backend is failing, callers get CircuitOpenError (and their fallback) at once
+        breaker.check()
+        async with llm_semaphore:
+            response = await breaker.call(lambda: client.aio.models.generate_content(model=model, contents=prompt, config=config))
+        upstream["tokens"] = usage_counts(response)
+        return response.text
+
+    started = time.monotonic()
+    try:
+        text = await llm_flight.do(key, _call, memo_ttl=memo_ttl)
+    except Exception as e:
+        usage_tracker.record(caller, model, latency=time.monotonic() - started, cache="miss" if upstream else "hit", prompt_chars=len(prompt), error=type(e).__name__)
+        raise
+    # Only the caller whose _call ran pays for tokens; the rest were cache hits
+    prompt_tokens, output_tokens = upstream.get("tokens", (0, 0))
+    usage_tracker.record(caller, model, prompt_tokens, output_tokens, time.monotonic() - started, "miss" if upstream else "hit", prompt_chars=len(prompt))
+    return text
+
+async def generate_json(prompt: str, schema: dict = None, on_item=None, model: str = MODEL, memo_ttl: float = 0, caller: str = None):
+    """
+    Requests schema-constrained JSON from Gemini.
+    With on_item, the response is streamed through an IncrementalJSONParser and
+    `await on_item(field, index, value)` is called for every top-level field and
+    every element of a top-level array/object as soon as it is complete, so
+    consumers can start work before generation finishes. If the final document
+    is malformed, whatever completed is returned instead of failing outright.
+    """
+    config = {"response_mime_type": "application/json"}
+    if schema:
+        config["response_schema"] = schema
+
+    caller = caller or sys._getframe(1).f_code.co_name
+    if on_item is None:
+        return parse_json_response(await generate_text(prompt, model=model, memo_ttl=memo_ttl, config=config, caller=caller))
+
+    parser = IncrementalJSONParser()
+
+    async def on_delta(text):
+        for field, index, value in parser.feed(text):
+            await on_item(field, index, value)
+
+    await stream_text(prompt, on_delta, model=model, config=config, caller=caller)
+    return parser.result()
+
+async def stream_text(prompt: str, on_delta, model: str = MODEL, config: dict = None, caller: str = None) -> str:
+    """
+    Streams a Gemini generation, awaiting `on_delta(text)` for every chunk as
+    it arrives, and returns the full text. Identical streams in flight at the
+    same time share one upstream call (e.g. two people pasting the same PR);
+    a caller that joins late first gets the chunks it missed. Not memoized.
+    Opening the stream gets LLM_CALL_TIMEOUT and the whole stream, last chunk
+    included, LLM_STREAM_TIMEOUT; either running out counts as a backend failure.
+    """
+    caller = caller or sys._getframe(1).f_code.co_name
+    config_key = json.dumps(config, sort_keys=True) if config else ""
+    key = hashlib.sha256(f"stream\0{model}\0{config_key}\0{prompt}".encode()).hexdigest()
+    breaker = breakers.get(AI_PROVIDER, model)
+    upstream = {}
+
+    async def _call(publish):
+        upstream["tokens"] = (0, 0)
+        parts = []
+        breaker.check()
+        async with llm_semaphore:
+            stream = await breaker.call(lambda: client.aio.models.generate_content_stream(model=model, contents=prompt, config=config))
+            try:
+                async with asyncio.timeout(LLM_STREAM_TIMEOUT):
+                    async for chunk in stream:
+                        # usage_metadata is cumulative; the last chunk carries the totals
+                        if chunk.usage_metadata is not None:
+                            upstream["tokens"] = usage_counts(chunk)
+                        if chunk.text:
+                            parts.append(chunk.text)
+                            publish(chunk.text)
+            except Exception as e:
+                # A stream dying midway counts against the backend (callers' on_delta errors never get here)
+                if is_backend_failure(e):
+                    breaker.record_failure(e)
+                raise
+        return "".join(parts)
+
+    started = time.monotonic()
+    try:
+        text = await llm_flight.stream(key, _call, on_delta)
+    except Exception as e:
+        usage_tracker.record(caller, model, *upstream.get("tokens", (0, 0)), time.monotonic() - started,
+                             cache="miss" if upstream else "hit", prompt_chars=len(prompt), error=type(e).__name__)
+        raise
+    # Only the caller whose _call ran pays for tokens; the rest were cache hits
+    usage_tracker.record(caller, model, *upstream.get("tokens", (0, 0)), time.monotonic() - started,
+                         "miss" if upstream else "hit", prompt_chars=len(prompt))
+    return text
+
+async def analyze_diff(diff: str, pr_title: str, on_item=None) -> dict:
     if not GEMINI_API_KEY:
         raise HTTPException(status_code=500, detail="Gemini API Key not configured")
 
@@ -52,25 +188,42 @@ async def analyze_diff(diff: str, pr_title: str) -> dict:
         {diff}
         """
         
-        response = client.models.generate_content(
-            model=MODEL,
-            contents=prompt
-        )
-        
-        content = response.text
-        # Clean up potential markdown formatting
-        if content.strip().startswith("```json"):
-            content = content.strip()[7:]
-        if content.strip().startswith("```"):
-            content = content.strip()[3:]
-        if content.strip().endswith("```"):
-            content = content.strip()[:-3]
-            
-        return json.loads(content)
+        return await generate_json(prompt, schema=REVIEW_SCHEMA, on_item=on_item)
         
     except Exception as e:
         print(f"Gemini Error: {e}")
-        return {"summary": f"Yikes! I hit a snag while reading your code. (Error: {str(e)})", "comments": []}
+        return {"summary": f"Yikes! I hit a snag while reading your code. (Error: {str(e)})", "comments": [], "error": str(e)}
+
+async def review_diff(diff: str, pr_title: str, on_item=None) -> dict:
+    """
+    Map-reduce review: splits large diffs per file/hunk, reviews the shards
+    concurrently (bounded by llm_semaphore) and merges the comments.
+    on_item receives every shard's summary and comments as they stream out.
+    """
+    cached = review_cache.get(diff)
+    if cached is not None:
+        print(f"Review cache hit for {pr_title}")
+        usage_tracker.record("analyze_diff", MODEL, cache="hit", prompt_chars=len(diff))
+        return copy.deepcopy(cached)
+
+    skipped = []
+    shards = split_diff(diff, skipped=skipped)
+    if len(shards) <= 1:
+        review = await analyze_diff(shards[0] if shards else diff, pr_title, on_item=on_item)
+        if skipped:
+            review = merge_reviews([review], skipped=skipped)
+    else:
+        print(f"Reviewing {pr_title} in {len(shards)} shards")
+        reviews = await asyncio.gather(*[
+            analyze_diff(shard, f"{pr_title} (part {i + 1} of {len(shards)})", on_item=on_item)
+            for i, shard in enumerate(shards)
+        ])
+        review = merge_reviews(list(reviews), skipped=skipped)
+
+    # Only cache complete reviews so a transient Gemini error isn't replayed
+    if not review.get("error") and not review.get("incomplete"):
+        review_cache.set(diff, copy.deepcopy(review))
+    return review
 
 async def fetch_pr_diff(pr_url: str) -> str:
     """
@@ -84,40 +237,67 @@ async def fetch_pr_diff(pr_url: str) -> str:
         diff_url = f"{diff_url}.diff"
         
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(diff_url, follow_redirects=True)
+        async with http_client() as client:
+            # Revalidates against the cached copy (ETag / Last-Modified) when we have one
+            status_code, text = await diff_cache.fetch(client, diff_url)
             
-            if response.status_code == 404:
+            if status_code == 404:
                 return "Error: Repo not found or private. I can only review public repositories."
             
-            if response.status_code == 200:
-                return response.text
+            if status_code == 200:
+                return text
             else:
-                return f"Error fetching diff: HTTP {response.status_code}"
+                return f"Error fetching diff: HTTP {status_code}"
     except Exception as e:
         return f"Error fetching diff: {str(e)}"
 
-async def process_pr_link(pr_url: str) -> str:
+def format_review_comment(comment: dict) -> str:
+    icon = "🗣️"
+    cat = comment.get('category', 'Opinion')
+
+    if cat == 'Security': icon = "🔒"
+    elif cat == 'Performance': icon = "⚡"
+    elif cat == 'Opinion': icon = "💬"
+    elif 'Pro-Tip' in cat: icon = "💡"
+
+    line = f"- {icon} **{comment.get('file')}** (Line {comment.get('line')}): {comment.get('message')}\n"
+    if comment.get('suggestion'):
+         line += f"  > Suggestion: `{comment.get('suggestion')}`\n"
+    return line
+
+async def process_pr_link(pr_url: str, on_delta=None) -> str:
     """
     Fetches diff and generates a detailed review summary for chat.
+    With on_delta, a draft of the review (opinion first, then findings in the
+    order the model produces them) is passed along while it is generated.
     """
     diff_text = await fetch_pr_diff(pr_url)
     
     if diff_text.startswith("Error"):
         # Explicitly return the error message to the user
         return f"⚠️ {diff_text}"
-        
-    # If the diff is huge, truncate it
-    if len(diff_text) > 40000:
-        diff_text = diff_text[:40000] + "...(truncated)"
-    
-    # Analyze the diff
-    analysis = await analyze_diff(diff_text, f"PR: {pr_url}")
+
+    header = f"## 🕵️ AI Code Review\n**PR:** {pr_url}\n\n"
+    on_item = None
+    if on_delta:
+        await on_delta(header)
+        findings = 0
+
+        async def on_item(field, index, value):
+            nonlocal findings
+            if field == "summary" and isinstance(value, str):
+                await on_delta(f"### 💭 Reviewer's Opinion\n{value}\n\n")
+            elif field == "comments" and isinstance(value, dict):
+                findings += 1
+                await on_delta(("### 🔍 Key Findings\n" if findings == 1 else "") + format_review_comment(value))
+
+    # Analyze the diff (large diffs are split into shards and reviewed in parallel)
+    analysis = await review_diff(diff_text, f"PR: {pr_url}", on_item=on_item)
     
     summary = analysis.get("summary", "No summary provided.")
     comments = analysis.get("comments", [])
     
-    message = f"## 🕵️ AI Code Review\n**PR:** {pr_url}\n\n"
+    message = header
     message += f"### 💭 Reviewer's Opinion\n{summary}\n\n"
     
     if comments:
@@ -126,21 +306,11 @@ async def process_pr_link(pr_url: str) -> str:
         sorted_comments = sorted(comments, key=lambda x: 0 if x.get('category') == 'Security' else 1 if x.get('category') == 'Performance' else 2 if x.get('category') == 'Opinion' else 3)
         
         for comment in sorted_comments[:6]:
-            icon = "🗣️"
-            cat = comment.get('category', 'Opinion')
-            
-            if cat == 'Security': icon = "🔒"
-            elif cat == 'Performance': icon = "⚡"
-            elif cat == 'Opinion': icon = "💬"
-            elif 'Pro-Tip' in cat: icon = "💡"
-            
-            message += f"- {icon} **{comment.get('file')}** (Line {comment.get('line')}): {comment.get('message')}\n"
-            if comment.get('suggestion'):
-                 message += f"  > Suggestion: `{comment.get('suggestion')}`\n"
+            message += format_review_comment(comment)
     
         if len(comments) > 6:
             message += f"\n*...and {len(comments) - 6} more improvements found.*"
-    elif "Error" in summary or "Yikes" in summary:
+    elif analysis.get("error"):
         message += "\n❌ **Review Interrupted**: See my opinion above for what went wrong."
     else:
         message += "✅ **Code looks clean!** I honestly couldn't find anything to complain about."
@@ -167,8 +337,7 @@ async def generate_coworker_update(name: str, role: str, context: str) -> str:
         Tone: Casual, slightly tired but professional.
         """
         
-        response = client.models.generate_content(model=MODEL, contents=prompt)
-        return response.text
+        return await generate_text(prompt, memo_ttl=LLM_MEMO_TTL)
     except Exception as e:
         print(f"Gemini generation error: {e}")
         return f"I am working on {context}. No blockers."
@@ -184,11 +353,7 @@ async def generate_voice(text: str, name: str) -> bytes:
         if name == "Mike": tld = "co.uk"
         if name == "Sarah": tld = "com.au"
         
-        tts = gTTS(text=text, lang='en', tld=tld)
-        fp = io.BytesIO()
-        tts.write_to_fp(fp)
-        fp.seek(0)
-        return fp.read()
+        return synthesize_speech(text, tld)
 
     try:
         loop = asyncio.get_event_loop()
@@ -198,38 +363,124 @@ async def generate_voice(text: str, name: str) -> bytes:
         print(f"Voice generation failed: {e}")
         return b''
 
+def audio_mime_type(filename: str) -> str:
+    if filename.lower().endswith(".mp3"):
+        return "audio/mp3"
+    if filename.lower().endswith(".wav"):
+        return "audio/wav"
+    if filename.lower().endswith(".ogg"):
+        return "audio/ogg"
+    return "audio/webm"
+
+def video_mime_type(filename: str) -> str:
+    if filename.lower().endswith(".mov"):
+        return "video/quicktime"
+    if filename.lower().endswith(".webm"):
+        return "video/webm"
+    return "video/mp4"
+
+async def upload_media_stream(chunks, size: int, mime_type: str, display_name: str = None) -> types.File:
+    """
+    Uploads media to the Gemini Files API with the resumable protocol, sending
+    each chunk as soon as it is read instead of waiting for the whole file.
+    The total size must be known up front. Non-final chunks must be multiples
+    of 256 KiB (see storage_utils.UPLOAD_CHUNK_SIZE).
+    """
+    async with http_client(timeout=120.0) as http:
+        start = await http.post(
+            GEMINI_UPLOAD_URL,
+            headers={
+                "x-goog-api-key": GEMINI_API_KEY,
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(size),
+                "X-Goog-Upload-Header-Content-Type": mime_type,
+            },
+            json={"file": {"display_name": display_name or "upload", "mime_type": mime_type}}
+        )
+        start.raise_for_status()
+        upload_url = start.headers["x-goog-upload-url"]
+
+        offset = 0
+        pending = None
+
+        async def send(chunk: bytes, final: bool):
+            response = await http.post(
+                upload_url,
+                headers={
+                    "X-Goog-Upload-Command": "upload, finalize" if final else "upload",
+                    "X-Goog-Upload-Offset": str(offset),
+                },
+                content=chunk
+            )
+            response.raise_for_status()
+            return response
+
+        # Hold one chunk back so the last one can carry "finalize"
+        async for chunk in chunks:
+            if pending is not None:
+                await send(pending, final=False)
+                offset += len(pending)
+            pending = chunk
+        response = await send(pending or b"", final=True)
+        return types.File.model_validate(response.json()["file"])
+
+async def upload_media_file(file_path: str, mime_type: str) -> types.File:
+    """Streams a local file to the Gemini Files API chunk by chunk."""
+    size = await asyncio.to_thread(os.path.getsize, file_path)
+    print(f"Uploading {file_path} ({size} bytes, mime: {mime_type}) to Gemini...")
+    start = time.perf_counter()
+    myfile = await upload_media_stream(iter_file_chunks(file_path), size, mime_type, os.path.basename(file_path))
+    transcode_stats.record_upload(size, time.perf_counter() - start)
+    return myfile
+
+async def _fetch_file_states(names: list) -> dict:
+    """
+    Batched status check: files.list pages (newest first) are read until
+    every pending file is found, up to FILE_LIST_MAX_PAGES; stragglers are
+    fetched individually.
+    """
+    found = {}
+    if len(names) > 1:
+        wanted = set(names)
+        pager = await client.aio.files.list(config={'page_size': 100})
+        page = pager.page
+        for pages in range(FILE_LIST_MAX_PAGES):
+            found.update((myfile.name, myfile) for myfile in page if myfile.name in wanted)
+            if len(found) == len(wanted) or pages + 1 == FILE_LIST_MAX_PAGES:
+                break
+            try:
+                page = await pager.next_page()
+            except IndexError:
+                break
+    missing = [name for name in names if name not in found]
+    for myfile in await asyncio.gather(*(client.aio.files.get(name=name) for name in missing)):
+        found[myfile.name] = myfile
+    return found
+
+# One polling loop (with backoff) shared by every upload waiting to become ACTIVE
+file_poller = FilePoller(_fetch_file_states)
+
 async def transcribe_audio(file_path: str) -> str:
     if not GEMINI_API_KEY:
         return "Mock transcription: I worked on the login feature."
         
     try:
-        import time
-        # Uploading file to Gemini
-        # Determine MIME type
-        mime_type = "audio/webm"
-        if file_path.endswith(".mp3"):
-            mime_type = "audio/mp3"
-        elif file_path.endswith(".wav"):
-            mime_type = "audio/wav"
-            
-        print(f"Transcribing {file_path} with mime_type {mime_type}...")
-        
-        myfile = client.files.upload(file=file_path, config={'mime_type': mime_type})
-        
+        # Mono 16 kHz Opus is all the model needs (no-op without ffmpeg)
+        upload_path = await preprocess_audio(file_path)
+        mime_type = audio_mime_type(upload_path)
+        print(f"Transcribing {upload_path} with mime_type {mime_type}...")
+        try:
+            myfile = await upload_media_file(upload_path, mime_type)
+        finally:
+            await discard_preprocessed(file_path, upload_path)
+
         # Wait for file to be active (required for audio/video)
-        import time
-        for i in range(10): # Max 20 seconds
-            myfile = client.files.get(name=myfile.name)
-            if myfile.state.name == "ACTIVE":
-                break
-            if myfile.state.name == "FAILED":
-                raise Exception(f"File processing failed in Gemini: {myfile.name}")
-            print(f"Waiting for file {myfile.name} to be ACTIVE... current state: {myfile.state.name}")
-            await asyncio.sleep(2)
-        else:
-            raise Exception("Timeout waiting for file to be ACTIVE")
-
-        result = client.models.generate_content(model=MODEL, contents=[myfile, "Transcribe this audio file accurately. Return ONLY the transcription text, nothing else."])
+        myfile = await file_poller.wait_active(myfile.name)
+
+        started = time.monotonic()
+        result = await breakers.get(AI_PROVIDER, MODEL, "media").call(lambda: client.aio.models.generate_content(model=MODEL, contents=[myfile, "Transcribe this audio file accurately. Return ONLY the transcription text, nothing else."]), timeout=LLM_MEDIA_CALL_TIMEOUT)
+        usage_tracker.record_response("transcribe_audio", MODEL, result, started)
         return result.text
     except Exception as e:
         import traceback
@@ -237,10 +488,21 @@ async def transcribe_audio(file_path: str) -> str:
         print(traceback.format_exc())
         return "Error transcribing audio."
 
-async def generate_project_with_bugs(project_description: str, backend_stack: str = "Vanilla JS", frontend_stack: str = "Vanilla JS") -> dict:
+async def _replay_project(project: dict, on_item):
+    """Feeds a ready-made project to an on_item consumer as if it were streaming."""
+    for field in ("project_name", "repo_name"):
+        if field in project:
+            await on_item(field, None, project[field])
+    for i, (path, content) in enumerate(project.get("files", {}).items()):
+        await on_item("files", i, {"path": path, "content": content})
+    for i, ticket in enumerate(project.get("tickets", [])):
+        await on_item("tickets", i, ticket)
+
+async def generate_project_with_bugs(project_description: str, backend_stack: str = "Vanilla JS", frontend_stack: str = "Vanilla JS", on_item=None) -> dict:
     """
     Generate a professional-grade web project with intentional bugs based on user's description and tech stack.
     Returns files, bugs list, and ticket descriptions.
+    on_item is passed to generate_json to receive files/tickets as they stream out.
     """
     if not GEMINI_API_KEY:
         # Return a simple fallback project
@@ -283,34 +545,49 @@ async def generate_project_with_bugs(project_description: str, backend_stack: st
     {{
         "project_name": "name",
         "repo_name": "name-simulation",
-        "files": {{
-            "README.md": "...",
-            "local_run.md": "...",
-            "package.json": "...",
-            "src/App.jsx": "...",
-            "src/components/Header.jsx": "..."
-        }},
+        "files": [
+            {{"path": "README.md", "content": "..."}},
+            {{"path": "local_run.md", "content": "..."}},
+            {{"path": "package.json", "content": "..."}},
+            {{"path": "src/App.jsx", "content": "..."}},
+            {{"path": "src/components/Header.jsx", "content": "..."}}
+        ],
         "tickets": [...]
     }}
     """
 
+    from .template_cache import template_cache, normalize_description
+    from .rag_utils import rag_engine
+
+    # Reuse a cached project for the same stack pair and a near-identical description.
+    # The cache is only a shortcut: if it is unavailable, generate as usual.
+    embedding = None
     try:
-        response = client.models.generate_content(
-            model=MODEL,
-            contents=prompt
-        )
-        
-        content = response.text
-        # Clean up potential markdown formatting
-        if content.strip().startswith("```json"):
-            content = content.strip()[7:]
-        if content.strip().startswith("```"):
-            content = content.strip()[3:]
-        if content.strip().endswith("```"):
-            content = content.strip()[:-3]
-            
-        project_data = json.loads(content)
+        embedding = await rag_engine.get_embedding(normalize_description(project_description))
+        cached = await template_cache.lookup(project_description, backend_stack, frontend_stack, embedding)
+    except Exception as e:
+        print(f"Template cache unavailable, generating from scratch: {e}")
+        cached = None
+    if cached:
+        if on_item:
+            await _replay_project(cached, on_item)
+        cached["is_fallback"] = False
+        return cached
+
+    try:
+        project_data = await generate_json(prompt, schema=PROJECT_SCHEMA, on_item=on_item)
+        # Files come back as [{"path", "content"}]; the rest of the app works with {path: content}
+        files = project_data.get("files", {})
+        if isinstance(files, list):
+            project_data["files"] = {f["path"]: f.get("content", "") for f in files if isinstance(f, dict) and f.get("path")}
+        if not project_data.get("files"):
+            raise ValueError("No files generated")
         project_data["is_fallback"] = False
+        if embedding is not None:
+            try:
+                await template_cache.store(project_description, backend_stack, frontend_stack, embedding, project_data)
+            except Exception as e:
+                print(f"Could not cache project template: {e}")
         return project_data
     except Exception as e:
         print(f"Project generation error: {e}")
@@ -333,6 +610,19 @@ async def generate_project_with_bugs(project_description: str, backend_stack: st
         }
 
 
+TRUTHFULNESS_RULES = """
+    1. If the user claims they completed a ticket that is NOT 'DONE', 'IN_TEST' or 'PO_REVIEW', they are lying (-5 points). But if they talk about tasks that are not on the board, it means you cannot verify them, so ignore those information.
+    2. If the user says they are working on something that matches their 'IN_PROGRESS' tickets, they are honest (+2 points).
+    3. If they are vague, stay neutral (0 points).
+    4. If they admit to being stuck, give them a minor honesty boost (+1 point)."""
+
+# Standups packed into one prompt by verify_standups_batch
+TRUTHFULNESS_BATCH_SIZE = int(os.getenv("TRUTHFULNESS_BATCH_SIZE", "25"))
+
+def clamp_truthfulness_score(score) -> int:
+    """Keeps a model's score within what TRUTHFULNESS_RULES can award (-5 to +2)."""
+    return max(-5, min(2, int(score or 0)))
+
 async def verify_standup_truthfulness(transcript: str, ticket_summary: str) -> dict:
     """
     Verifies if the standup transcript matches the actual ticket status summary.
@@ -351,56 +641,88 @@ async def verify_standup_truthfulness(transcript: str, ticket_summary: str) -> d
     ACTUAL TICKET STATUS:
     {ticket_summary}
     
-    RULES:
-    1. If the user claims they completed a ticket that is NOT 'DONE', 'IN_TEST' or 'PO_REVIEW', they are lying (-5 points). But if they talk about tasks that are not on the board, it means you cannot verify them, so ignore those information.
-    2. If the user says they are working on something that matches their 'IN_PROGRESS' tickets, they are honest (+2 points).
-    3. If they are vague, stay neutral (0 points).
-    4. If they admit to being stuck, give them a minor honesty boost (+1 point).
+    RULES:{TRUTHFULNESS_RULES}
     5. Return a JSON object: {{"score": int, "explanation": "Short reasoning"}}
     """
 
     try:
-        response = client.models.generate_content(model=MODEL, contents=prompt)
-        content = response.text
-        # Clean up potential markdown formatting
-        if content.strip().startswith("```json"):
-            content = content.strip()[7:]
-        if content.strip().startswith("```"):
-            content = content.strip()[3:]
-        if content.strip().endswith("```"):
-            content = content.strip()[:-3]
-            
-        return json.loads(content)
+        data = await generate_json(prompt, schema=TRUTHFULNESS_SCHEMA, memo_ttl=LLM_MEMO_TTL)
+        return {**data, "score": clamp_truthfulness_score(data.get("score"))}
     except Exception as e:
         print(f"Truthfulness Verification Error: {e}")
         return {"score": 0, "reason": "Snag in verification."}
 
+async def _verify_truthfulness_chunk(items: list) -> dict:
+    # Standups sharing a ticket board (same user) are listed under it once
+    boards = {}
+    for i, item in enumerate(items):
+        boards.setdefault(item["ticket_summary"], []).append((i, item["transcript"]))
+
+    sections = []
+    for board_number, (ticket_summary, standups) in enumerate(boards.items(), 1):
+        lines = [f"BOARD {board_number} - ACTUAL TICKET STATUS:", ticket_summary, "STANDUPS FOR THIS BOARD:"]
+        lines += [f'[{i}] "{transcript}"' for i, transcript in standups]
+        sections.append("\n".join(lines))
+    standup_blocks = "\n\n".join(sections)
+
+    prompt = f"""
+    You are a Truthfulness Verifier at a tech startup. 
+    For EACH numbered DAILY STANDUP TRANSCRIPT below, compare it with the ACTUAL TICKET STATUS of its board.
+    Judge every standup independently.
+    
+    {standup_blocks}
+    
+    RULES:{TRUTHFULNESS_RULES}
+    5. Return a JSON object: {{"results": [{{"id": <standup number>, "score": int, "explanation": "Short reasoning"}}]}} with one entry per standup.
+    """
+
+    data = await generate_json(prompt, schema=TRUTHFULNESS_BATCH_SCHEMA)
+    results = {}
+    for entry in data.get("results", []):
+        index = entry.get("id")
+        if isinstance(index, int) and 0 <= index < len(items):
+            results[items[index]["id"]] = {
+                "score": clamp_truthfulness_score(entry.get("score")),
+                "explanation": entry.get("explanation", "Verified by AI.")
+            }
+    return results
+
+async def verify_standups_batch(items: list, batch_size: int = TRUTHFULNESS_BATCH_SIZE) -> dict:
+    """
+    Verifies many standups with a few packed prompts instead of one call each.
+    items: [{"id", "transcript", "ticket_summary"}]. Returns {id: {"score", "explanation"}}.
+    Chunks run in parallel (bounded by llm_semaphore); standups a chunk did not
+    answer for, or whose chunk failed, get a neutral score.
+    """
+    if not GEMINI_API_KEY:
+        return {item["id"]: {"score": 0, "explanation": "AI verification skipped."} for item in items}
+
+    chunks = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    outcomes = await asyncio.gather(*(_verify_truthfulness_chunk(chunk) for chunk in chunks), return_exceptions=True)
+
+    results = {}
+    for chunk, outcome in zip(chunks, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"Truthfulness batch of {len(chunk)} failed: {outcome}")
+            outcome = {}
+        for item in chunk:
+            results[item["id"]] = outcome.get(item["id"], {"score": 0, "explanation": "Snag in verification."})
+    print(f"Verified {len(items)} standups in {len(chunks)} batched call(s)")
+    return results
+
 async def analyze_video(file_path: str, duration: str = None) -> str:
     if not GEMINI_API_KEY:
         return "user uploaded sprint review, duration 0:00, AI analysis skipped - API Key missing"
         
     try:
-        # Detect MIME type based on extension
-        mime_type = "video/mp4" # Default
-        if file_path.lower().endswith(".mov"):
-            mime_type = "video/quicktime"
-        elif file_path.lower().endswith(".webm"):
-            mime_type = "video/webm"
-            
-        print(f"Uploading video {file_path} (mime: {mime_type}) to Gemini...")
-        myfile = client.files.upload(file=file_path, config={'mime_type': mime_type})
+        upload_path = await preprocess_video(file_path)
+        try:
+            myfile = await upload_media_file(upload_path, video_mime_type(upload_path))
+        finally:
+            await discard_preprocessed(file_path, upload_path)
         
         # Wait for file to be active
-        for i in range(20): # Max 40 seconds for video
-            myfile = client.files.get(name=myfile.name)
-            if myfile.state.name == "ACTIVE":
-                break
-            if myfile.state.name == "FAILED":
-                raise Exception(f"Video processing failed in Gemini: {myfile.name}")
-            print(f"Waiting for video {myfile.name} to be ACTIVE... current state: {myfile.state.name}")
-            await asyncio.sleep(2)
-        else:
-            raise Exception("Timeout waiting for video to be ACTIVE")
+        myfile = await file_poller.wait_active(myfile.name)
 
         duration_instruction = f"The duration of the video is {duration}. Use this value exactly." if duration else "Carefully observe the video playback/timeline to provide the most accurate duration possible."
 
@@ -418,11 +740,13 @@ async def analyze_video(file_path: str, duration: str = None) -> str:
         Note: {duration_instruction}
         """
         
-        result = client.models.generate_content(model=MODEL, contents=[myfile, prompt])
+        started = time.monotonic()
+        result = await breakers.get(AI_PROVIDER, MODEL, "media").call(lambda: client.aio.models.generate_content(model=MODEL, contents=[myfile, prompt]), timeout=LLM_MEDIA_CALL_TIMEOUT)
+        usage_tracker.record_response("analyze_video", MODEL, result, started, prompt)
         
         # Clean up the file from Gemini after analysis
         try:
-            client.files.delete(name=myfile.name)
+            await client.aio.files.delete(name=myfile.name)
         except:
             pass
             
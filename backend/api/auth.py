@@ -5,7 +5,7 @@ from sqlalchemy.future import select
 from database import get_db
 from models import User, Message
 from .auth_utils import create_access_token, get_password_hash, verify_password, get_current_user
-from .socket_instance import sio
+from .socket_instance import emit_to_channel
 import random
 from pydantic import BaseModel
 from datetime import datetime
@@ -136,7 +136,7 @@ _Remember: Your performance is being tracked from day one. Make it count!_ 💪"
         await db.refresh(welcome_message)
         
         # Emit the welcome message via socket
-        await sio.emit("new_message", {
+        await emit_to_channel("new_message", {
             "id": welcome_message.id,
             "channel": welcome_message.channel,
             "content": welcome_message.content,
@@ -145,4 +145,4 @@ _Remember: Your performance is being tracked from day one. Make it count!_ 💪"
             "timestamp": welcome_message.timestamp.isoformat(),
             "sender_name": "Sarah (HR AI)",
             "sender_avatar": None
-        })
+        }, welcome_message.channel)
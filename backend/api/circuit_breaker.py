@@ -0,0 +1,158 @@
+import os
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Consecutive failures that open a breaker, and how long it stays open
+# before letting a probe through (half-open)
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+# Calls slower than this count as failures (a hung backend should trip the breaker too)
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "60"))
+# Audio/video calls wait on the provider chewing through a whole upload, and a
+# streamed generation can legitimately run for minutes end to end
+LLM_MEDIA_CALL_TIMEOUT = float(os.getenv("LLM_MEDIA_CALL_TIMEOUT", "300"))
+LLM_STREAM_TIMEOUT = float(os.getenv("LLM_STREAM_TIMEOUT", "300"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose breaker is open."""
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """Timeouts, 5xx and 429 count against the backend; other 4xx are the caller's fault."""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int) and 400 <= code < 500 and code not in (408, 429):
+        return False
+    return True
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. CLOSED passes calls through and counts
+    consecutive failures; at `failure_threshold` it OPENS and rejects calls
+    immediately for `reset_seconds`. Then it goes HALF_OPEN and lets up to
+    `half_open_probes` calls through: a success closes it, a failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS, half_open_probes: int = BREAKER_HALF_OPEN_PROBES):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_error = None
+
+    def check(self):
+        """Fails fast while open, e.g. before queueing for a concurrency slot."""
+        if self.state == OPEN and time.monotonic() - self.opened_at < self.reset_seconds:
+            self.rejected += 1
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (reserves a probe slot when half-open)."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = HALF_OPEN
+            self.probes_in_flight = 0
+            print(f"Circuit {self.name}: half-open, probing")
+        if self.state == OPEN or (self.state == HALF_OPEN and self.probes_in_flight >= self.half_open_probes):
+            self.rejected += 1
+            return False
+        if self.state == HALF_OPEN:
+            self.probes_in_flight += 1
+        self.calls += 1
+        return True
+
+    def record_success(self):
+        if self.state == HALF_OPEN:
+            print(f"Circuit {self.name}: probe succeeded, closing")
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.probes_in_flight = 0
+
+    def record_failure(self, error: BaseException = None):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = repr(error) if error else None
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def release(self):
+        """Frees a probe slot for a call that ended without a verdict (e.g. a 4xx)."""
+        if self.state == HALF_OPEN and self.probes_in_flight:
+            self.probes_in_flight -= 1
+
+    def _open(self):
+        if self.state != OPEN:
+            self.times_opened += 1
+            print(f"Circuit {self.name}: OPEN after {self.consecutive_failures} consecutive failure(s): {self.last_error}")
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probes_in_flight = 0
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = LLM_CALL_TIMEOUT) -> Any:
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+        try:
+            result = await asyncio.wait_for(fn(), timeout) if timeout else await fn()
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        except Exception as e:
+            if is_backend_failure(e):
+                self.record_failure(e)
+            else:
+                self.release()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = round(max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)), 1)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+            "retry_in": retry_in,
+            "last_error": self.last_error
+        }
+
+
+class BreakerRegistry:
+    """
+    One breaker per (provider, model), plus one per (provider, model, kind) for
+    traffic that fails differently, e.g. "media" so slow audio/video calls
+    can't open the breaker chat depends on.
+    """
+
+    def __init__(self):
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, provider: str, model: str, kind: str = None) -> CircuitBreaker:
+        name = f"{provider}:{model}:{kind}" if kind else f"{provider}:{model}"
+        if name not in self.breakers:
+            self.breakers[name] = CircuitBreaker(name)
+        return self.breakers[name]
+
+    def stats(self) -> dict:
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
+
+
+breakers = BreakerRegistry()
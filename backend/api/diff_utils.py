@@ -0,0 +1,191 @@
+import os
+from typing import List, Dict, Optional
+
+# Max characters of diff per review prompt. Big PRs are split into several
+# shards of at most this size and reviewed concurrently.
+SHARD_CHARS = int(os.getenv("PR_REVIEW_SHARD_CHARS", "12000"))
+# Hard cap on shards per PR so a giant vendored diff can't fan out into
+# hundreds of LLM calls.
+MAX_SHARDS = int(os.getenv("PR_REVIEW_MAX_SHARDS", "20"))
+
+CATEGORY_ORDER = {"Security": 0, "Performance": 1, "Opinion": 2}
+
+
+def _file_path(header_lines: List[str]) -> str:
+    """Best-effort path of a file section from its header lines."""
+    new_path = None
+    old_path = None
+    for line in header_lines:
+        if line.startswith("+++ "):
+            new_path = line[4:].strip()
+        elif line.startswith("--- "):
+            old_path = line[4:].strip()
+
+    for path in (new_path, old_path):
+        if path and path != "/dev/null":
+            return path[2:] if path.startswith(("a/", "b/")) else path
+
+    # Binary files / pure renames have no ---/+++ lines
+    if header_lines and header_lines[0].startswith("diff --git "):
+        parts = header_lines[0].split(" b/", 1)
+        if len(parts) == 2:
+            return parts[1].strip()
+    return "unknown"
+
+
+def parse_diff(diff: str) -> List[Dict]:
+    """
+    Splits a unified diff into file sections.
+    Returns [{"path": str, "header": str, "hunks": [str, ...]}] where header is
+    everything before the first hunk and each hunk starts with its "@@" line.
+    """
+    lines = diff.splitlines(keepends=True)
+    files = []
+    current = None
+
+    for line in lines:
+        if line.startswith("diff --git ") or current is None:
+            if current is not None:
+                files.append(current)
+            current = {"header_lines": [], "hunks": []}
+            if not line.startswith("diff --git ") and not line.startswith(("--- ", "+++ ", "@@")):
+                # Junk before the first file (e.g. an email-style patch preamble)
+                current["header_lines"].append(line)
+                continue
+
+        if line.startswith("@@"):
+            current["hunks"].append([line])
+        elif current["hunks"]:
+            current["hunks"][-1].append(line)
+        else:
+            current["header_lines"].append(line)
+
+    if current is not None:
+        files.append(current)
+
+    return [
+        {
+            "path": _file_path(f["header_lines"]),
+            "header": "".join(f["header_lines"]),
+            "hunks": ["".join(h) for h in f["hunks"]],
+        }
+        for f in files
+        if f["header_lines"] or f["hunks"]
+    ]
+
+
+def _split_hunk(hunk: str, budget: int) -> List[str]:
+    """Cuts a single oversized hunk on line boundaries."""
+    pieces = []
+    buf = ""
+    for line in hunk.splitlines(keepends=True):
+        if buf and len(buf) + len(line) > budget:
+            pieces.append(buf)
+            buf = ""
+        buf += line
+    if buf:
+        pieces.append(buf)
+    return pieces
+
+
+def split_diff(diff: str, max_chars: int = SHARD_CHARS, max_shards: int = MAX_SHARDS,
+               skipped: Optional[List[str]] = None) -> List[str]:
+    """
+    Packs a unified diff into shards of at most ~max_chars, never cutting a file
+    header off its hunks. Small files are grouped together; a file bigger than
+    max_chars is split per hunk, and each shard repeats the file header so the
+    reviewer always knows which file it is looking at.
+    Anything past max_shards isn't reviewed; pass a list as skipped to collect
+    the paths of those files.
+    """
+    if len(diff) <= max_chars:
+        return [diff] if diff.strip() else []
+
+    # Break everything into (path, header + body) units that fit the budget
+    units = []
+    for f in parse_diff(diff):
+        header = f["header"]
+        body = "".join(f["hunks"])
+        if len(header) + len(body) <= max_chars:
+            units.append((f["path"], header + body))
+            continue
+
+        budget = max(max_chars - len(header), 1)
+        chunk = ""
+        for hunk in f["hunks"]:
+            pieces = [hunk] if len(hunk) <= budget else _split_hunk(hunk, budget)
+            for piece in pieces:
+                if chunk and len(chunk) + len(piece) > budget:
+                    units.append((f["path"], header + chunk))
+                    chunk = ""
+                chunk += piece
+        if chunk or not f["hunks"]:
+            units.append((f["path"], header + chunk))
+
+    # Greedily pack units into shards
+    shards = []
+    current = ""
+    for i, (_, unit) in enumerate(units):
+        if current and len(current) + len(unit) > max_chars:
+            shards.append(current)
+            current = ""
+            if len(shards) == max_shards:
+                if skipped is not None:
+                    skipped.extend(dict.fromkeys(p for p, _ in units[i:]))
+                return shards
+        current += unit
+    if current:
+        shards.append(current)
+    return shards
+
+
+def merge_reviews(reviews: List[dict], skipped: Optional[List[str]] = None) -> dict:
+    """
+    Reduces per-shard review results into a single review.
+    Comments are de-duplicated on (file, line, message) and the summaries of
+    shards that failed (marked with an "error" key) are dropped as long as at
+    least one shard succeeded; the result is then marked "incomplete". Files
+    that didn't fit in any shard are listed at the end of the summary.
+    """
+    if not reviews:
+        return {"summary": "No summary provided.", "comments": []}
+    if len(reviews) == 1 and not skipped:
+        return reviews[0]
+
+    summaries = []
+    failed = [review for review in reviews if review.get("error")]
+    for review in reviews:
+        summary = (review.get("summary") or "").strip()
+        if summary and not review.get("error") and summary not in summaries:
+            summaries.append(summary)
+
+    comments = []
+    seen = set()
+    for review in reviews:
+        for comment in review.get("comments") or []:
+            key = (
+                str(comment.get("file", "")).strip(),
+                str(comment.get("line", "")).strip(),
+                " ".join(str(comment.get("message", "")).lower().split()),
+            )
+            if key in seen:
+                continue
+            seen.add(key)
+            comments.append(comment)
+
+    comments.sort(key=lambda c: CATEGORY_ORDER.get(c.get("category"), 3))
+
+    if len(failed) == len(reviews):
+        merged = {"summary": failed[0].get("summary") or "No summary provided.", "comments": comments, "error": failed[0]["error"]}
+    else:
+        summary = "\n\n".join(summaries) or "No summary provided."
+        merged = {"summary": summary, "comments": comments}
+        if failed:
+            merged["summary"] += f"\n\n(I couldn't get through {len(failed)} of {len(reviews)} parts of this PR.)"
+            merged["incomplete"] = True
+
+    if skipped:
+        shown = ", ".join(skipped[:10]) + (f" and {len(skipped) - 10} more" if len(skipped) > 10 else "")
+        merged["summary"] += f"\n\n(This PR was too big to review in full; I skipped {len(skipped)} file(s): {shown}.)"
+        merged["skipped_files"] = skipped
+    return merged
@@ -0,0 +1,174 @@
+import re
+import json
+import base64
+import hashlib
+import httpx
+from .fakes import LatencyModel, FAKE_GITHUB_LATENCY_MS, FAKE_GITHUB_ERROR_RATE
+
+FAKE_OWNER = "fake-owner"
+
+
+def _sha(obj) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True).encode()).hexdigest()
+
+
+class FakeRepo:
+    def __init__(self, full_name: str, auto_init: bool = True):
+        self.full_name = full_name
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.refs = {}
+        self.contents_puts = []
+        self.collaborators = []
+        self.reviews = []
+        if auto_init:
+            readme = self.blob(f"# {full_name.split('/')[-1]}")
+            tree = self.store(self.trees, {"README.md": readme})
+            self.refs["heads/main"] = self.store(self.commits, {"tree": tree, "parents": [], "message": "Initial commit"})
+
+    def store(self, table, obj) -> str:
+        sha = _sha(obj)
+        table[sha] = obj
+        return sha
+
+    def blob(self, content: str) -> str:
+        return self.store(self.blobs, content)
+
+    def head_files(self, branch: str = "main") -> dict:
+        tree = self.trees[self.commits[self.refs[f"heads/{branch}"]]["tree"]]
+        return {path: self.blobs[sha] for path, sha in tree.items()}
+
+    def history(self, branch: str = "main") -> list:
+        shas = []
+        sha = self.refs.get(f"heads/{branch}")
+        while sha:
+            shas.append(sha)
+            parents = self.commits[sha]["parents"]
+            sha = parents[0] if parents else None
+        return shas
+
+
+class FakeGitHub:
+    """
+    In-memory stand-in for the parts of the GitHub REST API the backend uses:
+    repo creation, contents and Git Data APIs, collaborators, commit/tree
+    reads for RAG sync, PR reviews and .diff downloads from github.com.
+    Use handler() with httpx.MockTransport. Repos are created on first use.
+    """
+
+    def __init__(self, auto_init: bool = True, fail_on=None, latency: LatencyModel = None):
+        self.auto_init = auto_init
+        self.fail_on = fail_on
+        self.latency = latency or LatencyModel(0)
+        self.repos = {}
+        self.calls = []
+
+    def repo(self, full_name: str) -> FakeRepo:
+        if full_name not in self.repos:
+            self.repos[full_name] = FakeRepo(full_name, self.auto_init)
+        return self.repos[full_name]
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        await self.latency.wait()
+        if self.latency.should_fail():
+            return httpx.Response(502, json={"message": "Bad Gateway (injected)"})
+        if request.url.host == "github.com":
+            return self._diff(request)
+
+        match = re.match(r"^/repos/([^/]+/[^/]+)(/.*)?$", request.url.path)
+        path = (match.group(2) or "") if match else request.url.path
+        self.calls.append((request.method, path))
+        if self.fail_on and self.fail_on == (request.method, path):
+            return httpx.Response(500, json={"message": "Server Error"})
+        body = json.loads(request.content) if request.content else {}
+
+        if not match:
+            if request.method == "POST" and path == "/user/repos":
+                full_name = f"{FAKE_OWNER}/{body['name']}"
+                if full_name in self.repos:
+                    return httpx.Response(422, json={"message": "name already exists on this account"})
+                self.repos[full_name] = FakeRepo(full_name, body.get("auto_init", False))
+                return httpx.Response(201, json={
+                    "name": body["name"],
+                    "full_name": full_name,
+                    "html_url": f"https://github.com/{full_name}",
+                    "default_branch": "main"
+                })
+            return httpx.Response(404, json={"message": "Not Found"})
+
+        repo = self.repo(match.group(1))
+        api = f"{request.url.scheme}://{request.url.host}/repos/{repo.full_name}"
+
+        if request.method == "POST" and path == "/git/blobs":
+            content = base64.b64decode(body["content"]).decode()
+            return httpx.Response(201, json={"sha": repo.blob(content)})
+        if request.method == "GET" and path.startswith("/git/blobs/"):
+            content = repo.blobs[path.rsplit("/", 1)[1]]
+            return httpx.Response(200, json={"content": base64.b64encode(content.encode()).decode(), "encoding": "base64"})
+        if request.method == "GET" and path.startswith("/git/ref/"):
+            ref = path[len("/git/ref/"):]
+            if ref not in repo.refs:
+                return httpx.Response(409, json={"message": "Git Repository is empty."})
+            return httpx.Response(200, json={"object": {"sha": repo.refs[ref]}})
+        if request.method == "GET" and path.startswith("/git/commits/"):
+            commit = repo.commits[path.rsplit("/", 1)[1]]
+            return httpx.Response(200, json={"tree": {"sha": commit["tree"]}})
+        if request.method == "GET" and path.startswith("/git/trees/"):
+            sha = path.rsplit("/", 1)[1]
+            # Accepts a tree sha or a commit sha (as the real API does)
+            tree = repo.trees[sha] if sha in repo.trees else repo.trees[repo.commits[sha]["tree"]]
+            return httpx.Response(200, json={"tree": [
+                {"path": file_path, "type": "blob", "sha": blob_sha, "url": f"{api}/git/blobs/{blob_sha}"}
+                for file_path, blob_sha in tree.items()
+            ]})
+        if request.method == "POST" and path == "/git/trees":
+            entries = dict(repo.trees[body["base_tree"]]) if "base_tree" in body else {}
+            for entry in body["tree"]:
+                if entry["sha"] not in repo.blobs:
+                    return httpx.Response(422, json={"message": f"Invalid sha {entry['sha']}"})
+                entries[entry["path"]] = entry["sha"]
+            return httpx.Response(201, json={"sha": repo.store(repo.trees, entries)})
+        if request.method == "POST" and path == "/git/commits":
+            commit = {"tree": body["tree"], "parents": body["parents"], "message": body["message"]}
+            return httpx.Response(201, json={"sha": repo.store(repo.commits, commit)})
+        if request.method == "PATCH" and path.startswith("/git/refs/"):
+            repo.refs[path[len("/git/refs/"):]] = body["sha"]
+            return httpx.Response(200, json={"object": {"sha": body["sha"]}})
+        if request.method == "POST" and path == "/git/refs":
+            repo.refs[body["ref"][len("refs/"):]] = body["sha"]
+            return httpx.Response(201, json={"object": {"sha": body["sha"]}})
+        if request.method == "PUT" and path.startswith("/contents/"):
+            repo.contents_puts.append(path[len("/contents/"):])
+            return httpx.Response(201, json={"content": {}})
+        if request.method == "GET" and path == "/commits":
+            return httpx.Response(200, json=[{"sha": sha} for sha in repo.history()])
+        if request.method == "PUT" and path.startswith("/collaborators/"):
+            repo.collaborators.append(path.rsplit("/", 1)[1])
+            return httpx.Response(201, json={})
+        if request.method == "POST" and re.match(r"^/pulls/\d+/reviews$", path):
+            repo.reviews.append(body)
+            return httpx.Response(200, json={"id": len(repo.reviews)})
+        return httpx.Response(404, json={"message": "Not Found"})
+
+    def _diff(self, request: httpx.Request) -> httpx.Response:
+        """github.com/{owner}/{repo}/pull/{n}.diff - a small deterministic diff per PR."""
+        match = re.match(r"^/([^/]+/[^/]+)/pull/(\d+)\.diff$", request.url.path)
+        if not match:
+            return httpx.Response(404, text="Not Found")
+        number = int(match.group(2))
+        diff = "".join(
+            f"diff --git a/src/module_{i}.js b/src/module_{i}.js\n"
+            f"--- a/src/module_{i}.js\n+++ b/src/module_{i}.js\n"
+            f"@@ -1,3 +1,4 @@\n export function run{i}(items) {{\n-  return items[{i}];\n"
+            f"+  // PR {number}\n+  return items.length > {i} ? items[{i}] : null;\n }}\n"
+            for i in range(1 + number % 4)
+        )
+        etag = f'"{hashlib.sha1(diff.encode()).hexdigest()}"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, text=diff, headers={"ETag": etag})
+
+
+def fake_github_from_env() -> FakeGitHub:
+    return FakeGitHub(latency=LatencyModel(FAKE_GITHUB_LATENCY_MS, 0.4, FAKE_GITHUB_ERROR_RATE))
@@ -0,0 +1,325 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import itertools
+from types import SimpleNamespace
+from typing import List
+import httpx
+from google.genai import types
+
+# Knobs for the offline fakes (PROVIDER_MODE=fake). Latencies are log-normal
+# around the median; sigma 0 makes them constant.
+FAKE_SEED = int(os.getenv("FAKE_SEED", "0"))
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "400"))
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_TOKENS_PER_SEC = float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "80"))
+FAKE_LLM_OUTPUT_WORDS = int(os.getenv("FAKE_LLM_OUTPUT_WORDS", "40"))
+FAKE_FILE_PROCESSING_MS = float(os.getenv("FAKE_FILE_PROCESSING_MS", "1500"))
+FAKE_TTS_LATENCY_MS = float(os.getenv("FAKE_TTS_LATENCY_MS", "300"))
+FAKE_GITHUB_LATENCY_MS = float(os.getenv("FAKE_GITHUB_LATENCY_MS", "60"))
+FAKE_GITHUB_ERROR_RATE = float(os.getenv("FAKE_GITHUB_ERROR_RATE", "0"))
+
+WORDS = (
+    "the build is green after fixing the flaky login test and I am now looking at the "
+    "api pagination bug which seems related to caching so I will pair with mike on it "
+    "today there are no blockers except waiting for review on the dashboard refactor"
+).split()
+
+
+class FakeProviderError(Exception):
+    """Injected failure (mirrors a 503 from the real provider)."""
+
+    def __init__(self, message: str = "Fake provider unavailable", code: int = 503):
+        super().__init__(message)
+        self.code = code
+
+
+class LatencyModel:
+    """Seeded latency + error injection shared by a fake provider."""
+
+    def __init__(self, median_ms: float, sigma: float = 0.0, error_rate: float = 0.0, seed: int = FAKE_SEED):
+        self.median = median_ms / 1000
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        if self.sigma <= 0:
+            return self.median
+        return self.rng.lognormvariate(math.log(self.median), self.sigma)
+
+    def should_fail(self) -> bool:
+        self.calls += 1
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+    async def wait(self):
+        delay = self.sample()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+def _rng_for(*parts) -> random.Random:
+    digest = hashlib.sha256("\0".join(str(p) for p in parts).encode()).hexdigest()
+    return random.Random(int(digest[:16], 16) ^ FAKE_SEED)
+
+
+def fake_text(rng: random.Random, words: int) -> str:
+    start = rng.randrange(len(WORDS))
+    text = " ".join(WORDS[(start + i) % len(WORDS)] for i in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def fake_from_schema(schema: dict, rng: random.Random, name: str = "", index: int = 0):
+    """Deterministic value that satisfies a Gemini response_schema."""
+    kind = schema.get("type", "STRING").upper()
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if kind == "OBJECT":
+        properties = schema.get("properties", {})
+        order = schema.get("property_ordering") or list(properties)
+        return {key: fake_from_schema(properties[key], rng, key, index) for key in order if key in properties}
+    if kind == "ARRAY":
+        return [fake_from_schema(schema.get("items", {}), rng, name, i) for i in range(3)]
+    if kind == "INTEGER":
+        if name == "score":
+            return rng.choice([-5, 0, 1, 2])
+        return rng.randint(1, 50) if name == "line" else rng.randint(1, 5)
+    if kind == "NUMBER":
+        return round(rng.random(), 3)
+    if kind == "BOOLEAN":
+        return rng.random() < 0.5
+    if name in ("path", "file"):
+        return f"src/module_{index}.js"
+    if name == "content":
+        return f"// module {index}\nexport function run{index}(items) {{\n  return items.length > {index} ? items[{index}] : null;\n}}\n"
+    if name in ("repo_name", "project_name"):
+        return f"fake-project-{rng.randrange(1000)}"
+    return fake_text(rng, 12)
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _response(text: str, prompt_tokens: int, output_tokens: int = None) -> types.GenerateContentResponse:
+    """output_tokens overrides the count for stream chunks, whose usage is cumulative."""
+    if output_tokens is None:
+        output_tokens = count_tokens(text)
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens
+        )
+    )
+
+
+class FakeGemini:
+    """
+    In-process stand-in for the subset of google-genai we use (generate,
+    stream, embed, files) plus the resumable upload endpoint. Output depends
+    only on the input and FAKE_SEED; latency and failures come from the
+    LatencyModel, and streaming is paced at FAKE_LLM_TOKENS_PER_SEC.
+    """
+
+    upload_url = "https://fake-gemini.local/upload"
+
+    def __init__(self, latency: LatencyModel = None, tokens_per_sec: float = FAKE_LLM_TOKENS_PER_SEC, processing_ms: float = FAKE_FILE_PROCESSING_MS):
+        self.latency = latency or LatencyModel(FAKE_LLM_LATENCY_MS, FAKE_LLM_LATENCY_SIGMA, FAKE_LLM_ERROR_RATE)
+        self.tokens_per_sec = tokens_per_sec
+        self.processing = processing_ms / 1000
+        self.files = {}  # {name: {"file": types.File, "ready_at": monotonic time it turns ACTIVE}}
+        self.uploads = {}  # {upload id: {"meta": file metadata from the start request, "received": bytes}}
+        # Never reused, even after a delete or a finished upload frees a slot
+        self.upload_ids = itertools.count()
+        self.file_ids = itertools.count()
+
+    def _content(self, model: str, contents, config) -> str:
+        prompt = contents if isinstance(contents, str) else repr(contents)
+        rng = _rng_for(model, prompt, json.dumps(config, sort_keys=True, default=str) if config else "")
+        schema = (config or {}).get("response_schema") if isinstance(config, dict) else None
+        if schema:
+            return json.dumps(fake_from_schema(schema, rng))
+        return fake_text(rng, FAKE_LLM_OUTPUT_WORDS)
+
+    def _check(self):
+        if self.latency.should_fail():
+            raise FakeProviderError()
+
+    async def generate_content(self, model: str, contents, config=None):
+        self._check()
+        await self.latency.wait()
+        text = self._content(model, contents, config)
+        if self.tokens_per_sec:
+            await asyncio.sleep(count_tokens(text) / self.tokens_per_sec)
+        return _response(text, count_tokens(str(contents)))
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        self._check()
+        text = self._content(model, contents, config)
+        prompt_tokens = count_tokens(str(contents))
+
+        async def stream():
+            await self.latency.wait()  # time to first token
+            step = 32  # ~8 tokens per chunk
+            for i in range(0, len(text), step):
+                piece = text[i:i + step]
+                if self.tokens_per_sec:
+                    await asyncio.sleep(count_tokens(piece) / self.tokens_per_sec)
+                yield _response(piece, prompt_tokens, count_tokens(text[:i + step]))
+        return stream()
+
+    def embed(self, contents) -> types.EmbedContentResponse:
+        rng = _rng_for("embed", contents)
+        values = [rng.gauss(0, 1) for _ in range(768)]
+        return types.EmbedContentResponse(embeddings=[types.ContentEmbedding(values=values)])
+
+    # --- files ---------------------------------------------------------------
+
+    def get_file(self, name: str) -> types.File:
+        entry = self.files.get(name)
+        if entry is None:
+            raise FakeProviderError(f"File {name} not found", code=404)
+        state = "ACTIVE" if time.monotonic() >= entry["ready_at"] else "PROCESSING"
+        return entry["file"].model_copy(update={"state": types.FileState(state)})
+
+    def list_files(self) -> List[types.File]:
+        """Newest first, like the Files API."""
+        return [self.get_file(name) for name in reversed(list(self.files))]
+
+    async def handle_upload(self, request: httpx.Request) -> httpx.Response:
+        """Resumable upload protocol, as used by ai_utils.upload_media_stream."""
+        await self.latency.wait()
+        command = request.headers.get("x-goog-upload-command", "")
+        if command == "start":
+            upload_id = hashlib.sha1(f"{next(self.upload_ids)}".encode()).hexdigest()[:12]
+            meta = json.loads(request.content or b"{}").get("file", {})
+            self.uploads[upload_id] = {"meta": meta, "received": 0}
+            return httpx.Response(200, headers={"x-goog-upload-url": f"{self.upload_url}/{upload_id}", "x-goog-upload-status": "active"})
+
+        upload_id = request.url.path.rsplit("/", 1)[-1]
+        upload = self.uploads.get(upload_id)
+        if upload is None:
+            return httpx.Response(404, json={"error": {"message": "Unknown upload"}})
+        upload["received"] += len(request.content)
+        if "finalize" not in command:
+            return httpx.Response(200, headers={"x-goog-upload-status": "active"})
+
+        del self.uploads[upload_id]
+        name = f"files/fake{next(self.file_ids)}"
+        myfile = types.File(
+            name=name,
+            display_name=upload["meta"].get("display_name"),
+            mime_type=upload["meta"].get("mime_type"),
+            size_bytes=upload["received"],
+            state=types.FileState.PROCESSING
+        )
+        self.files[name] = {"file": myfile, "ready_at": time.monotonic() + self.processing}
+        return httpx.Response(200, headers={"x-goog-upload-status": "final"}, json={"file": myfile.model_dump(mode="json", by_alias=True, exclude_none=True)})
+
+
+class _FakeModels:
+    def __init__(self, gemini: FakeGemini):
+        self.gemini = gemini
+
+    async def generate_content(self, model: str, contents, config=None):
+        return await self.gemini.generate_content(model, contents, config)
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        return await self.gemini.generate_content_stream(model, contents, config)
+
+    async def embed_content(self, model: str, contents, config=None):
+        self.gemini._check()
+        await self.gemini.latency.wait()
+        return self.gemini.embed(contents)
+
+
+class _FakeFiles:
+    def __init__(self, gemini: FakeGemini):
+        self.gemini = gemini
+
+    async def get(self, name: str):
+        await self.gemini.latency.wait()
+        return self.gemini.get_file(name)
+
+    async def list(self, config=None):
+        await self.gemini.latency.wait()
+        return _FakePager(self.gemini, self.gemini.list_files(), (config or {}).get("page_size", 100))
+
+    async def delete(self, name: str):
+        self.gemini.files.pop(name, None)
+
+
+class _FakePager:
+    """files.list pager: `page`, and next_page() raising IndexError after the last one."""
+
+    def __init__(self, gemini: FakeGemini, items: list, page_size: int):
+        self.gemini = gemini
+        self.items = items
+        self.page_size = page_size
+        self.offset = 0
+        self.page = items[:page_size]
+
+    async def next_page(self):
+        if self.offset + self.page_size >= len(self.items):
+            raise IndexError("No more pages to fetch.")
+        await self.gemini.latency.wait()
+        self.offset += self.page_size
+        self.page = self.items[self.offset:self.offset + self.page_size]
+        return self.page
+
+
+class _SyncModels:
+    """Blocking variants, like the real client's sync surface."""
+
+    def __init__(self, gemini: FakeGemini):
+        self.gemini = gemini
+
+    def generate_content(self, model: str, contents, config=None):
+        self.gemini._check()
+        time.sleep(self.gemini.latency.sample())
+        return _response(self.gemini._content(model, contents, config), count_tokens(str(contents)))
+
+    def embed_content(self, model: str, contents, config=None):
+        self.gemini._check()
+        time.sleep(self.gemini.latency.sample())
+        return self.gemini.embed(contents)
+
+
+class FakeGenAIClient:
+    """Drop-in for genai.Client backed by a FakeGemini."""
+
+    def __init__(self, gemini: FakeGemini):
+        self.models = _SyncModels(gemini)
+        self.aio = SimpleNamespace(models=_FakeModels(gemini), files=_FakeFiles(gemini))
+
+
+class FakeTTS:
+    """Returns a short silent MP3 after a simulated synthesis delay."""
+
+    # One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz)
+    FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+    def __init__(self, latency: LatencyModel = None):
+        self.latency = latency or LatencyModel(FAKE_TTS_LATENCY_MS, 0.3)
+
+    def synthesize(self, text: str) -> bytes:
+        if self.latency.should_fail():
+            raise FakeProviderError("Fake TTS unavailable")
+        time.sleep(self.latency.sample())
+        # ~26 ms per frame; roughly 150 words per minute of speech
+        frames = max(1, int(len(text.split()) * 0.4 / 0.026))
+        return self.FRAME * frames
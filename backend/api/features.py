@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, UploadFile, File
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from database import get_db
+from database import get_db, AsyncSessionLocal
 from models import StandupSession, Retrospective, User
 from .gamification_utils import calculate_truthfulness
 from .storage_utils import save_upload_file
 from .ai_utils import generate_coworker_update, generate_voice, transcribe_audio
+from .jobs import JobManager, Job
+from .llm_usage import llm_user
 from typing import List, Optional
 from pydantic import BaseModel
 import random
 import os
+import asyncio
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -17,37 +20,61 @@ print("LOADING BACKEND/API/FEATURES.PY - IF YOU SEE THIS, THE CODE IS UPDATED")
 
 router = APIRouter(prefix="/features", tags=["features"])
 
-@router.post("/standups/upload")
-async def upload_standup(user_id: int, file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+# Bounded pool for media jobs (upload to Gemini, wait for processing, analyze)
+media_jobs = JobManager("media_processing", concurrency=int(os.getenv("MEDIA_JOB_CONCURRENCY", "4")), single_active=False)
+
+@router.post("/standups/upload", status_code=202)
+async def upload_standup(user_id: int, file: UploadFile = File(...)):
+    """Saves the recording and queues transcription + truthfulness scoring.
+
+    Returns a job immediately; the result ({url, transcript}) arrives as a
+    `job_progress` event in the user's socket room or via GET /features/jobs/{job_id}.
+    """
     # Upload to local storage
-    file_url = save_upload_file(file, f"standup_{user_id}_{file.filename}")
-    
+    filename = f"standup_{user_id}_{file.filename}"
+    file_url = await save_upload_file(file, filename)
+    file_path = os.path.join("static", filename)
+
+    job = media_jobs.submit(user_id, lambda job: run_standup(job, user_id, file_url, file_path))
+    return {**job.to_dict(), "url": file_url}
+
+@router.get("/jobs/{job_id}")
+async def get_media_job(job_id: str, user_id: int):
+    job = media_jobs.get(job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+async def run_standup(job: Job, user_id: int, file_url: str, file_path: str) -> dict:
+    llm_user.set(user_id)
     # Transcribe
-    file_path = os.path.join("static", f"standup_{user_id}_{file.filename}")
+    await job.report("transcribing")
     transcript = await transcribe_audio(file_path)
-    
-    standup = StandupSession(user_id=user_id, audio_url=file_url) #, transcript=transcript)
-    db.add(standup)
-    
-    # Update Truthfulness based on transcript
-    stmt = select(User).where(User.id == user_id)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
-    
-    if user:
-        await calculate_truthfulness(user, transcript, db)
+
+    await job.report("scoring")
+    async with AsyncSessionLocal() as db:
+        standup = StandupSession(user_id=user_id, audio_url=file_url) #, transcript=transcript)
+        db.add(standup)
         
-        from .activity import log_activity
-        from models import ActivityType
-        await log_activity(
-            db,
-            user_id,
-            ActivityType.STANDUP_COMPLETED,
-            "Completed daily standup",
-            {"transcript": transcript[:100] + "..." if len(transcript) > 100 else transcript}
-        )
+        # Update Truthfulness based on transcript
+        stmt = select(User).where(User.id == user_id)
+        result = await db.execute(stmt)
+        user = result.scalar_one_or_none()
         
-    await db.commit()
+        if user:
+            await calculate_truthfulness(user, transcript, db)
+            
+            from .activity import log_activity
+            from models import ActivityType
+            await log_activity(
+                db,
+                user_id,
+                ActivityType.STANDUP_COMPLETED,
+                "Completed daily standup",
+                {"transcript": transcript[:100] + "..." if len(transcript) > 100 else transcript}
+            )
+            
+        await db.commit()
     return {"url": file_url, "transcript": transcript}
 
 from fastapi import Response
@@ -121,7 +148,7 @@ async def get_coworker_update(response: Response):
 @router.post("/retrospectives/upload")
 async def upload_retrospective(user_id: int, file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
     # Upload to local storage
-    file_url = save_upload_file(file, f"retro_{user_id}_{file.filename}")
+    file_url = await save_upload_file(file, f"retro_{user_id}_{file.filename}")
     
     retro = Retrospective(user_id=user_id, video_url=file_url, consent_given=True)
     db.add(retro)
@@ -233,8 +260,9 @@ async def get_sprint_stats(user_id: int, db: AsyncSession = Depends(get_db)):
 
 from .ai_utils import analyze_video
 
-@router.post("/sprint-review/analyze")
-async def analyze_sprint_review(user_id: int, duration: str = None, file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+@router.post("/sprint-review/analyze", status_code=202)
+async def analyze_sprint_review(user_id: int, duration: str = None, file: UploadFile = File(...)):
+    """Saves the video temporarily and queues the analysis; the report arrives as the job result."""
     # Extract extension
     ext = os.path.splitext(file.filename)[1].lower() or ".mp4"
     if ext not in [".mp4", ".mov", ".webm"]:
@@ -243,34 +271,41 @@ async def analyze_sprint_review(user_id: int, duration: str = None, file: Upload
 
     # Upload to local storage temporarily
     filename = f"sprint_review_{user_id}_{int(time.time())}{ext}"
-    file_url = save_upload_file(file, filename)
+    await save_upload_file(file, filename)
     
     # Absolute path for Gemini upload
     current_dir = os.path.dirname(os.path.abspath(__file__))
     backend_dir = os.path.dirname(current_dir)
     file_path = os.path.join(backend_dir, "static", filename)
-    
+
+    job = media_jobs.submit(user_id, lambda job: run_sprint_review(job, user_id, file_path, duration))
+    return job.to_dict()
+
+async def run_sprint_review(job: Job, user_id: int, file_path: str, duration: str = None) -> dict:
+    llm_user.set(user_id)
     try:
         # Analyze video
+        await job.report("analyzing")
         report = await analyze_video(file_path, duration)
         
         # Log Activity
         from .activity import log_activity
         from models import ActivityType
-        await log_activity(
-            db,
-            user_id,
-            ActivityType.RETROSPECTIVE_COMPLETED,
-            "Completed sprint review video analysis",
-            {"report": report}
-        )
-        await db.commit()
+        async with AsyncSessionLocal() as db:
+            await log_activity(
+                db,
+                user_id,
+                ActivityType.RETROSPECTIVE_COMPLETED,
+                "Completed sprint review video analysis",
+                {"report": report}
+            )
+            await db.commit()
         
         return {"report": report}
     finally:
         # Cleanup: delete the file after analysis as requested
         if os.path.exists(file_path):
-            os.remove(file_path)
+            await asyncio.to_thread(os.remove, file_path)
 
 @router.get("/sprint-review/history")
 async def get_sprint_review_history(user_id: int, db: AsyncSession = Depends(get_db)):
@@ -316,6 +351,7 @@ async def chat_with_senior_colleague(user_id: int, request: SeniorColleagueChatR
     if not user or not user.repo_full_name:
         return {"response": "I don't see a repository linked to your account. Have you completed onboarding yet?"}
         
+    llm_user.set(user_id)
     response = await rag_engine.query(user_id, user.repo_full_name, request.message)
     return {"response": response}
 
@@ -0,0 +1,111 @@
+import os
+import asyncio
+from typing import Awaitable, Callable, Dict, List
+
+# Backoff for checking uploaded media until the provider has processed it
+FILE_POLL_INITIAL = float(os.getenv("FILE_POLL_INITIAL", "1"))
+FILE_POLL_MAX = float(os.getenv("FILE_POLL_MAX", "16"))
+FILE_POLL_TIMEOUT = float(os.getenv("FILE_POLL_TIMEOUT", "180"))
+
+
+class FileProcessingFailed(Exception):
+    pass
+
+
+class FilePoller:
+    """
+    Waits for uploaded provider files to become ACTIVE with a single shared
+    polling loop. Every tick checks the state of ALL pending files in one
+    batched fetch; the interval starts at `initial` and doubles (up to
+    `maximum`) while nothing changes, and resets when a file is added or
+    finishes.
+
+    fetch(names) -> {name: file} must return objects with `.state.name`;
+    names missing from the result are simply checked again next tick.
+    """
+
+    def __init__(self, fetch: Callable[[List[str]], Awaitable[Dict]], initial: float = FILE_POLL_INITIAL, maximum: float = FILE_POLL_MAX):
+        self.fetch = fetch
+        self.initial = initial
+        self.maximum = maximum
+        self.interval = initial
+        self.pending = {}  # {name: Future}
+        self.wake = asyncio.Event()
+        self.task = None
+        self.polls = 0
+        self.files_checked = 0
+        self.completed = 0
+
+    async def wait_active(self, name: str, timeout: float = FILE_POLL_TIMEOUT):
+        future = self.pending.get(name)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.pending[name] = future
+            self.interval = self.initial
+            self.wake.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.pending.pop(name, None)
+            raise TimeoutError(f"Timeout waiting for {name} to be ACTIVE")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.interval
+        while self.pending:
+            self.wake.clear()
+            remaining = deadline - loop.time()
+            if remaining > 0:
+                try:
+                    await asyncio.wait_for(self.wake.wait(), remaining)
+                    # A new file (which reset the backoff) can bring the next
+                    # check forward but never postpone it, so a steady stream
+                    # of uploads can't starve the status checks
+                    deadline = min(deadline, loop.time() + self.interval)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+
+            names = list(self.pending)
+            self.polls += 1
+            self.files_checked += len(names)
+            try:
+                files = await self.fetch(names)
+            except Exception as e:
+                print(f"Warning: file status check failed: {e}")
+                files = {}
+
+            progressed = False
+            for name, myfile in files.items():
+                future = self.pending.get(name)
+                if future is None:
+                    continue
+                state = myfile.state.name
+                if state == "ACTIVE":
+                    future.set_result(myfile)
+                elif state == "FAILED":
+                    future.set_exception(FileProcessingFailed(f"File processing failed in Gemini: {name}"))
+                else:
+                    continue
+                del self.pending[name]
+                self.completed += 1
+                progressed = True
+
+            if progressed:
+                self.interval = self.initial
+            else:
+                self.interval = min(self.interval * 2, self.maximum)
+            deadline = loop.time() + self.interval
+            if self.pending:
+                print(f"Waiting for {len(self.pending)} file(s) to be ACTIVE, next check in {self.interval:.0f}s")
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "polls": self.polls,
+            "files_checked": self.files_checked,
+            "completed": self.completed,
+            "interval": self.interval
+        }
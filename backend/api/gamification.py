@@ -5,7 +5,7 @@ from typing import List, Optional
 from pydantic import BaseModel, ConfigDict
 from database import get_db
 from models import User, Achievement
-from .socket_instance import sio
+from .socket_instance import emit_to_user
 
 router = APIRouter(prefix="/gamification", tags=["gamification"])
 
@@ -55,6 +55,31 @@ async def reset_sprint(user_id: int, db: AsyncSession = Depends(get_db)):
     await db.commit()
 
     # Notify frontend to refresh sprint data
-    await sio.emit("sprint_updated", {"user_id": user_id, "current_day": 1})
+    await emit_to_user("sprint_updated", {"user_id": user_id, "current_day": 1}, user_id)
 
     return {"message": "Sprint reset successfully", "new_start_date": user.sprint_start_date.isoformat()}
+
+class StandupTranscript(BaseModel):
+    user_id: int
+    transcript: str
+
+class TruthfulnessBatchRequest(BaseModel):
+    standups: List[StandupTranscript]
+
+@router.post("/truthfulness/batch")
+async def grade_standups_batch(request: TruthfulnessBatchRequest, db: AsyncSession = Depends(get_db)):
+    """Grades a whole cohort's standups with a few packed AI calls and applies the deltas in one commit."""
+    from .gamification_utils import calculate_truthfulness_batch
+
+    user_ids = {standup.user_id for standup in request.standups}
+    result = await db.execute(select(User).where(User.id.in_(user_ids)))
+    users = {user.id: user for user in result.scalars().all()}
+
+    standups = [(users[s.user_id], s.transcript) for s in request.standups if s.user_id in users]
+    results = await calculate_truthfulness_batch(standups, db) if standups else []
+    await db.commit()
+
+    return {
+        "results": results,
+        "skipped_user_ids": sorted(user_ids - set(users))
+    }
@@ -1,53 +1,55 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from models import User
-from .socket_instance import sio # Import the socket server
+from .socket_instance import emit_to_user
 
-async def award_xp(user: User, amount: int):
-    """Directly awards XP and checks for level up."""
-    if amount <= 0: return
+async def emit_stats(user: User, changed: dict):
+    """
+    stats_update carries only the fields that changed (plus user_id); clients
+    merge it into the stats they fetched, and slow clients get several merged.
+    """
+    if changed:
+        await emit_to_user("stats_update", {"user_id": user.id, **changed}, user.id)
+
+async def award_xp(user: User, amount: int, changed: dict = None):
+    """Directly awards XP and checks for level up. `changed` stats go out in the same stats_update."""
+    changed = dict(changed or {})
+    if amount <= 0:
+        await emit_stats(user, changed)
+        return
     
     user.xp = (user.xp or 0) + amount
+    changed["xp"] = user.xp
     
     # Check Level Up
     new_level = 1 + (user.xp // 100)
     if new_level > (user.level or 1):
         user.level = new_level
+        changed["level"] = new_level
         print(f"User {user.username} leveled up to {new_level}!")
-        await sio.emit("level_up", {"level": new_level, "username": user.username})
+        await emit_to_user("level_up", {"level": new_level, "username": user.username}, user.id)
 
-    # Emit generic stats update
-    await sio.emit("stats_update", {
-        "user_id": user.id,
-        "xp": user.xp,
-        "level": user.level,
-        "truthfulness": user.truthfulness,
-        "effort": user.effort,
-        "collaboration": user.collaboration,
-        "reliability": user.reliability,
-        "quality": user.quality
-    })
+    await emit_stats(user, changed)
 
 async def update_stat(user: User, stat_name: str, change: int):
     """Safely updates a user stat, clamping between 0 and 100. Awards XP."""
     current_value = getattr(user, stat_name, 50)
     new_value = max(0, min(100, current_value + change))
     setattr(user, stat_name, new_value)
+    changed = {stat_name: new_value} if new_value != current_value else {}
     
     # Award XP for positive actions
     if change > 0:
-        await award_xp(user, change * 10)
+        await award_xp(user, change * 10, changed)
     else:
-        # Just emit update if no XP change
-        await sio.emit("stats_update", {
-            "user_id": user.id,
-            "truthfulness": user.truthfulness,
-            "effort": user.effort,
-            "collaboration": user.collaboration,
-            "reliability": user.reliability,
-            "quality": user.quality,
-            "xp": user.xp,
-            "level": user.level
-        })
+        await emit_stats(user, changed)
+
+def format_ticket_summary(tickets) -> str:
+    """Formats a user's tickets for the truthfulness prompt."""
+    ticket_list = []
+    for t in tickets:
+        ticket_list.append(f"- [{t.status}] {t.title}")
+    
+    return "\n".join(ticket_list) if ticket_list else "No tickets assigned."
 
 async def calculate_truthfulness(user: User, standup_text: str, db: AsyncSession):
     """
@@ -63,11 +65,7 @@ async def calculate_truthfulness(user: User, standup_text: str, db: AsyncSession
     tickets = result.scalars().all()
     
     # Format ticket summary for AI
-    ticket_list = []
-    for t in tickets:
-        ticket_list.append(f"- [{t.status}] {t.title}")
-    
-    ticket_summary = "\n".join(ticket_list) if ticket_list else "No tickets assigned."
+    ticket_summary = format_ticket_summary(tickets)
     
     # AI Verification
     verification = await verify_standup_truthfulness(standup_text, ticket_summary)
@@ -78,6 +76,40 @@ async def calculate_truthfulness(user: User, standup_text: str, db: AsyncSession
     print(f"Truthfulness logic for {user.username}: {reason} (Score: {score_change})")
     await update_stat(user, "truthfulness", score_change)
 
+async def calculate_truthfulness_batch(standups: list, db: AsyncSession) -> list:
+    """
+    Grades many (user, standup_text) pairs at once: one ticket query for all
+    users and a few packed verification prompts. Each verification is then
+    applied on its own, exactly like calculate_truthfulness (clamping and XP
+    per standup). Caller commits.
+    Returns [{"user_id", "score", "explanation"}] in input order.
+    """
+    from models import Ticket
+    from sqlalchemy.future import select
+    from .ai_utils import verify_standups_batch
+
+    users = {user.id: user for user, _ in standups}
+    stmt = select(Ticket).where(Ticket.assignee_id.in_(list(users)))
+    result = await db.execute(stmt)
+    tickets_by_user = {}
+    for ticket in result.scalars().all():
+        tickets_by_user.setdefault(ticket.assignee_id, []).append(ticket)
+    summaries = {user_id: format_ticket_summary(tickets_by_user.get(user_id, [])) for user_id in users}
+
+    items = [
+        {"id": i, "transcript": standup_text, "ticket_summary": summaries[user.id]}
+        for i, (user, standup_text) in enumerate(standups)
+    ]
+    verifications = await verify_standups_batch(items)
+
+    results = []
+    for i, (user, _) in enumerate(standups):
+        verification = verifications[i]
+        print(f"Truthfulness batch for {user.username}: {verification['score']:+d}")
+        await update_stat(user, "truthfulness", verification["score"])
+        results.append({"user_id": user.id, **verification})
+    return results
+
 async def update_effort_and_collaboration(user: User, event_type: str, payload: dict):
     """
     Updates Effort and Collaboration based on GitHub events.
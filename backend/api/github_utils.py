@@ -0,0 +1,143 @@
+import os
+import base64
+import asyncio
+import httpx
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+
+
+def github_headers(token: str) -> dict:
+    return {
+        "Authorization": f"token {token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+
+
+async def push_file(client: httpx.AsyncClient, token: str, repo_full_name: str, path: str, content: str, message: str):
+    """Creates a single file (and commit) via the contents API."""
+    encoded = base64.b64encode(content.encode()).decode()
+    try:
+        result = await client.put(
+            f"{GITHUB_API_URL}/repos/{repo_full_name}/contents/{path}",
+            headers=github_headers(token),
+            json={
+                "message": message,
+                "content": encoded
+            }
+        )
+        print(f"DEBUG: Push result for {path}: {result.status_code}")
+        if result.status_code not in [200, 201]:
+            print(f"DEBUG: Push failed details: {result.text}")
+        return result
+    except Exception as e:
+        print(f"Warning: Failed to push file {path}: {e}")
+        return None
+
+
+# Max concurrent blob uploads when bootstrapping a repository
+BLOB_CONCURRENCY = int(os.getenv("GITHUB_BLOB_CONCURRENCY", "8"))
+
+
+class RepoBootstrapper:
+    """
+    Pushes a whole project as ONE commit through the Git Data API:
+    blobs are created concurrently as files are added, then a single tree,
+    commit and ref update is made in commit(). If any Git Data call fails,
+    commit() falls back to pushing each file through the contents API.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, token: str, repo_full_name: str, branch: str = "main"):
+        self.client = client
+        self.token = token
+        self.repo_full_name = repo_full_name
+        self.branch = branch
+        self.files = {}  # {path: content}, kept for the contents API fallback
+        self.blobs = {}  # {path: blob sha}
+        self.tasks = []
+        self.semaphore = asyncio.Semaphore(BLOB_CONCURRENCY)
+        self.api = f"{GITHUB_API_URL}/repos/{repo_full_name}/git"
+
+    def add_file(self, path: str, content: str) -> asyncio.Task:
+        """Schedules the blob upload for a file and returns its task (result: sha or None)."""
+        self.files[path] = content
+        task = asyncio.create_task(self._create_blob(path, content))
+        self.tasks.append(task)
+        return task
+
+    async def _create_blob(self, path: str, content: str):
+        async with self.semaphore:
+            try:
+                response = await self.client.post(
+                    f"{self.api}/blobs",
+                    headers=github_headers(self.token),
+                    json={"content": base64.b64encode(content.encode()).decode(), "encoding": "base64"}
+                )
+            except Exception as e:
+                print(f"Warning: Failed to create blob for {path}: {e}")
+                return None
+        if response.status_code != 201:
+            print(f"DEBUG: Blob creation failed for {path}: {response.status_code} {response.text}")
+            return None
+        sha = response.json()["sha"]
+        self.blobs[path] = sha
+        return sha
+
+    async def _request(self, method: str, url: str, expected, **kwargs) -> dict:
+        response = await self.client.request(method, url, headers=github_headers(self.token), **kwargs)
+        if response.status_code not in expected:
+            raise RuntimeError(f"{method} {url} -> {response.status_code}: {response.text}")
+        return response.json()
+
+    async def _commit_tree(self, message: str) -> str:
+        # Parent commit (auto_init repos already have one; empty repos don't)
+        parent_sha = None
+        base_tree = None
+        ref_response = await self.client.get(f"{self.api}/ref/heads/{self.branch}", headers=github_headers(self.token))
+        if ref_response.status_code == 200:
+            parent_sha = ref_response.json()["object"]["sha"]
+            parent = await self._request("GET", f"{self.api}/commits/{parent_sha}", [200])
+            base_tree = parent["tree"]["sha"]
+        elif ref_response.status_code not in [404, 409]:
+            raise RuntimeError(f"Failed to read ref heads/{self.branch}: {ref_response.status_code}")
+
+        tree_body = {
+            "tree": [
+                {"path": path, "mode": "100644", "type": "blob", "sha": sha}
+                for path, sha in self.blobs.items()
+            ]
+        }
+        if base_tree:
+            tree_body["base_tree"] = base_tree
+        tree = await self._request("POST", f"{self.api}/trees", [201], json=tree_body)
+
+        commit = await self._request("POST", f"{self.api}/commits", [201], json={
+            "message": message,
+            "tree": tree["sha"],
+            "parents": [parent_sha] if parent_sha else []
+        })
+
+        if parent_sha:
+            await self._request("PATCH", f"{self.api}/refs/heads/{self.branch}", [200], json={"sha": commit["sha"]})
+        else:
+            await self._request("POST", f"{self.api}/refs", [201], json={"ref": f"refs/heads/{self.branch}", "sha": commit["sha"]})
+        return commit["sha"]
+
+    async def commit(self, message: str) -> str:
+        """
+        Waits for pending blobs and creates the commit.
+        Returns "git_data" on success, or "contents_api" if it had to fall back.
+        """
+        await asyncio.gather(*self.tasks)
+        if self.files and len(self.blobs) == len(self.files):
+            try:
+                sha = await self._commit_tree(message)
+                print(f"DEBUG: Bootstrapped {self.repo_full_name} with {len(self.blobs)} files in commit {sha}")
+                return "git_data"
+            except Exception as e:
+                print(f"Warning: Git Data API bootstrap failed, falling back to contents API: {e}")
+        elif self.files:
+            print(f"Warning: {len(self.files) - len(self.blobs)} blob(s) failed, falling back to contents API")
+
+        for path, content in self.files.items():
+            await push_file(self.client, self.token, self.repo_full_name, path, content, f"Add {path}")
+        return "contents_api"
@@ -0,0 +1,128 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+from .socket_instance import sio, user_room
+
+# Fire-and-forget follow-ups spawned by jobs (kept referenced until done)
+_background = set()
+
+
+def spawn(coro: Awaitable) -> asyncio.Task:
+    task = asyncio.ensure_future(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+
+class Job:
+    def __init__(self, kind: str, user_id: int, idempotency_key: Optional[str] = None, request_key: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.user_id = user_id
+        self.idempotency_key = idempotency_key
+        self.request_key = request_key
+        self.status = "queued"
+        self.stage = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.task = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+    async def report(self, stage: str, **data):
+        """Records the current stage and pushes it to the user's socket room."""
+        self.stage = stage
+        self.progress = data
+        self.updated_at = time.time()
+        await sio.emit("job_progress", self.to_dict(), room=user_room(self.user_id))
+
+
+class JobManager:
+    """
+    Runs background jobs in a bounded pool and keeps their status in memory.
+    Jobs are de-duplicated per user by idempotency key; without a key, an
+    identical submission (same request_key, e.g. a double click) while the
+    first is still queued/running returns that job (unless single_active is
+    False, e.g. independent uploads). Different requests always run.
+
+    In-process only: with several web workers, a job (and its idempotency
+    key) is only known to the worker that accepted it, so GET .../jobs/{id}
+    on another worker returns 404. See "Multiple workers" in the README.
+    """
+
+    def __init__(self, kind: str, concurrency: int = 2, max_finished: int = 500, single_active: bool = True):
+        self.kind = kind
+        self.single_active = single_active
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_finished = max_finished
+        self.jobs = OrderedDict()  # {job_id: Job}
+        self.by_key = {}  # {(user_id, idempotency_key): job_id}
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def find_existing(self, user_id: int, idempotency_key: Optional[str], request_key: Optional[str] = None) -> Optional[Job]:
+        if idempotency_key:
+            return self.jobs.get(self.by_key.get((user_id, idempotency_key)))
+        if not self.single_active:
+            return None
+        for job in reversed(self.jobs.values()):
+            if job.user_id == user_id and job.request_key == request_key and not job.finished:
+                return job
+        return None
+
+    def submit(self, user_id: int, run: Callable[[Job], Awaitable[dict]], idempotency_key: Optional[str] = None, request_key: Optional[str] = None) -> Job:
+        """request_key identifies what is being asked for (e.g. the serialized request body)."""
+        existing = self.find_existing(user_id, idempotency_key, request_key)
+        if existing:
+            return existing
+
+        job = Job(self.kind, user_id, idempotency_key, request_key)
+        self.jobs[job.id] = job
+        if idempotency_key:
+            self.by_key[(user_id, idempotency_key)] = job.id
+        job.task = spawn(self._run(job, run))
+        self._prune()
+        return job
+
+    async def _run(self, job: Job, run: Callable[[Job], Awaitable[dict]]):
+        async with self.semaphore:
+            job.status = "running"
+            try:
+                await job.report("started")
+                job.result = await run(job)
+                job.status = "succeeded"
+                await job.report("done")
+            except Exception as e:
+                import traceback
+                traceback.print_exc()
+                job.status = "failed"
+                job.error = str(e)
+                await job.report("failed")
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job.id]
+            if job.idempotency_key:
+                self.by_key.pop((job.user_id, job.idempotency_key), None)
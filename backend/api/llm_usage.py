@@ -0,0 +1,116 @@
+import os
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from typing import Optional
+
+# USD per 1M tokens, used for the cost estimates (defaults: gemini-2.0-flash list price)
+LLM_PRICE_INPUT_PER_MTOK = float(os.getenv("LLM_PRICE_INPUT_PER_MTOK", "0.10"))
+LLM_PRICE_OUTPUT_PER_MTOK = float(os.getenv("LLM_PRICE_OUTPUT_PER_MTOK", "0.40"))
+# How many individual calls to keep for GET /api/ai/usage/recent
+LLM_USAGE_RECENT = int(os.getenv("LLM_USAGE_RECENT", "200"))
+
+# The user LLM calls made in the current task are billed to. Set it at the top
+# of an endpoint or job (contextvars follow tasks spawned from there).
+llm_user: ContextVar[Optional[int]] = ContextVar("llm_user", default=None)
+
+
+def estimate_cost(prompt_tokens: int, output_tokens: int) -> float:
+    return (prompt_tokens * LLM_PRICE_INPUT_PER_MTOK + output_tokens * LLM_PRICE_OUTPUT_PER_MTOK) / 1_000_000
+
+
+def usage_counts(response) -> tuple:
+    """(prompt tokens, output tokens) from a response's usage_metadata, zeros if absent."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return 0, 0
+    return usage.prompt_token_count or 0, usage.candidates_token_count or 0
+
+
+def _bucket() -> dict:
+    return {"calls": 0, "upstream_calls": 0, "cache_hits": 0, "errors": 0, "prompt_tokens": 0, "output_tokens": 0, "prompt_chars": 0, "latency_ms": 0.0, "cost_usd": 0.0}
+
+
+class UsageTracker:
+    """
+    Per-call accounting for LLM traffic: tokens, latency, model, calling
+    function, whether the call was served from the single-flight layer, and
+    which user it was made for. Keeps running totals per caller, model and
+    user plus a short log of recent calls.
+    """
+
+    def __init__(self, recent: int = LLM_USAGE_RECENT):
+        self.totals = _bucket()
+        self.by_caller = defaultdict(_bucket)
+        self.by_model = defaultdict(_bucket)
+        self.by_user = defaultdict(_bucket)
+        self.recent = deque(maxlen=recent)
+
+    def record(self, caller: str, model: str, prompt_tokens: int = 0, output_tokens: int = 0, latency: float = 0.0, cache: str = "miss", prompt_chars: int = 0, error: str = None, user_id: int = None) -> dict:
+        """cache is "miss" (went upstream) or "hit" (served by the single-flight layer or a result cache)."""
+        if user_id is None:
+            user_id = llm_user.get()
+        entry = {
+            "at": time.time(),
+            "caller": caller,
+            "model": model,
+            "user_id": user_id,
+            "cache": cache,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "prompt_chars": prompt_chars,
+            "latency_ms": round(latency * 1000, 1),
+            "cost_usd": estimate_cost(prompt_tokens, output_tokens),
+            "error": error
+        }
+        buckets = [self.totals, self.by_caller[caller], self.by_model[model]]
+        if user_id is not None:
+            buckets.append(self.by_user[user_id])
+        for bucket in buckets:
+            bucket["calls"] += 1
+            if cache == "miss":
+                bucket["upstream_calls"] += 1
+            else:
+                bucket["cache_hits"] += 1
+            if error:
+                bucket["errors"] += 1
+            bucket["prompt_tokens"] += prompt_tokens
+            bucket["output_tokens"] += output_tokens
+            bucket["prompt_chars"] += prompt_chars
+            bucket["latency_ms"] += entry["latency_ms"]
+            bucket["cost_usd"] += entry["cost_usd"]
+        self.recent.append(entry)
+        return entry
+
+    def record_response(self, caller: str, model: str, response, started: float, prompt=None, cache: str = "miss") -> dict:
+        prompt_tokens, output_tokens = usage_counts(response)
+        return self.record(caller, model, prompt_tokens, output_tokens, time.monotonic() - started, cache, prompt_chars=len(prompt) if isinstance(prompt, str) else 0)
+
+    @staticmethod
+    def _summary(bucket: dict) -> dict:
+        calls = bucket["calls"]
+        return {
+            **bucket,
+            "cost_usd": round(bucket["cost_usd"], 6),
+            "latency_ms": round(bucket["latency_ms"], 1),
+            "avg_latency_ms": round(bucket["latency_ms"] / calls, 1) if calls else 0.0,
+            "avg_prompt_tokens": round(bucket["prompt_tokens"] / bucket["upstream_calls"]) if bucket["upstream_calls"] else 0,
+            "cache_hit_rate": round(bucket["cache_hits"] / calls, 3) if calls else 0.0
+        }
+
+    def stats(self) -> dict:
+        # Most expensive call sites first - that's where caching/trimming pays off
+        by_caller = sorted(self.by_caller.items(), key=lambda item: item[1]["prompt_tokens"] + item[1]["output_tokens"], reverse=True)
+        return {
+            "totals": self._summary(self.totals),
+            "by_caller": {caller: self._summary(bucket) for caller, bucket in by_caller},
+            "by_model": {model: self._summary(bucket) for model, bucket in self.by_model.items()}
+        }
+
+    def user_rollup(self, user_id: int = None) -> dict:
+        if user_id is not None:
+            return self._summary(self.by_user.get(user_id) or _bucket())
+        return {str(uid): self._summary(bucket) for uid, bucket in self.by_user.items()}
+
+
+usage_tracker = UsageTracker()
@@ -0,0 +1,159 @@
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+# Quality profile for media sent to Gemini: "off" disables preprocessing.
+# Gemini samples video at ~1 fps and downmixes audio to 16 kHz mono anyway,
+# so anything above that mostly costs upload and processing time.
+MEDIA_PROFILE = os.getenv("MEDIA_PROFILE", "balanced")
+MEDIA_TRANSCODE_WORKERS = int(os.getenv("MEDIA_TRANSCODE_WORKERS", "2"))
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+
+PROFILES = {
+    # keyframes: ~1 frame per second (what the model samples) + the audio track
+    "low": {"audio_bitrate": "16k", "video_height": 360, "video_fps": 1, "video_crf": 35},
+    "balanced": {"audio_bitrate": "24k", "video_height": 480, "video_fps": 2, "video_crf": 32},
+    "high": {"audio_bitrate": "32k", "video_height": 720, "video_fps": 5, "video_crf": 28},
+}
+
+_pool = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MEDIA_TRANSCODE_WORKERS)
+    return _pool
+
+
+def audio_command(src: str, dst: str, profile: dict) -> List[str]:
+    """Mono 16 kHz Opus."""
+    return [
+        FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y", "-i", src,
+        "-vn", "-ac", "1", "-ar", "16000",
+        "-c:a", "libopus", "-b:a", profile["audio_bitrate"], "-application", "voip",
+        dst
+    ]
+
+
+def video_command(src: str, dst: str, profile: dict) -> List[str]:
+    """Downscaled, low frame rate H.264 MP4 with a mono 16 kHz AAC track."""
+    return [
+        FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y", "-i", src,
+        "-vf", f"scale=-2:'min({profile['video_height']},ih)',fps={profile['video_fps']}",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", str(profile["video_crf"]),
+        "-ac", "1", "-ar", "16000", "-c:a", "aac", "-b:a", profile["audio_bitrate"],
+        "-movflags", "+faststart",
+        dst
+    ]
+
+
+def _run_ffmpeg(command: List[str]) -> float:
+    """Runs in a pool worker process. Returns elapsed seconds."""
+    start = time.perf_counter()
+    subprocess.run(command, check=True, capture_output=True, timeout=600)
+    return time.perf_counter() - start
+
+
+class TranscodeStats:
+    def __init__(self):
+        self.files = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.transcode_seconds = 0.0
+        self.upload_bytes = 0
+        self.upload_seconds = 0.0
+
+    def record_upload(self, size: int, seconds: float):
+        self.upload_bytes += size
+        self.upload_seconds += seconds
+
+    def to_dict(self) -> dict:
+        saved = self.bytes_in - self.bytes_out
+        # Upload time saved, estimated from the throughput of actual uploads
+        throughput = self.upload_bytes / self.upload_seconds if self.upload_seconds else 0
+        return {
+            "profile": MEDIA_PROFILE,
+            "files": self.files,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": saved,
+            "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+            "transcode_seconds": round(self.transcode_seconds, 2),
+            "upload_seconds_saved_est": round(saved / throughput, 2) if throughput else None
+        }
+
+
+transcode_stats = TranscodeStats()
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG_BIN) is not None
+
+
+async def _preprocess(file_path: str, kind: str, profile_name: Optional[str]) -> str:
+    profile_name = profile_name or MEDIA_PROFILE
+    profile = PROFILES.get(profile_name)
+    if profile is None or not ffmpeg_available():
+        transcode_stats.skipped += 1
+        return file_path
+
+    suffix = ".ogg" if kind == "audio" else ".mp4"
+    fd, dst = tempfile.mkstemp(prefix="media_", suffix=suffix)
+    os.close(fd)
+    command = audio_command(file_path, dst, profile) if kind == "audio" else video_command(file_path, dst, profile)
+
+    try:
+        loop = asyncio.get_running_loop()
+        seconds = await loop.run_in_executor(_get_pool(), _run_ffmpeg, command)
+        size_in = await asyncio.to_thread(os.path.getsize, file_path)
+        size_out = await asyncio.to_thread(os.path.getsize, dst)
+    except Exception as e:
+        print(f"Warning: {kind} transcode of {file_path} failed, sending original: {e}")
+        transcode_stats.failed += 1
+        await asyncio.to_thread(_remove, dst)
+        return file_path
+
+    if size_out == 0 or size_out >= size_in:
+        # Already compact (or ffmpeg produced nothing useful): keep the original
+        transcode_stats.skipped += 1
+        await asyncio.to_thread(_remove, dst)
+        return file_path
+
+    transcode_stats.files += 1
+    transcode_stats.bytes_in += size_in
+    transcode_stats.bytes_out += size_out
+    transcode_stats.transcode_seconds += seconds
+    print(f"Transcoded {kind} {file_path} ({profile_name}): {size_in} -> {size_out} bytes in {seconds:.1f}s")
+    return dst
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def preprocess_audio(file_path: str, profile: Optional[str] = None) -> str:
+    """Returns the path of a mono 16 kHz Opus copy, or file_path if preprocessing is off/unavailable/not smaller."""
+    return await _preprocess(file_path, "audio", profile)
+
+
+async def preprocess_video(file_path: str, profile: Optional[str] = None) -> str:
+    """Returns the path of a downscaled, low-fps copy with a mono audio track, or file_path."""
+    return await _preprocess(file_path, "video", profile)
+
+
+async def discard_preprocessed(original: str, processed: str):
+    if processed != original:
+        await asyncio.to_thread(_remove, processed)
@@ -0,0 +1,121 @@
+import os
+import bisect
+from datetime import datetime
+from typing import Dict, List, Optional
+from .socket_manager import on_emit
+
+# Recent messages kept per channel; the newest history page is served from here
+MESSAGE_BUFFER_SIZE = int(os.getenv("MESSAGE_BUFFER_SIZE", "200"))
+
+
+def message_key(message: dict) -> tuple:
+    """(epoch seconds, id): the history query's (timestamp, id) order."""
+    timestamp = message["timestamp"]
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return (timestamp.timestamp(), message["id"])
+
+
+class ChannelBuffer:
+    """
+    The newest `size` messages of one channel as pre-serialized MessageOut
+    JSON, ordered by (timestamp, id) like the history query. `complete` means
+    the buffer holds the channel's whole history (it has fewer messages than
+    `size`), so any page can be answered from it.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.keys: List[tuple] = []  # (epoch seconds, id), sorted
+        self.payloads: Dict[int, bytes] = {}
+        self.loaded = False
+        self.complete = False
+
+    def add(self, key: tuple, payload: bytes) -> bool:
+        msg_id = key[1]
+        if msg_id in self.payloads:
+            self.payloads[msg_id] = payload
+            return False
+        if len(self.keys) >= self.size and key < self.keys[0]:
+            return False  # older than anything we keep
+        bisect.insort(self.keys, key)
+        self.payloads[msg_id] = payload
+        if len(self.keys) > self.size:
+            dropped = self.keys.pop(0)
+            del self.payloads[dropped[1]]
+            self.complete = False
+        return True
+
+    def page(self, limit: int, before: Optional[int] = None) -> Optional[List[bytes]]:
+        """Up to `limit` payloads (before message `before`), or None if the buffer can't tell."""
+        if not self.loaded:
+            return None
+        end = len(self.keys)
+        if before is not None:
+            if before not in self.payloads:
+                return None
+            end = next(i for i, key in enumerate(self.keys) if key[1] == before)
+        start = max(0, end - limit)
+        if end - start < limit and not self.complete:
+            return None
+        return [self.payloads[key[1]] for key in self.keys[start:end]]
+
+
+class MessageBuffer:
+    """
+    Write-through ring buffers of recent messages for the chat channels.
+    Every persisted new_message emit is appended (via an emit listener, so
+    with a pub/sub socket manager all workers see the same stream); a cold
+    channel is filled from the first history query.
+    """
+
+    def __init__(self, size: int = MESSAGE_BUFFER_SIZE):
+        self.size = size
+        self.channels: Dict[str, ChannelBuffer] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def channel(self, name: str) -> ChannelBuffer:
+        if name not in self.channels:
+            self.channels[name] = ChannelBuffer(self.size)
+        return self.channels[name]
+
+    def append(self, message: dict):
+        from .messages import serialize_message
+        if message.get("ephemeral") or not message.get("channel") or message.get("id") is None:
+            return
+        self.channel(message["channel"]).add(message_key(message), serialize_message(message))
+
+    def fill(self, channel: str, messages: List[dict], complete: bool):
+        """Seeds a channel from the database (merged with anything appended meanwhile)."""
+        from .messages import serialize_message
+        buffer = self.channel(channel)
+        for message in messages:
+            buffer.add(message_key(message), serialize_message(message))
+        buffer.loaded = True
+        buffer.complete = complete and len(buffer.keys) < self.size
+
+    def page(self, channel: str, limit: int, before: Optional[int] = None) -> Optional[bytes]:
+        """A JSON array for the history endpoint, or None on a miss."""
+        payloads = self.channel(channel).page(limit, before)
+        if payloads is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return b"[" + b",".join(payloads) + b"]"
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "channels": {name: len(buffer.keys) for name, buffer in self.channels.items() if buffer.loaded}
+        }
+
+
+message_buffer = MessageBuffer()
+
+
+@on_emit("new_message")
+def _buffer_new_message(data, room=None):
+    if isinstance(data, dict):
+        message_buffer.append(data)
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import and_, or_, func, literal_column
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List, Optional
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 from datetime import datetime
 from database import get_db
-from models import Message, User
-from .socket_instance import sio
+from models import Message, User, message_search_vector, MESSAGE_SEARCH_CONFIG
+from .socket_instance import emit_to_channel, CHANNELS
+from .message_buffer import message_buffer
+from .search_index import message_index
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
@@ -27,38 +30,170 @@ class MessageOut(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
 
+class MessageSearchHit(MessageOut):
+    rank: float
+
+class MessageSearchPage(BaseModel):
+    results: List[MessageSearchHit]
+    next_offset: Optional[int] = None
+
+# Page size for channel history (the newest page is what the chat opens on)
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+SEARCH_PAGE_SIZE = 20
+# Deep pages of a ranked search get slower; nobody reads past this
+MAX_SEARCH_OFFSET = 1000
+
+message_adapter = TypeAdapter(MessageOut)
+messages_adapter = TypeAdapter(List[MessageOut])
+
+HISTORY_COLUMNS = (
+    Message.id, Message.channel, Message.content, Message.sender_id, Message.is_bot, Message.timestamp,
+    User.username, User.avatar_url
+)
+
+def history_query(channel: str, limit: int, before=None, after=None):
+    """
+    Keyset page over (timestamp, id), served by ix_messages_channel_timestamp_id.
+    before/after are (timestamp, id) of the cursor message. Without `after` the
+    page is read newest-first (so the limit keeps the newest rows); callers
+    flip it back to chronological order.
+    """
+    stmt = select(*HISTORY_COLUMNS).outerjoin(User, Message.sender_id == User.id).where(Message.channel == channel)
+    if before:
+        ts, msg_id = before
+        stmt = stmt.where(or_(Message.timestamp < ts, and_(Message.timestamp == ts, Message.id < msg_id)))
+    if after:
+        ts, msg_id = after
+        stmt = stmt.where(or_(Message.timestamp > ts, and_(Message.timestamp == ts, Message.id > msg_id)))
+        return stmt.order_by(Message.timestamp.asc(), Message.id.asc()).limit(limit)
+    return stmt.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit)
+
+def message_dicts(rows) -> List[dict]:
+    return [
+        {
+            "id": row.id,
+            "channel": row.channel,
+            "content": row.content,
+            "sender_id": row.sender_id,
+            "is_bot": row.is_bot,
+            "timestamp": row.timestamp,
+            "sender_name": row.username or ("Bot" if row.is_bot else "Unknown"),
+            "sender_avatar": row.avatar_url
+        }
+        for row in rows
+    ]
+
+def serialize_messages(rows) -> bytes:
+    """Rows of HISTORY_COLUMNS -> JSON array of MessageOut, validated and encoded in one pass."""
+    return messages_adapter.dump_json(messages_adapter.validate_python(message_dicts(rows)))
+
+def serialize_message(message: dict) -> bytes:
+    """One MessageOut as JSON, in the same shape the history endpoint returns."""
+    return message_adapter.dump_json(message_adapter.validate_python(message))
+
+def search_query(q: str, limit: int, offset: int = 0, channel: Optional[str] = None):
+    """
+    Messages matching the web-search style query `q` ("quoted phrases", -not,
+    or), best ranked first. Matches come from the ix_messages_content_fts GIN
+    index; only those are ranked.
+    """
+    vector = message_search_vector(Message.content)
+    query = func.websearch_to_tsquery(literal_column(f"'{MESSAGE_SEARCH_CONFIG}'::regconfig"), q)
+    rank = func.ts_rank_cd(vector, query).label("rank")
+    stmt = select(*HISTORY_COLUMNS, rank).outerjoin(User, Message.sender_id == User.id).where(vector.op("@@")(query))
+    if channel:
+        stmt = stmt.where(Message.channel == channel)
+    return stmt.order_by(rank.desc(), Message.id.desc()).offset(offset).limit(limit)
+
+async def _search_fallback(db: AsyncSession, q: str, limit: int, offset: int, channel: Optional[str]) -> List[dict]:
+    """search_query for databases without Postgres text search, from the in-process index."""
+    if not message_index.loaded:
+        result = await db.stream(select(Message.id, Message.channel, Message.content).order_by(Message.id))
+        async for row in result:
+            message_index.add(row.id, row.channel, row.content)
+        message_index.loaded = True
+    ranked = message_index.search(q, limit, offset, channel)
+    if not ranked:
+        return []
+    result = await db.execute(select(*HISTORY_COLUMNS).outerjoin(User, Message.sender_id == User.id).where(Message.id.in_([msg_id for msg_id, _ in ranked])))
+    by_id = {message["id"]: message for message in message_dicts(result.all())}
+    return [{**by_id[msg_id], "rank": rank} for msg_id, rank in ranked if msg_id in by_id]
+
+async def _cursor(db: AsyncSession, channel: str, message_id: int):
+    result = await db.execute(select(Message.timestamp, Message.id).where(Message.id == message_id, Message.channel == channel))
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=400, detail=f"Unknown cursor message {message_id}")
+    return tuple(row)
+
+@router.get("/search", response_model=MessageSearchPage)
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=200),
+    channel: Optional[str] = None,
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_MESSAGE_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Full-text search over messages (optionally one channel), best matches
+    first. Pass `next_offset` back as `offset` for the next page.
+    """
+    if channel is not None and channel not in CHANNELS:
+         raise HTTPException(status_code=400, detail="Invalid channel")
+
+    # One extra row tells whether there is a next page
+    if db.bind.dialect.name == "postgresql":
+        result = await db.execute(search_query(q, limit + 1, offset, channel))
+        rows = result.all()
+        hits = [{**message, "rank": row.rank} for message, row in zip(message_dicts(rows), rows)]
+    else:
+        hits = await _search_fallback(db, q, limit + 1, offset, channel)
+    return {"results": hits[:limit], "next_offset": offset + limit if len(hits) > limit else None}
+
 @router.get("/{channel}", response_model=List[MessageOut])
-async def get_messages(channel: str, db: AsyncSession = Depends(get_db)):
-    # Join with User to get sender details
-    if channel not in ["general", "dev", "code-review", "random"]:
+async def get_messages(
+    channel: str,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=MAX_MESSAGE_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    One page of channel history in chronological order: the newest `limit`
+    messages, or those just before/after the message with id `before`/`after`.
+    Load older history by passing the first id you have as `before`.
+    """
+    if channel not in CHANNELS:
          raise HTTPException(status_code=400, detail="Invalid channel")
-         
-    stmt = select(Message, User).outerjoin(User, Message.sender_id == User.id).where(Message.channel == channel).order_by(Message.timestamp.asc())
-    result = await db.execute(stmt)
-    
-    messages = []
-    for row in result:
-        msg: Message = row[0]
-        user: User = row[1]
-        
-        msg_out = MessageOut.from_orm(msg)
-        if user:
-            msg_out.sender_name = user.username
-            msg_out.sender_avatar = user.avatar_url
-        else:
-            msg_out.sender_name = "Bot" if msg.is_bot else "Unknown"
-            
-        messages.append(msg_out)
-        
-    return messages
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    # The newest page (and pages just before it) usually come from the in-memory buffer
+    if after is None:
+        cached = message_buffer.page(channel, limit, before)
+        if cached is None and before is None and not message_buffer.channel(channel).loaded:
+            result = await db.execute(history_query(channel, message_buffer.size))
+            rows = result.all()
+            message_buffer.fill(channel, message_dicts(rows), complete=len(rows) < message_buffer.size)
+            cached = message_buffer.page(channel, limit)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+
+    before_key = await _cursor(db, channel, before) if before is not None else None
+    after_key = await _cursor(db, channel, after) if after is not None else None
+    result = await db.execute(history_query(channel, limit, before_key, after_key))
+    rows = result.all()
+    if after_key is None:
+        rows.reverse()
+    return Response(content=serialize_messages(rows), media_type="application/json")
 
 from .auth_utils import get_current_user
-from .ai_chat import trigger_ai_response_task
+from .ai_chat import reply_scheduler
 
 @router.post("", response_model=MessageOut)
 async def create_message(
     message: MessageCreate, 
-    background_tasks: BackgroundTasks, 
     current_user: User = Depends(get_current_user), 
     db: AsyncSession = Depends(get_db)
 ):
@@ -81,10 +216,10 @@ async def create_message(
     # Serialize datetime
     data['timestamp'] = data['timestamp'].isoformat()
     
-    await sio.emit("new_message", data)
+    await emit_to_channel("new_message", data, message.channel)
     
-    # Trigger AI response
-    background_tasks.add_task(trigger_ai_response_task, message.channel, message.content)
+    # Trigger AI response (bursts of messages are answered once)
+    reply_scheduler.submit(message.channel, {"sender": current_user.username, "content": message.content})
     
     # Update Collaboration Stat
     from .gamification_utils import update_stat
@@ -1,11 +1,12 @@
 from models import User, Ticket, TicketStatus, TicketPriority
-import base64
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Header
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db
+from database import get_db, AsyncSessionLocal
 from typing import Optional
+from .jobs import JobManager, Job
+import os
 
 router = APIRouter(prefix="/onboarding", tags=["onboarding"])
 
@@ -16,14 +17,25 @@ class RepoRequest(BaseModel):
     frontend_stack: str = "Vanilla JS"
     github_username: Optional[str] = None
 
-@router.post("/generate-repo")
-async def generate_repository(request: RepoRequest, user_id: int, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
-    """Generate a repository with AI-generated code containing intentional bugs"""
+# Bounded pool for repo generation jobs (LLM generation + GitHub pushes)
+repo_jobs = JobManager("repo_generation", concurrency=int(os.getenv("REPO_JOB_CONCURRENCY", "2")))
+
+@router.post("/generate-repo", status_code=202)
+async def generate_repository(
+    request: RepoRequest,
+    user_id: int,
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue generation of a repository with AI-generated code containing intentional bugs.
+
+    Returns a job id immediately; progress is pushed as `job_progress` events to
+    the user's socket room and can be polled at GET /onboarding/jobs/{job_id}.
+    Retrying with the same Idempotency-Key header returns the original job;
+    without one, only an identical request still in progress is reused.
+    """
     from sqlalchemy.future import select
-    from .ai_utils import generate_project_with_bugs
-    from .ai_chat import trigger_proactive_message
-    
-    # Fetch user
+
     stmt = select(User).where(User.id == user_id)
     result = await db.execute(stmt)
     user = result.scalar_one_or_none()
@@ -31,9 +43,51 @@ async def generate_repository(request: RepoRequest, user_id: int, background_tas
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    job = repo_jobs.submit(
+        user_id,
+        lambda job: run_repo_generation(job, user_id, request),
+        idempotency_key=idempotency_key,
+        request_key=request.model_dump_json()
+    )
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, user_id: int):
+    job = repo_jobs.get(job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+async def run_repo_generation(job: Job, user_id: int, request: RepoRequest) -> dict:
+    """Job body: runs the pipeline with its own DB session (the request's is long gone)."""
+    from sqlalchemy.future import select
+    from .llm_usage import llm_user
+
+    llm_user.set(user_id)
+
+    async with AsyncSessionLocal() as db:
+        stmt = select(User).where(User.id == user_id)
+        result = await db.execute(stmt)
+        user = result.scalar_one_or_none()
+        if not user:
+            raise ValueError("User not found")
+        return await _generate_repository(job, user, request, db)
+
+async def _generate_repository(job: Job, user: User, request: RepoRequest, db: AsyncSession) -> dict:
+    """Generation, GitHub pushes and RAG indexing are pipelined: each file is queued
+    for pushing/indexing as soon as it streams out of the model."""
+    from .ai_utils import generate_project_with_bugs
+    from .ai_chat import trigger_proactive_message
+    from .github_utils import GITHUB_API_URL, github_headers, RepoBootstrapper
+    from .rag_utils import rag_engine
+    from .providers import github_token, http_client
+    import asyncio
+    import time
+
+    user_id = user.id
+
     # Determine Auth Token (System Token since User Token is removed)
-    import os
-    GITHUB_TOKEN = os.getenv("GITHUB_TOKEN") or os.getenv("SYSTEM_GITHUB_TOKEN")
+    GITHUB_TOKEN = github_token()
     
     if not GITHUB_TOKEN:
         print("DEBUG: No GITHUB_TOKEN or SYSTEM_GITHUB_TOKEN found in environment.")
@@ -41,127 +95,152 @@ async def generate_repository(request: RepoRequest, user_id: int, background_tas
         print(f"DEBUG: Found GitHub token (starts with {GITHUB_TOKEN[:4]}...)")
 
     token_to_use = GITHUB_TOKEN
-    
-    # Generate project with AI
-    print(f"Generating project for: {request.project_description} (Backend: {request.backend_stack}, Frontend: {request.frontend_stack})")
-    project = await generate_project_with_bugs(
-        request.project_description, 
-        backend_stack=request.backend_stack,
-        frontend_stack=request.frontend_stack
-    )
-    
-    print(f"DEBUG: Project generation result keys: {project.keys()}")
-    files_generated = project.get("files", {})
-    print(f"DEBUG: Files generated: {list(files_generated.keys())}")
-    if not files_generated:
-        print("DEBUG: WARNING - No files were generated!")
-    
-    # Use AI-generated repo name or provided one
-    base_name = request.repo_name or project.get("repo_name", "my-simulation-project")
-    # Clean name
-    base_name = "".join(c for c in base_name if c.isalnum() or c in "-_").lower()
-    # Add unique suffix to ensure we create a NEW repo each time
-    import time
-    repo_name = f"{base_name}-{int(time.time())}"
-    
-    import httpx
-    
-    # If no token available, SIMULATE everything
-    if not token_to_use:
-        print("WARNING: No GitHub Token found. Simulating repository creation.")
-        repo_url = f"https://github.com/simulation/{repo_name}"
-        repo_full_name = f"simulation/{repo_name}"
-        
-        # Save repo info to user
-        user.repo_full_name = repo_full_name
-        await db.commit()
-        
-        # We skip the actual GitHub API calls but PROCEED to create tickets
-        # so the game can continue.
-        
-    else:
-        async with httpx.AsyncClient() as client:
+
+    report = job.report
+
+    repo = {}  # filled in by create_repo: name, url, full_name, default_branch, simulated
+    repo_ready = asyncio.Event()
+    repo_task = None
+    push_queue = asyncio.Queue()
+    index_queue = asyncio.Queue()
+    queued_files = {}
+
+    async def create_repo(base_name: str):
+        # Clean name
+        base_name = "".join(c for c in base_name if c.isalnum() or c in "-_").lower() or "my-simulation-project"
+        # Add unique suffix to ensure we create a NEW repo each time
+        repo_name = f"{base_name}-{int(time.time())}"
+        repo["name"] = repo_name
+        repo["url"] = f"https://github.com/simulation/{repo_name}"
+        repo["full_name"] = f"simulation/{repo_name}"
+        repo["default_branch"] = "main"
+        repo["simulated"] = True
+
+        try:
+            # If no token available, SIMULATE everything
+            if not token_to_use:
+                print("WARNING: No GitHub Token found. Simulating repository creation.")
+                return
+
             # Create Repo (using user/repos if it's a PAT, or org/repos if configured)
             # Assuming PAT for now for the system account
             response = await client.post(
-                "https://api.github.com/user/repos",
-                headers={
-                    "Authorization": f"token {token_to_use}",
-                    "Accept": "application/vnd.github.v3+json"
-                },
+                f"{GITHUB_API_URL}/user/repos",
+                headers=github_headers(token_to_use),
                 json={
                     "name": repo_name,
                     "private": False,
-                    "description": f"{project.get('project_name', 'Simulation')} - Generated for The New Hire",
+                    "description": f"{request.project_description[:100]} - Generated for The New Hire",
                     "auto_init": True
                 }
             )
-            
-            if response.status_code not in [200, 201]:
-                print(f"DEBUG: GitHub API Error {response.status_code}: {response.text}")
-                if response.status_code == 422:
-                    # Repo exists, try to get it
-                    pass
-                else:
-                    print(f"GitHub Error: {response.text}")
-                    # Don't crash, fall back to simulation if GitHub fails
-                    # raise HTTPException(status_code=response.status_code, detail="Failed to create repository")
-                    print("Falling back to simulation mode due to GitHub error.")
-                    repo_url = f"https://github.com/{user.username}/{repo_name}" # Fake
-                    
+
             if response.status_code in [200, 201, 422]:
                 data = response.json()
-                repo_url = data.get("html_url", f"https://github.com/simulation/{repo_name}")
-                repo_full_name = data.get("full_name", f"simulation/{repo_name}")
+                repo["url"] = data.get("html_url", repo["url"])
+                repo["full_name"] = data.get("full_name", repo["full_name"])
+                repo["default_branch"] = data.get("default_branch") or "main"
+                repo["simulated"] = "full_name" not in data
             else:
-                 repo_url = f"https://github.com/simulation/{repo_name}"
-                 repo_full_name = f"simulation/{repo_name}"
+                print(f"DEBUG: GitHub API Error {response.status_code}: {response.text}")
+                # Don't crash, fall back to simulation if GitHub fails
+                print("Falling back to simulation mode due to GitHub error.")
+        except Exception as e:
+            print(f"GitHub Error: {e}. Falling back to simulation mode.")
+        finally:
+            repo_ready.set()
+            await report("repo_created", repo_url=repo["url"])
 
-            # Save repo info to user
-            user.repo_full_name = repo_full_name
-            await db.commit()
+    def start_repo(base_name: str):
+        nonlocal repo_task
+        if repo_task is None:
+            repo_task = asyncio.create_task(create_repo(base_name))
 
-            
-        # repo_url and repo_full_name are set above
+    def enqueue_file(path: str, content: str):
+        if path in queued_files:
+            return
+        queued_files[path] = content
+        push_queue.put_nowait((path, content))
+        index_queue.put_nowait((path, content))
+
+    async def pusher():
+        # Blobs are uploaded concurrently as files arrive; everything lands in one commit at the end
+        await repo_ready.wait()
+        bootstrapper = None
+        if not repo["simulated"]:
+            bootstrapper = RepoBootstrapper(client, token_to_use, repo["full_name"], repo["default_branch"])
+
+        async def upload(path: str, content: str):
+            if await bootstrapper.add_file(path, content):
+                await report("file_pushed", path=path)
+
+        uploads = []
+        while True:
+            item = await push_queue.get()
+            if item is None:
+                break
+            path, content = item
+            if bootstrapper:
+                uploads.append(asyncio.create_task(upload(path, content)))
+            else:
+                await report("file_pushed", path=path)
+        if bootstrapper:
+            await asyncio.gather(*uploads)
+            method = await bootstrapper.commit("Initial project scaffold")
+            await report("committed", method=method)
+
+    async def indexer():
+        await repo_ready.wait()
+        while True:
+            item = await index_queue.get()
+            if item is None:
+                return
+            path, content = item
+            try:
+                await rag_engine.index_file(user_id, repo["full_name"], path, content)
+            except Exception as e:
+                print(f"Warning: Failed to index {path}: {e}")
+
+    async def on_item(field, index, value):
+        if field == "repo_name" and index is None and isinstance(value, str):
+            start_repo(value)
+        elif field == "files" and index is not None and isinstance(value, dict) and value.get("path"):
+            enqueue_file(value["path"], value.get("content", ""))
+            await report("file_generated", path=value["path"])
+
+    async with http_client() as client:
+        await report("generating")
+        # Use the provided repo name right away, otherwise wait for the AI's one
+        if request.repo_name:
+            start_repo(request.repo_name)
+
+        workers = [asyncio.create_task(pusher()), asyncio.create_task(indexer())]
+        try:
+            # Generate project with AI
+            print(f"Generating project for: {request.project_description} (Backend: {request.backend_stack}, Frontend: {request.frontend_stack})")
+            project = await generate_project_with_bugs(
+                request.project_description, 
+                backend_stack=request.backend_stack,
+                frontend_stack=request.frontend_stack,
+                on_item=on_item
+            )
+
+            # The stream broke after part of the AI project went out (repo named, files queued):
+            # the fallback's placeholder files would be mixed into it, so fail the job instead
+            if project.get("is_fallback") and (queued_files or (repo_task is not None and not request.repo_name)):
+                raise RuntimeError("Project generation failed partway through. Please try again.")
 
-            # Save repo info to user
-            user.repo_full_name = repo_full_name
-            await db.commit()
-            
-            # Helper function to push file to GitHub
-            async def push_file(path: str, content: str, message: str):
-                if not token_to_use:
-                    return # Skip pusing in simulation mode
-                    
-                encoded = base64.b64encode(content.encode()).decode()
-                try:
-                    # Need repo owner from full name if possible, else fallback
-                    owner = repo_full_name.split("/")[0] if "/" in repo_full_name else "simulation"
-                    
-                    result = await client.put(
-                        f"https://api.github.com/repos/{owner}/{repo_name}/contents/{path}",
-                        headers={
-                            "Authorization": f"token {token_to_use}",
-                            "Accept": "application/vnd.github.v3+json"
-                        },
-                        json={
-                            "message": message,
-                            "content": encoded
-                        }
-                    )
-                    print(f"DEBUG: Push result for {path}: {result.status_code}")
-                    if result.status_code not in [200, 201]:
-                         print(f"DEBUG: Push failed details: {result.text}")
-                    return result
-                except Exception as e:
-                    print(f"Warning: Failed to push file {path}: {e}")
-                    return None
-            
-            # Push all generated files
             files = project.get("files", {})
+            print(f"DEBUG: Files generated: {list(files.keys())}")
+            if not files:
+                print("DEBUG: WARNING - No files were generated!")
+            await report("generated", files=len(files))
+
+            # Fallback projects (and non-streamed files) still need a repo and pushes
+            start_repo(project.get("repo_name", "my-simulation-project"))
             for filename, content in files.items():
-                await push_file(filename, content, f"Add {filename}")
-            
+                enqueue_file(filename, content)
+
             # Push CI/CD workflow
             ci_content = """name: CI
 on: [push, pull_request]
@@ -175,117 +254,122 @@ jobs:
       - name: Run tests
         run: echo "Running tests..."
 """
-            await push_file(".github/workflows/ci.yml", ci_content, "Add CI/CD workflow")
-        
-            # Invite User as Collaborator if username provided
-            if request.github_username:
-                # Sanitize username (remove @ and whitespace)
-                clean_username = request.github_username.strip().lstrip("@")
-                print(f"DEBUG: Attempting to invite '{clean_username}' (raw: '{request.github_username}')")
-                
-                # Check if we are in simulation mode
-                if repo_full_name.startswith("simulation/"):
-                     print("DEBUG: Skipping invite because repo is in simulation mode.")
-                     invite_result = "skipped_simulation"
-                else:
-                    try:
-                        # Use the owner from the repo full name
-                        owner = repo_full_name.split("/")[0]
-                        invite_url = f"https://api.github.com/repos/{owner}/{repo_name}/collaborators/{clean_username}"
-                        print(f"DEBUG: Invite URL: {invite_url}")
-                        
-                        invite_resp = await client.put(
-                            invite_url,
-                            headers={
-                                "Authorization": f"token {token_to_use}",
-                                "Accept": "application/vnd.github.v3+json"
-                            },
-                            json={"permission": "push"} 
-                        )
-                        
-                        print(f"DEBUG: Invite Response Code: {invite_resp.status_code}")
-                        print(f"DEBUG: Invite Response Text: {invite_resp.text}")
-
-                        if invite_resp.status_code in [201, 204]:
-                            print(f"DEBUG: Successfully invited {clean_username}")
-                            invite_result = "success"
-                        else:
-                            invite_result = f"failed: {invite_resp.status_code}"
-                    except Exception as e:
-                        print(f"DEBUG: Error inviting collaborator: {e}")
-                        invite_result = f"error: {str(e)}"
+            push_queue.put_nowait((".github/workflows/ci.yml", ci_content))
+            push_queue.put_nowait(None)
+            index_queue.put_nowait(None)
+            await asyncio.gather(*workers, repo_task)
+        finally:
+            # On failure nothing may outlive the job (or the client they share)
+            tasks = [task for task in workers + [repo_task] if task is not None and not task.done()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        rag_engine.vector_db.persist()
+        await report("pushed", files=len(queued_files))
+
+        repo_name = repo["name"]
+        repo_url = repo["url"]
+        repo_full_name = repo["full_name"]
+
+        # Save repo info to user
+        user.repo_full_name = repo_full_name
+        await db.commit()
+
+        # Invite User as Collaborator if username provided
+        if request.github_username:
+            # Sanitize username (remove @ and whitespace)
+            clean_username = request.github_username.strip().lstrip("@")
+            print(f"DEBUG: Attempting to invite '{clean_username}' (raw: '{request.github_username}')")
+            
+            # Check if we are in simulation mode
+            if repo["simulated"]:
+                 print("DEBUG: Skipping invite because repo is in simulation mode.")
+                 invite_result = "skipped_simulation"
             else:
-                 invite_result = "skipped"
+                try:
+                    invite_url = f"{GITHUB_API_URL}/repos/{repo_full_name}/collaborators/{clean_username}"
+                    print(f"DEBUG: Invite URL: {invite_url}")
+                    
+                    invite_resp = await client.put(
+                        invite_url,
+                        headers=github_headers(token_to_use),
+                        json={"permission": "push"} 
+                    )
+                    
+                    print(f"DEBUG: Invite Response Code: {invite_resp.status_code}")
+                    print(f"DEBUG: Invite Response Text: {invite_resp.text}")
 
-        # Create tickets from AI-generated list
-        now = datetime.now()
-        tickets_data = project.get("tickets", [])
-        
-        priority_map = {
-            "CRITICAL": TicketPriority.CRITICAL,
-            "HIGH": TicketPriority.HIGH,
-            "MEDIUM": TicketPriority.MEDIUM,
-            "LOW": TicketPriority.LOW
-        }
-        
-        created_tickets = []
-        for ticket_info in tickets_data:
-            ticket = Ticket(
-                title=ticket_info.get("title", "Untitled Task"),
-                description=ticket_info.get("description", ""),
-                type=ticket_info.get("type", "task"),
-                priority=priority_map.get(ticket_info.get("priority", "MEDIUM").upper(), TicketPriority.MEDIUM),
-                story_points=ticket_info.get("story_points", 2),
-                status=TicketStatus.TODO if ticket_info.get("day", 1) <= 2 else TicketStatus.BACKLOG,
-                assignee_id=user.id,
-                due_date=now + timedelta(days=ticket_info.get("day", 3))
-            )
-            created_tickets.append(ticket)
-        
-        if created_tickets:
-            db.add_all(created_tickets)
-            await db.commit()
-        
-        background_tasks.add_task(
-            trigger_proactive_message,
-            "dev",
-            f"The user just cloned their first repo: {repo_name}. Offer technical help if they get stuck.",
-            user.username
-        )
+                    if invite_resp.status_code in [201, 204]:
+                        print(f"DEBUG: Successfully invited {clean_username}")
+                        invite_result = "success"
+                    else:
+                        invite_result = f"failed: {invite_resp.status_code}"
+                except Exception as e:
+                    print(f"DEBUG: Error inviting collaborator: {e}")
+                    invite_result = f"error: {str(e)}"
+        else:
+             invite_result = "skipped"
 
-        # Trigger RAG indexing in background
-        from .rag_utils import rag_engine
-        background_tasks.add_task(
-            rag_engine.index_files,
-            user.id,
-            repo_full_name,
-            files
+    # Create tickets from AI-generated list
+    now = datetime.now()
+    tickets_data = project.get("tickets", [])
+    
+    priority_map = {
+        "CRITICAL": TicketPriority.CRITICAL,
+        "HIGH": TicketPriority.HIGH,
+        "MEDIUM": TicketPriority.MEDIUM,
+        "LOW": TicketPriority.LOW
+    }
+    
+    created_tickets = []
+    for ticket_info in tickets_data:
+        ticket = Ticket(
+            title=ticket_info.get("title", "Untitled Task"),
+            description=ticket_info.get("description", ""),
+            type=ticket_info.get("type", "task"),
+            priority=priority_map.get(ticket_info.get("priority", "MEDIUM").upper(), TicketPriority.MEDIUM),
+            story_points=ticket_info.get("story_points", 2),
+            status=TicketStatus.TODO if ticket_info.get("day", 1) <= 2 else TicketStatus.BACKLOG,
+            assignee_id=user.id,
+            due_date=now + timedelta(days=ticket_info.get("day", 3))
         )
+        created_tickets.append(ticket)
+    
+    if created_tickets:
+        db.add_all(created_tickets)
+        await db.commit()
+    
+    await trigger_proactive_message(
+        "dev",
+        f"The user just cloned their first repo: {repo_name}. Offer technical help if they get stuck.",
+        user.username
+    )
 
-        from .activity import log_activity
-        from models import ActivityType
-        await log_activity(
-            db,
-            user.id,
-            ActivityType.REPO_CREATED,
-            f"Created new GitHub repository: {repo_name}",
-            {"repo_name": repo_name, "repo_url": repo_url}
-        )
+    from .activity import log_activity
+    from models import ActivityType
+    await log_activity(
+        db,
+        user.id,
+        ActivityType.REPO_CREATED,
+        f"Created new GitHub repository: {repo_name}",
+        {"repo_name": repo_name, "repo_url": repo_url}
+    )
 
-        # Reset onboarding checklist for the new project
-        user.onboarding_completed_tasks = []
-        user.onboarding_completed_tasks = list(user.onboarding_completed_tasks) # Force detection
-        await db.commit()
+    # Reset onboarding checklist for the new project
+    user.onboarding_completed_tasks = []
+    user.onboarding_completed_tasks = list(user.onboarding_completed_tasks) # Force detection
+    await db.commit()
 
-        return {
-            "message": f"Repository created with {len(files)} files and {len(created_tickets)} tickets!",
-            "repo_url": repo_url,
-            "project_name": project.get("project_name"),
-            "tickets_created": len(created_tickets),
-            "is_fallback": project.get("is_fallback", False),
-            "invite_status": invite_result,
-            "github_username": request.github_username
-        }
+    return {
+        "message": f"Repository created with {len(files)} files and {len(created_tickets)} tickets!",
+        "repo_url": repo_url,
+        "project_name": project.get("project_name"),
+        "tickets_created": len(created_tickets),
+        "is_fallback": project.get("is_fallback", False),
+        "invite_status": invite_result,
+        "github_username": request.github_username
+    }
 
 @router.get("/checklist")
 async def get_onboarding_checklist(user_id: int, db: AsyncSession = Depends(get_db)):
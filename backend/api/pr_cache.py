@@ -0,0 +1,93 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+import httpx
+
+DIFF_CACHE_SIZE = int(os.getenv("PR_DIFF_CACHE_SIZE", "256"))
+REVIEW_CACHE_SIZE = int(os.getenv("PR_REVIEW_CACHE_SIZE", "256"))
+REVIEW_CACHE_TTL = int(os.getenv("PR_REVIEW_CACHE_TTL", str(24 * 3600)))
+
+
+class DiffCache:
+    """
+    LRU cache of PR diffs keyed by URL. Stores the ETag / Last-Modified
+    validators and revalidates with a conditional GET, so an unchanged PR
+    costs a 304 instead of a full diff download.
+    """
+
+    def __init__(self, max_entries: int = DIFF_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # {url: {"etag", "last_modified", "text"}}
+        self.hits = 0
+        self.misses = 0
+
+    async def fetch(self, client: httpx.AsyncClient, url: str, headers: Optional[dict] = None) -> Tuple[int, str]:
+        """Returns (status_code, text). A 304 is reported as 200 with the cached body."""
+        request_headers = dict(headers or {})
+        cached = self.entries.get(url)
+        if cached:
+            if cached["etag"]:
+                request_headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                request_headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = await client.get(url, headers=request_headers, follow_redirects=True)
+
+        if response.status_code == 304 and cached:
+            self.hits += 1
+            self.entries.move_to_end(url)
+            return 200, cached["text"]
+
+        self.misses += 1
+        if response.status_code == 200:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                self.entries[url] = {"etag": etag, "last_modified": last_modified, "text": response.text}
+                self.entries.move_to_end(url)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            else:
+                self.entries.pop(url, None)
+
+        return response.status_code, response.text
+
+
+class ReviewCache:
+    """LRU + TTL cache of finished reviews keyed by the SHA-256 of the diff."""
+
+    def __init__(self, max_entries: int = REVIEW_CACHE_SIZE, ttl: int = REVIEW_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # {diff_hash: (stored_at, review)}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(diff: str) -> str:
+        return hashlib.sha256(diff.encode("utf-8", errors="replace")).hexdigest()
+
+    def get(self, diff: str) -> Optional[dict]:
+        key = self.key(diff)
+        entry = self.entries.get(key)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+        if entry:
+            del self.entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, diff: str, review: dict):
+        key = self.key(diff)
+        self.entries[key] = (time.monotonic(), review)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+diff_cache = DiffCache()
+review_cache = ReviewCache()
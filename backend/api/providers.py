@@ -0,0 +1,101 @@
+import os
+from urllib.parse import urlparse
+import httpx
+
+# Which backends the app talks to. PROVIDER_MODE=fake switches everything to
+# the deterministic in-process fakes (see fakes.py / fake_github.py) so the
+# whole system can be load-tested offline; the per-provider variables
+# override it individually.
+PROVIDER_MODE = os.getenv("PROVIDER_MODE", "live")
+AI_PROVIDER = os.getenv("AI_PROVIDER", "fake" if PROVIDER_MODE == "fake" else "gemini")
+TTS_PROVIDER = os.getenv("TTS_PROVIDER", "fake" if PROVIDER_MODE == "fake" else "gtts")
+GITHUB_PROVIDER = os.getenv("GITHUB_PROVIDER", "fake" if PROVIDER_MODE == "fake" else "github")
+
+_fake_gemini = None
+_fake_github = None
+_fake_tts = None
+
+
+def fake_gemini():
+    global _fake_gemini
+    if _fake_gemini is None:
+        from .fakes import FakeGemini
+        _fake_gemini = FakeGemini()
+    return _fake_gemini
+
+
+def fake_github():
+    global _fake_github
+    if _fake_github is None:
+        from .fake_github import fake_github_from_env
+        _fake_github = fake_github_from_env()
+    return _fake_github
+
+
+def gemini_api_key():
+    """The Gemini key, or a placeholder when the fake is selected (so key checks pass)."""
+    if AI_PROVIDER == "fake":
+        return "fake-gemini-key"
+    return os.getenv("GEMINI_API_KEY")
+
+
+def github_token():
+    if GITHUB_PROVIDER == "fake":
+        return "fake-github-token"
+    return os.getenv("GITHUB_TOKEN") or os.getenv("SYSTEM_GITHUB_TOKEN")
+
+
+def make_genai_client():
+    """genai.Client, the fake client, or None without a key."""
+    if AI_PROVIDER == "fake":
+        from .fakes import FakeGenAIClient
+        return FakeGenAIClient(fake_gemini())
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return None
+    from google import genai
+    return genai.Client(api_key=api_key, http_options={'api_version': 'v1beta'})
+
+
+def gemini_upload_url(default: str) -> str:
+    return fake_gemini().upload_url if AI_PROVIDER == "fake" else default
+
+
+def _github_hosts() -> set:
+    from .github_utils import GITHUB_API_URL
+    return {"api.github.com", "github.com", urlparse(GITHUB_API_URL).hostname}
+
+
+def http_client(**kwargs) -> httpx.AsyncClient:
+    """
+    httpx.AsyncClient for outbound calls. With fakes selected, requests to
+    GitHub / the Gemini upload endpoint are served in-process instead.
+    """
+    mounts = {}
+    if GITHUB_PROVIDER == "fake":
+        transport = httpx.MockTransport(fake_github().handler)
+        for host in _github_hosts():
+            mounts[f"all://{host}"] = transport
+    if AI_PROVIDER == "fake":
+        mounts[f"all://{urlparse(fake_gemini().upload_url).hostname}"] = httpx.MockTransport(fake_gemini().handle_upload)
+    if mounts:
+        kwargs["mounts"] = {**kwargs.get("mounts", {}), **mounts}
+    return httpx.AsyncClient(**kwargs)
+
+
+def synthesize_speech(text: str, tld: str = "com") -> bytes:
+    """Blocking TTS (run it in an executor): MP3 bytes from gTTS or the fake."""
+    global _fake_tts
+    if TTS_PROVIDER == "fake":
+        if _fake_tts is None:
+            from .fakes import FakeTTS
+            _fake_tts = FakeTTS()
+        return _fake_tts.synthesize(text)
+
+    import io
+    from gtts import gTTS
+    tts = gTTS(text=text, lang='en', tld=tld)
+    fp = io.BytesIO()
+    tts.write_to_fp(fp)
+    fp.seek(0)
+    return fp.read()
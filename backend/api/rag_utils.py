@@ -1,24 +1,24 @@
 import os
 from dotenv import load_dotenv
 load_dotenv()
-from google import genai
 import asyncio
-import httpx
 import base64
+import time
 from typing import List, Dict
 import json
 import logging
 import numpy as np
+from .providers import gemini_api_key, make_genai_client, http_client
+from .llm_usage import usage_tracker
+from .github_utils import GITHUB_API_URL
 
 logger = logging.getLogger(__name__)
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_API_KEY = gemini_api_key()
 MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
 EMBEDDING_MODEL = "text-embedding-004"
 
-client = None
-if GEMINI_API_KEY:
-    client = genai.Client(api_key=GEMINI_API_KEY, http_options={'api_version': 'v1beta'})
+client = make_genai_client()
 
 # persistent storage for SimpleVectorDB
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "simple_vector_db.json")
@@ -107,15 +107,19 @@ class RepositoryRAG:
         if not client:
             return [0.0] * 768 # Fallback
         
+        started = time.monotonic()
         try:
-            response = client.models.embed_content(
+            response = await client.aio.models.embed_content(
                 model=EMBEDDING_MODEL,
                 contents=text,
                 config={"task_type": "RETRIEVAL_DOCUMENT"}
             )
+            usage_tracker.record_response("get_embedding", EMBEDDING_MODEL, response, started, text)
             return response.embeddings[0].values
         except Exception as e:
             logger.error(f"Embedding error: {e}")
+            usage_tracker.record("get_embedding", EMBEDDING_MODEL, latency=time.monotonic() - started,
+                                 prompt_chars=len(text), error=type(e).__name__)
             return [0.0] * 768
 
     def chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
@@ -124,9 +128,29 @@ class RepositoryRAG:
             chunks.append(text[i:i + chunk_size])
         return chunks
 
+    def collection_name(self, user_id: int, repo_full_name: str) -> str:
+        return f"user_{user_id}_{repo_full_name.replace('/', '_').replace('-', '_')}"
+
+    async def index_file(self, user_id: int, repo_full_name: str, path: str, content: str):
+        """Index a single file into the repository's collection without persisting.
+        Used to index files as they stream out of project generation."""
+        if not content or len(content) < 10:
+            return
+
+        collection = self.vector_db.get_or_create_collection(name=self.collection_name(user_id, repo_full_name))
+        chunks = self.chunk_text(content)
+        for i, chunk in enumerate(chunks):
+            embedding = await self.get_embedding(chunk)
+            collection.add(
+                ids=[f"{path}_chunk_{i}"],
+                embeddings=[embedding],
+                metadatas=[{"path": path, "chunk_index": i}],
+                documents=[chunk]
+            )
+
     async def index_files(self, user_id: int, repo_full_name: str, files: Dict[str, str]):
         """Index a batch of files into SimpleVectorDB"""
-        collection_name = f"user_{user_id}_{repo_full_name.replace('/', '_').replace('-', '_')}"
+        collection_name = self.collection_name(user_id, repo_full_name)
         logger.info(f"Indexing repository '{repo_full_name}' for user {user_id}")
         
         collection = self.vector_db.get_or_create_collection(name=collection_name)
@@ -135,25 +159,14 @@ class RepositoryRAG:
         self.vector_db.data[collection_name] = {"embeddings": [], "documents": [], "metadatas": [], "ids": []}
 
         for path, content in files.items():
-            if not content or len(content) < 10:
-                continue
-                
-            chunks = self.chunk_text(content)
-            for i, chunk in enumerate(chunks):
-                embedding = await self.get_embedding(chunk)
-                collection.add(
-                    ids=[f"{path}_chunk_{i}"],
-                    embeddings=[embedding],
-                    metadatas=[{"path": path, "chunk_index": i}],
-                    documents=[chunk]
-                )
+            await self.index_file(user_id, repo_full_name, path, content)
         
         self.vector_db.persist()
         logger.info(f"Successfully indexed and persisted repository for user {user_id}")
 
     async def query(self, user_id: int, repo_full_name: str, query_text: str) -> str:
         """Query the indexed repository and generate a response from a senior colleague"""
-        collection_name = f"user_{user_id}_{repo_full_name.replace('/', '_').replace('-', '_')}"
+        collection_name = self.collection_name(user_id, repo_full_name)
         project_name = repo_full_name.split('/')[-1].replace('-', ' ').title()
 
         # 1. Handle very short or ambiguous general queries without RAG if needed
@@ -201,10 +214,12 @@ class RepositoryRAG:
         if not client:
             return "I'm sorry, my AI brain is a bit foggy right now. Try again in a second?"
             
-        response = client.models.generate_content(
+        started = time.monotonic()
+        response = await client.aio.models.generate_content(
             model=MODEL,
             contents=prompt
         )
+        usage_tracker.record_response("rag_query", MODEL, response, started, prompt)
         return response.text
 
     async def sync_with_github(self, user_id: int, repo_full_name: str, access_token: str, db_session):
@@ -212,9 +227,9 @@ class RepositoryRAG:
         from models import User
         from sqlalchemy.future import select
         
-        async with httpx.AsyncClient() as github_client:
+        async with http_client() as github_client:
             # 1. Get latest commit
-            commits_url = f"https://api.github.com/repos/{repo_full_name}/commits"
+            commits_url = f"{GITHUB_API_URL}/repos/{repo_full_name}/commits"
             headers = {
                 "Authorization": f"token {access_token}",
                 "Accept": "application/vnd.github.v3+json"
@@ -238,7 +253,7 @@ class RepositoryRAG:
                 return True # Already up to date
                 
             # 3. Fetch full repository tree (simplified for MVP: fetch files recursively)
-            tree_url = f"https://api.github.com/repos/{repo_full_name}/git/trees/{latest_sha}?recursive=1"
+            tree_url = f"{GITHUB_API_URL}/repos/{repo_full_name}/git/trees/{latest_sha}?recursive=1"
             resp = await github_client.get(tree_url, headers=headers)
             if resp.status_code != 200:
                 return False
@@ -0,0 +1,73 @@
+import os
+import asyncio
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List
+
+# Quiet time after the last message before teammates reply, and the longest a
+# message waits during a steady stream of messages
+AI_REPLY_DEBOUNCE = float(os.getenv("AI_REPLY_DEBOUNCE", "3"))
+AI_REPLY_MAX_WAIT = float(os.getenv("AI_REPLY_MAX_WAIT", "10"))
+
+
+class ReplyScheduler:
+    """
+    Coalesces chat messages into batched AI replies, per channel.
+
+    submit() queues a message and (re)arms the channel's debounce timer, so a
+    burst of messages produces one `await handler(channel, messages)` call. A
+    timer never fires later than `max_wait` after the first pending message.
+    This only debounces within one process: the handler (ai_chat.enqueue_reply)
+    queues the batch, and the task queue runs one reply per channel at a time,
+    merging batches that arrive while one runs into the channel's waiting task.
+    """
+
+    def __init__(self, handler: Callable[[str, List[dict]], Awaitable[None]], debounce: float = AI_REPLY_DEBOUNCE, max_wait: float = AI_REPLY_MAX_WAIT):
+        self.handler = handler
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.pending: Dict[str, List[dict]] = defaultdict(list)
+        self.first_at: Dict[str, float] = {}
+        self.timers: Dict[str, asyncio.TimerHandle] = {}
+        self.tasks = set()
+        self.messages = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    def submit(self, channel: str, message: dict):
+        loop = asyncio.get_running_loop()
+        self.pending[channel].append(message)
+        self.messages += 1
+        now = loop.time()
+        first = self.first_at.setdefault(channel, now)
+        delay = max(0.0, min(self.debounce, first + self.max_wait - now))
+        timer = self.timers.pop(channel, None)
+        if timer:
+            timer.cancel()
+        self.timers[channel] = loop.call_later(delay, self._fire, channel)
+
+    def _fire(self, channel: str):
+        self.timers.pop(channel, None)
+        batch = self.pending.pop(channel, [])
+        self.first_at.pop(channel, None)
+        if not batch:
+            return
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        task = asyncio.ensure_future(self._run(channel, batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, channel: str, batch: List[dict]):
+        try:
+            await self.handler(channel, batch)
+        except Exception as e:
+            print(f"Could not queue AI reply for #{channel}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "messages": self.messages,
+            "batches": self.batches,
+            "coalesced": self.messages - self.batches - sum(len(p) for p in self.pending.values()),
+            "largest_batch": self.largest_batch,
+            "pending": {channel: len(p) for channel, p in self.pending.items() if p}
+        }
@@ -0,0 +1,141 @@
+import re
+import math
+import heapq
+import bisect
+from array import array
+from typing import Dict, List, Optional, Tuple
+from .socket_manager import on_emit
+
+# Roughly what Postgres' english text search config drops
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it its me my no not of on or our she so
+that the their them then there these they this to was we were what when where which who will with you your
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def stem(word: str) -> str:
+    """A few suffix rules, applied alike to messages and queries (not a full stemmer)."""
+    if word.endswith("'s"):
+        word = word[:-2]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("sses"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+        word = word[:-1]
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("ed"):
+        return word[:-2]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(word) for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+class InvertedIndex:
+    """
+    In-process full-text index of messages, for databases without Postgres
+    text search (e.g. SQLite test runs). Every query term must match, and hits
+    are ranked with BM25.
+
+    Postings are arrays of internal document numbers in insertion order (so
+    they stay sorted), with a parallel array of term frequencies. A query
+    walks the rarest term's postings and binary-searches the others.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.doc_ids = array("q")  # docnum -> message id
+        self.doc_lengths = array("I")
+        self.doc_channels = array("B")
+        self.channels: Dict[str, int] = {}
+        self.seen = set()
+        self.total_length = 0
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, message_id: int, channel: str, content: str):
+        if message_id in self.seen:
+            return
+        self.seen.add(message_id)
+        docnum = len(self.doc_ids)
+        terms = tokenize(content or "")
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            docs, freqs = self.postings.get(term) or self.postings.setdefault(term, (array("I"), array("H")))
+            docs.append(docnum)
+            freqs.append(min(count, 65535))
+        self.doc_ids.append(message_id)
+        self.doc_lengths.append(len(terms))
+        self.doc_channels.append(self.channels.setdefault(channel, len(self.channels)))
+        self.total_length += len(terms)
+
+    def search(self, query: str, limit: int, offset: int = 0, channel: Optional[str] = None) -> List[Tuple[int, float]]:
+        """(message id, score) of the best matches, best first; newer messages win ties."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or any(term not in self.postings for term in terms):
+            return []
+        channel_num = None
+        if channel is not None:
+            if channel not in self.channels:
+                return []
+            channel_num = self.channels[channel]
+
+        n = len(self.doc_ids)
+        avg_length = self.total_length / n if n else 0
+        terms.sort(key=lambda term: len(self.postings[term][0]))
+
+        def weight(term):
+            df = len(self.postings[term][0])
+            return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+        def score(tf, idf, docnum):
+            norm = K1 * (1 - B + B * self.doc_lengths[docnum] / avg_length) if avg_length else K1
+            return idf * tf * (K1 + 1) / (tf + norm)
+
+        docs, freqs = self.postings[terms[0]]
+        idf = weight(terms[0])
+        scores = {}
+        for docnum, tf in zip(docs, freqs):
+            if channel_num is None or self.doc_channels[docnum] == channel_num:
+                scores[docnum] = score(tf, idf, docnum)
+
+        for term in terms[1:]:
+            if not scores:
+                return []
+            docs, freqs = self.postings[term]
+            idf = weight(term)
+            matched = {}
+            for docnum, total in scores.items():
+                i = bisect.bisect_left(docs, docnum)
+                if i < len(docs) and docs[i] == docnum:
+                    matched[docnum] = total + score(freqs[i], idf, docnum)
+            scores = matched
+
+        best = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return [(self.doc_ids[docnum], total) for docnum, total in best[offset:]]
+
+    def stats(self) -> dict:
+        return {"loaded": self.loaded, "messages": len(self.doc_ids), "terms": len(self.postings)}
+
+
+message_index = InvertedIndex()
+
+
+@on_emit("new_message")
+def _index_new_message(data, room=None):
+    # Only kept up to date once a search has loaded it (non-Postgres databases)
+    if message_index.loaded and isinstance(data, dict) and not data.get("ephemeral") and data.get("id") is not None:
+        message_index.add(data["id"], data.get("channel"), data.get("content"))
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+_END = object()
+
+
+class _Stream:
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.subscribers = set()
+        self.task = None
+
+    def publish(self, chunk):
+        self.chunks.append(chunk)
+        for queue in self.subscribers:
+            queue.put_nowait(chunk)
+
+    def close(self, _task=None):
+        for queue in self.subscribers:
+            queue.put_nowait(_END)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one in-flight task.
+    Every caller awaiting a key while it is running gets the same result (or
+    exception). An optional short-TTL memo keeps successful results around so
+    immediate retries don't go upstream either. stream() does the same for
+    streamed calls, fanning the chunks out to every caller.
+    """
+
+    def __init__(self):
+        self.inflight: Dict[str, asyncio.Task] = {}
+        self.streams: Dict[str, _Stream] = {}
+        self.memo: Dict[str, Tuple[float, Any]] = {}
+        self.calls = 0
+        self.upstream_calls = 0
+        self.shared = 0
+        self.memo_hits = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], memo_ttl: float = 0) -> Any:
+        self.calls += 1
+
+        if memo_ttl > 0:
+            entry = self.memo.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.memo_hits += 1
+                return entry[1]
+            self.memo.pop(key, None)
+
+        task = self.inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.upstream_calls += 1
+            task = asyncio.ensure_future(fn())
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t, memo_ttl))
+
+        # shield so a cancelled caller doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    async def stream(self, key: str, fn: Callable[[Callable[[Any], None]], Awaitable[Any]], on_chunk: Callable[[Any], Awaitable[None]]) -> Any:
+        """
+        Runs `await fn(publish)` once per key while it is in flight; every
+        caller gets `await on_chunk(chunk)` for each published chunk (a caller
+        joining late first gets the ones it missed) and then fn's result. A
+        failing or cancelled caller stops listening; the call carries on for
+        the others.
+        """
+        self.calls += 1
+        flight = self.streams.get(key)
+        if flight is not None:
+            self.shared += 1
+        else:
+            self.upstream_calls += 1
+            flight = self.streams[key] = _Stream()
+            flight.task = asyncio.ensure_future(fn(flight.publish))
+            flight.task.add_done_callback(flight.close)
+            flight.task.add_done_callback(lambda t: self._finish_stream(key, flight, t))
+
+        queue = asyncio.Queue()
+        for chunk in flight.chunks:
+            queue.put_nowait(chunk)
+        if flight.task.done():
+            queue.put_nowait(_END)
+        flight.subscribers.add(queue)
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is _END:
+                    break
+                await on_chunk(chunk)
+        finally:
+            flight.subscribers.discard(queue)
+        return await asyncio.shield(flight.task)
+
+    def _finish_stream(self, key: str, flight: _Stream, task: asyncio.Task):
+        if self.streams.get(key) is flight:
+            del self.streams[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every caller went away
+
+    def _finish(self, key: str, task: asyncio.Task, memo_ttl: float):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        if task.cancelled():
+            return
+        # Mark the exception as retrieved even if every waiter went away
+        if task.exception() is None and memo_ttl > 0:
+            self.memo[key] = (time.monotonic() + memo_ttl, task.result())
+            self._prune_memo()
+
+    def _prune_memo(self):
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self.memo.items() if expires <= now]:
+            del self.memo[key]
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "upstream_calls": self.upstream_calls,
+            "shared": self.shared,
+            "memo_hits": self.memo_hits,
+            "saved": self.shared + self.memo_hits,
+            "in_flight": len(self.inflight) + len(self.streams),
+        }
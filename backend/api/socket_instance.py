@@ -1,3 +1,56 @@
-import socketio
+from .auth_utils import decode_access_token
+from .socket_manager import make_client_manager, BoundedServer, SOCKETIO_SERIALIZER
 
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+# With SOCKETIO_MANAGER=redis every worker shares rooms, so emits from any
+# worker (including background tasks) reach sockets connected to the others
+sio = BoundedServer(async_mode='asgi', cors_allowed_origins='*', client_manager=make_client_manager(), serializer=SOCKETIO_SERIALIZER)
+
+# Every user is a member of every chat channel
+CHANNELS = ["general", "dev", "code-review", "random"]
+
+# Every authenticated socket; only gets the small channel_activity notices
+MEMBERS_ROOM = "members"
+
+def user_room(user_id: int) -> str:
+    return f"user_{user_id}"
+
+def channel_room(channel: str) -> str:
+    return f"channel_{channel}"
+
+async def emit_to_user(event: str, data: dict, user_id: int):
+    """Per-user events (stats, activity, jobs) only go to that user's sockets."""
+    await sio.emit(event, data, room=user_room(user_id))
+
+async def emit_to_channel(event: str, data: dict, channel: str):
+    """
+    Chat events only go to sockets subscribed to the channel. Other members
+    just hear that the channel has a new message (for unread badges).
+    """
+    await sio.emit(event, data, room=channel_room(channel))
+    if event == "new_message":
+        await sio.emit("channel_activity", {"channel": channel}, room=MEMBERS_ROOM)
+
+@sio.event
+async def connect(sid, environ, auth=None):
+    # Authenticated clients join their personal room and the members room, and
+    # subscribe to channels as they open them; anonymous sockets receive nothing
+    token = (auth or {}).get("token") if isinstance(auth, dict) else None
+    payload = decode_access_token(token) if token else None
+    if payload and payload.get("id"):
+        await sio.save_session(sid, {"user_id": payload["id"]})
+        await sio.enter_room(sid, user_room(payload["id"]))
+        await sio.enter_room(sid, MEMBERS_ROOM)
+
+@sio.event
+async def subscribe(sid, data):
+    """Starts sending a channel's messages and deltas to this socket (the chat page opened it)."""
+    channel = data.get("channel") if isinstance(data, dict) else None
+    session = await sio.get_session(sid)
+    if channel in CHANNELS and session.get("user_id"):
+        await sio.enter_room(sid, channel_room(channel))
+
+@sio.event
+async def unsubscribe(sid, data):
+    channel = data.get("channel") if isinstance(data, dict) else None
+    if channel in CHANNELS:
+        await sio.leave_room(sid, channel_room(channel))
@@ -0,0 +1,253 @@
+import os
+import json
+import asyncio
+import inspect
+from collections import defaultdict
+import engineio.async_socket
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+# How Socket.IO servers share clients:
+#   memory - single process (the default; one uvicorn worker only)
+#   redis  - Redis/Valkey pub/sub, for several workers or hosts
+#   local  - in-process bus, stands in for Redis in tests
+SOCKETIO_MANAGER = os.getenv("SOCKETIO_MANAGER", "memory")
+SOCKETIO_REDIS_URL = os.getenv("SOCKETIO_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+SOCKETIO_CHANNEL = os.getenv("SOCKETIO_CHANNEL", "the-new-hires-socketio")
+# Wire format: default (JSON) or msgpack (needs `pip install msgpack` and the
+# socket.io-msgpack-parser on the client)
+SOCKETIO_SERIALIZER = os.getenv("SOCKETIO_SERIALIZER", "default")
+
+# Packets waiting in a connection's send queue. Above the soft limit mergeable
+# events are held back and merged; at the hard limit the client is dropped
+# (it reconnects and refetches its state).
+SOCKETIO_QUEUE_SOFT_LIMIT = int(os.getenv("SOCKETIO_QUEUE_SOFT_LIMIT", "32"))
+SOCKETIO_QUEUE_LIMIT = int(os.getenv("SOCKETIO_QUEUE_LIMIT", "512"))
+# How often held events are retried
+SOCKETIO_FLUSH_INTERVAL = float(os.getenv("SOCKETIO_FLUSH_INTERVAL", "0.5"))
+
+# Events whose payloads are partial state (dicts of changed fields), so a newer
+# one can be merged into an undelivered older one
+MERGEABLE_EVENTS = {"stats_update"}
+
+
+# Server-side observers of emitted events: {event: [fn(data, room)]}. They run
+# on every worker for every emit (local or relayed by the pub/sub backend), so
+# per-worker caches can follow the event stream.
+emit_listeners = defaultdict(list)
+
+
+def on_emit(event: str):
+    def register(fn):
+        emit_listeners[event].append(fn)
+        return fn
+    return register
+
+
+def notify_emit(event: str, data, room=None):
+    for fn in emit_listeners.get(event, ()):
+        try:
+            fn(data, room)
+        except Exception as e:
+            print(f"Emit listener for {event} failed: {e}")
+
+
+def send_backlog(server, eio_sid) -> int:
+    """Packets queued for a connection that it hasn't received yet."""
+    socket = server.eio.sockets.get(eio_sid) if server is not None else None
+    queue = getattr(socket, "queue", None)
+    return queue.qsize() if queue is not None else 0
+
+
+class BackpressureMixin(socketio.AsyncManager):
+    """
+    Local delivery with per-connection backpressure: a MERGEABLE_EVENTS emit
+    to a client whose send queue is past SOCKETIO_QUEUE_SOFT_LIMIT is held,
+    later ones are merged into it (dict update), and the merge is sent once
+    the queue drains. Other events are sent as usual.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.held = {}  # (sid, namespace, event) -> merged data
+        self.flusher = None
+        self.merged = 0
+
+    async def emit(self, event, data, namespace, room=None, skip_sid=None, callback=None, to=None, **kwargs):
+        if event not in MERGEABLE_EVENTS or callback or not isinstance(data, dict) or namespace not in self.rooms:
+            return await super().emit(event, data, namespace, room=room, skip_sid=skip_sid, callback=callback, to=to, **kwargs)
+        skip = skip_sid if isinstance(skip_sid, list) else [skip_sid]
+        for sid, eio_sid in list(self.get_participants(namespace, to or room)):
+            if sid in skip:
+                continue
+            key = (sid, namespace, event)
+            if key in self.held or send_backlog(self.server, eio_sid) >= SOCKETIO_QUEUE_SOFT_LIMIT:
+                # Behind already: this update supersedes the undelivered fields
+                self.held[key] = {**self.held.get(key, {}), **data}
+                self.merged += 1
+                if self.flusher is None or self.flusher.done():
+                    self.flusher = asyncio.ensure_future(self._flush_held())
+            else:
+                await super().emit(event, data, namespace, to=sid)
+
+    async def _flush_held(self):
+        while self.held:
+            await asyncio.sleep(SOCKETIO_FLUSH_INTERVAL)
+            for key in list(self.held):
+                sid, namespace, event = key
+                eio_sid = self.eio_sid_from_sid(sid, namespace)
+                if eio_sid is None:
+                    del self.held[key]  # disconnected
+                elif send_backlog(self.server, eio_sid) < SOCKETIO_QUEUE_SOFT_LIMIT:
+                    await socketio.AsyncManager.emit(self, event, self.held.pop(key), namespace, to=sid)
+
+    def backpressure_stats(self) -> dict:
+        return {"held": len(self.held), "merged": self.merged}
+
+
+# Private python-socketio / python-engineio internals the classes here hook
+# into (pinned in requirements.txt); checked when the server is created so an
+# upgrade that renames them fails at startup instead of silently disabling
+# backpressure
+HOOKED_METHODS = [
+    (socketio.AsyncServer, "_send_eio_packet"),
+    (socketio.AsyncServer, "_send_packet"),
+    (socketio.AsyncManager, "get_participants"),
+    (socketio.AsyncManager, "eio_sid_from_sid"),
+    (AsyncPubSubManager, "_handle_emit"),
+    (AsyncPubSubManager, "_publish"),
+    (AsyncPubSubManager, "_listen"),
+]
+
+
+def check_socketio_hooks(server):
+    missing = [f"{cls.__name__}.{name}" for cls, name in HOOKED_METHODS if not callable(getattr(cls, name, None))]
+    probe = engineio.async_socket.AsyncSocket(server.eio, "probe")
+    queue = getattr(probe, "queue", None)
+    if not all(hasattr(queue, attr) for attr in ("qsize", "empty", "get_nowait", "put_nowait", "task_done")):
+        missing.append("AsyncSocket.queue")
+    if "abort" not in inspect.signature(probe.close).parameters:
+        missing.append("AsyncSocket.close(abort=)")
+    if missing:
+        raise RuntimeError(f"Installed python-socketio/python-engineio lack {', '.join(missing)}; "
+                           "use the versions pinned in requirements.txt")
+
+
+class BoundedServer(socketio.AsyncServer):
+    """AsyncServer that drops connections whose send queue reaches SOCKETIO_QUEUE_LIMIT."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        check_socketio_hooks(self)
+        self.slow_disconnects = 0
+
+    async def _send_eio_packet(self, eio_sid, eio_pkt):
+        if send_backlog(self, eio_sid) >= SOCKETIO_QUEUE_LIMIT:
+            return await self._drop_slow_client(eio_sid)
+        await super()._send_eio_packet(eio_sid, eio_pkt)
+
+    async def _send_packet(self, eio_sid, pkt):
+        if send_backlog(self, eio_sid) >= SOCKETIO_QUEUE_LIMIT:
+            return await self._drop_slow_client(eio_sid)
+        await super()._send_packet(eio_sid, pkt)
+
+    async def _drop_slow_client(self, eio_sid):
+        socket = self.eio.sockets.get(eio_sid)
+        if socket is None or socket.closing or socket.closed:
+            return
+        self.slow_disconnects += 1
+        print(f"Socket.IO client {eio_sid} is {socket.queue.qsize()} packets behind, disconnecting it")
+        # Discard what it hasn't received and wake its writer with the end-of-queue marker
+        while not socket.queue.empty():
+            socket.queue.get_nowait()
+            socket.queue.task_done()
+        socket.queue.put_nowait(None)
+        await socket.close(wait=False, abort=True)
+
+    def stats(self) -> dict:
+        stats = {"serializer": SOCKETIO_SERIALIZER, "slow_disconnects": self.slow_disconnects}
+        if isinstance(self.manager, BackpressureMixin):
+            stats.update(self.manager.backpressure_stats())
+        return stats
+
+
+class ObservedManager(BackpressureMixin):
+    """The default in-memory manager, plus emit listeners and backpressure."""
+
+    async def emit(self, event, data, namespace, room=None, **kwargs):
+        notify_emit(event, data, kwargs.get("to") or room)
+        return await super().emit(event, data, namespace, room=room, **kwargs)
+
+
+class ObservedPubSubMixin:
+    """Runs emit listeners for emits from this host and from every other host."""
+
+    async def _handle_emit(self, message):
+        data = message.get("data")
+        if not message.get("binary") and isinstance(data, list) and len(data) == 1:
+            notify_emit(message.get("event"), data[0], message.get("room"))
+        return await super()._handle_emit(message)
+
+
+# BackpressureMixin comes after the pub/sub class, so it handles the local
+# delivery that _handle_emit does for messages from every host
+class ObservedRedisManager(ObservedPubSubMixin, socketio.AsyncRedisManager, BackpressureMixin):
+    pass
+
+
+class LocalBus:
+    """A pub/sub channel inside one process: every subscriber sees every message."""
+
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self.subscribers:
+            self.subscribers.remove(queue)
+
+    def publish(self, message: str):
+        for queue in self.subscribers:
+            queue.put_nowait(message)
+
+
+local_bus = LocalBus()
+
+
+class LocalPubSubManager(ObservedPubSubMixin, AsyncPubSubManager, BackpressureMixin):
+    """
+    AsyncPubSubManager over a LocalBus. Several AsyncServers in one process
+    using the same bus behave like workers sharing Redis, which is how the
+    multi-worker paths are exercised without a broker.
+    """
+
+    name = "localpubsub"
+
+    def __init__(self, bus: LocalBus = None, channel: str = SOCKETIO_CHANNEL, write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.bus = bus or local_bus
+        self.queue = None if write_only else self.bus.subscribe()
+
+    async def _publish(self, data):
+        # Round-trip through JSON like a real broker would
+        self.bus.publish(json.dumps(data))
+
+    async def _listen(self):
+        while True:
+            yield await self.queue.get()
+
+
+def make_client_manager(kind: str = None):
+    """Client manager for AsyncServer(client_manager=...)."""
+    kind = kind or SOCKETIO_MANAGER
+    if kind == "memory":
+        return ObservedManager()
+    if kind == "redis":
+        return ObservedRedisManager(SOCKETIO_REDIS_URL, channel=SOCKETIO_CHANNEL)
+    if kind == "local":
+        return LocalPubSubManager()
+    raise ValueError(f"Unknown SOCKETIO_MANAGER {kind!r} (expected memory, redis or local)")
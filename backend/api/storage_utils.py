@@ -1,18 +1,83 @@
-import shutil
 import os
-from fastapi import UploadFile
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+from fastapi import UploadFile, HTTPException
 
 UPLOAD_DIR = "static"
 
-def save_upload_file(upload_file: UploadFile, destination_path: str) -> str:
+# Uploads are saved, and media files later re-read for Gemini (iter_file_chunks
+# -> ai_utils.upload_media_stream), in fixed-size chunks. Must stay a multiple
+# of 256 KiB: resumable upload providers reject other non-final chunk sizes.
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "200")) * 1024 * 1024
+
+# A consumer receives the upload as an async iterator of chunks and returns a result
+ChunkConsumer = Callable[[AsyncIterator[bytes]], Awaitable]
+
+
+def check_upload_size(upload_file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES):
+    """Rejects an upload whose declared size is over the limit before reading it."""
+    if upload_file.size is not None and upload_file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"File too large (max {max_bytes // (1024 * 1024)} MB)")
+
+
+async def stream_upload(upload_file: UploadFile, consumer: ChunkConsumer, max_bytes: int = MAX_UPLOAD_BYTES, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """
+    Hands an upload to consumer in fixed-size chunks, one at a time, so the
+    file is never held in memory whole. The size limit is enforced up front
+    from the declared size and again while reading (the consumer sees the
+    413 raised into its loop, so it can clean up). Returns the consumer's result.
+    """
+    check_upload_size(upload_file, max_bytes)
+
+    async def chunks():
+        total = 0
+        while True:
+            chunk = await upload_file.read(chunk_size)
+            if not chunk:
+                return
+            total += len(chunk)
+            if total > max_bytes:
+                raise HTTPException(status_code=413, detail=f"File too large (max {max_bytes // (1024 * 1024)} MB)")
+            yield chunk
+
     try:
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        return await consumer(chunks())
+    finally:
+        await upload_file.close()
+
+
+def save_to_static(destination_path: str) -> ChunkConsumer:
+    """Consumer that writes the chunks under static/ off the event loop and returns the file URL."""
+    async def consumer(chunks: AsyncIterator[bytes]) -> str:
         file_path = os.path.join(UPLOAD_DIR, destination_path)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(upload_file.file, buffer)
-            
+        await asyncio.to_thread(os.makedirs, UPLOAD_DIR, exist_ok=True)
+        buffer = await asyncio.to_thread(open, file_path, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(buffer.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(buffer.close)
+            await asyncio.to_thread(os.remove, file_path)
+            raise
+        await asyncio.to_thread(buffer.close)
         # Return localhost URL
         return f"http://localhost:8000/static/{destination_path}"
+    return consumer
+
+
+async def iter_file_chunks(file_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Reads a local file in fixed-size chunks without blocking the event loop."""
+    f = await asyncio.to_thread(open, file_path, "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
     finally:
-        upload_file.file.close()
+        await asyncio.to_thread(f.close)
+
+
+async def save_upload_file(upload_file: UploadFile, destination_path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    return await stream_upload(upload_file, save_to_static(destination_path), max_bytes=max_bytes)
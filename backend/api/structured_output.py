@@ -0,0 +1,275 @@
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+# Schemas for Gemini's schema-constrained JSON mode (response_schema)
+REVIEW_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "summary": {"type": "STRING"},
+        "comments": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "file": {"type": "STRING"},
+                    "line": {"type": "INTEGER"},
+                    "category": {"type": "STRING", "enum": ["Opinion", "Security", "Performance", "Pro-Tip"]},
+                    "message": {"type": "STRING"},
+                    "suggestion": {"type": "STRING"},
+                },
+                "required": ["file", "line", "category", "message"],
+            },
+        },
+    },
+    "required": ["summary", "comments"],
+    "property_ordering": ["summary", "comments"],
+}
+
+TICKET_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "title": {"type": "STRING"},
+        "description": {"type": "STRING"},
+        "type": {"type": "STRING", "enum": ["story", "task", "bug"]},
+        "priority": {"type": "STRING", "enum": ["LOW", "MEDIUM", "HIGH", "CRITICAL"]},
+        "story_points": {"type": "INTEGER"},
+        "day": {"type": "INTEGER"},
+    },
+    "required": ["title", "description", "type", "priority", "story_points"],
+}
+
+# Files are a list of {path, content} (not a map) so the schema can describe
+# them and each file streams out as its own completed object.
+PROJECT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "project_name": {"type": "STRING"},
+        "repo_name": {"type": "STRING"},
+        "files": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "path": {"type": "STRING"},
+                    "content": {"type": "STRING"},
+                },
+                "required": ["path", "content"],
+                "property_ordering": ["path", "content"],
+            },
+        },
+        "tickets": {"type": "ARRAY", "items": TICKET_SCHEMA},
+    },
+    "required": ["project_name", "repo_name", "files", "tickets"],
+    "property_ordering": ["project_name", "repo_name", "files", "tickets"],
+}
+
+TRUTHFULNESS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "score": {"type": "INTEGER"},
+        "explanation": {"type": "STRING"},
+    },
+    "required": ["score", "explanation"],
+    "property_ordering": ["score", "explanation"],
+}
+
+TRUTHFULNESS_BATCH_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "results": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "id": {"type": "INTEGER"},
+                    "score": {"type": "INTEGER"},
+                    "explanation": {"type": "STRING"},
+                },
+                "required": ["id", "score", "explanation"],
+                "property_ordering": ["id", "score", "explanation"],
+            },
+        },
+    },
+    "required": ["results"],
+}
+
+
+def strip_code_fences(text: str) -> str:
+    """Removes a surrounding ```json ... ``` block if the model added one."""
+    content = text.strip()
+    if content.startswith("```json"):
+        content = content[7:]
+    elif content.startswith("```"):
+        content = content[3:]
+    if content.rstrip().endswith("```"):
+        content = content.rstrip()[:-3]
+    return content.strip()
+
+
+def parse_json_response(text: str) -> Any:
+    """json.loads for model output, tolerating markdown fences."""
+    return json.loads(strip_code_fences(text))
+
+
+# Inside a string only quotes and backslashes matter
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_END = set(",}] \t\r\n")
+
+
+class _Frame:
+    __slots__ = ("type", "key", "index", "expect_key", "value_start")
+
+    def __init__(self, type_: str):
+        self.type = type_
+        self.key = None
+        self.index = 0
+        self.expect_key = type_ == "{"
+        self.value_start = None
+
+
+class IncrementalJSONParser:
+    """
+    Streaming parser for a single JSON document arriving in chunks.
+
+    feed() returns events for values as soon as they are complete:
+      (field, None, value)  - a top-level field finished, e.g. ("repo_name", None, "todo-app")
+      (field, index, value) - an element of a top-level array (index = position)
+                              or object (index = key) finished, e.g. ("files", 0, {...})
+    For a top-level array the field is None and index is the element position.
+
+    result() returns the parsed document, or whatever could be assembled from
+    completed values if the full text turns out to be malformed.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.stack: List[_Frame] = []
+        self.started = False
+        self.done = False
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.string_is_key = False
+        self.scalar_start = None
+        self.partial = None
+
+    def feed(self, chunk: str) -> List[Tuple[Optional[str], Any, Any]]:
+        self.text += chunk
+        events = []
+        text = self.text
+        i = self.pos
+        n = len(text)
+
+        while i < n and not self.done:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                    i += 1
+                    continue
+                m = _STRING_SPECIAL.search(text, i)
+                if not m:
+                    i = n
+                    break
+                i = m.start()
+                if text[i] == "\\":
+                    self.escape = True
+                else:
+                    self.in_string = False
+                    self._string_end(i, events)
+                i += 1
+                continue
+
+            c = text[i]
+
+            if not self.started:
+                if c in "{[":
+                    self.started = True
+                    self.partial = {} if c == "{" else []
+                    self.stack.append(_Frame(c))
+                i += 1
+                continue
+
+            if self.scalar_start is not None and c in _SCALAR_END:
+                self._value_end(self.scalar_start, i, events)
+                self.scalar_start = None
+
+            frame = self.stack[-1]
+            if c == '"':
+                self.in_string = True
+                self.string_start = i
+                self.string_is_key = frame.type == "{" and frame.expect_key
+                if not self.string_is_key:
+                    frame.value_start = i
+            elif c in "{[":
+                frame.value_start = i
+                self.stack.append(_Frame(c))
+            elif c in "}]":
+                self.stack.pop()
+                if not self.stack:
+                    self.done = True
+                else:
+                    self._value_end(self.stack[-1].value_start, i + 1, events)
+            elif c == ":":
+                frame.expect_key = False
+            elif c == ",":
+                if frame.type == "{":
+                    frame.expect_key = True
+                else:
+                    frame.index += 1
+            elif c not in " \t\r\n" and self.scalar_start is None:
+                frame.value_start = i
+                self.scalar_start = i
+            i += 1
+
+        self.pos = i
+        return events
+
+    def _string_end(self, i: int, events: list):
+        if self.string_is_key:
+            frame = self.stack[-1]
+            try:
+                frame.key = json.loads(self.text[self.string_start:i + 1])
+            except ValueError:
+                frame.key = None
+        else:
+            self._value_end(self.string_start, i + 1, events)
+
+    def _value_end(self, start: Optional[int], end: int, events: list):
+        depth = len(self.stack)
+        if start is None or depth > 2:
+            return
+        try:
+            value = json.loads(self.text[start:end])
+        except ValueError:
+            return
+
+        frame = self.stack[-1]
+        if depth == 1:
+            if frame.type == "{":
+                events.append((frame.key, None, value))
+                self.partial[frame.key] = value
+            else:
+                events.append((None, frame.index, value))
+                self.partial.append(value)
+        else:
+            top = self.stack[0]
+            field = top.key if top.type == "{" else None
+            index = frame.key if frame.type == "{" else frame.index
+            events.append((field, index, value))
+            if top.type == "{":
+                container = self.partial.setdefault(field, {} if frame.type == "{" else [])
+                if isinstance(container, dict):
+                    container[index] = value
+                elif isinstance(container, list):
+                    container.append(value)
+
+    def result(self) -> Any:
+        try:
+            return parse_json_response(self.text)
+        except ValueError:
+            if self.partial:
+                print(f"Structured output: recovered partial JSON with fields {list(self.partial) if isinstance(self.partial, dict) else len(self.partial)}")
+                return self.partial
+            raise
@@ -0,0 +1,263 @@
+import os
+import asyncio
+import socket
+import uuid
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import select, update, delete, and_, or_, func, exists
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Task
+from database import AsyncSessionLocal
+
+# Tasks a worker runs at once, and how often an idle worker polls for due tasks
+TASK_CONCURRENCY = int(os.getenv("TASK_CONCURRENCY", "8"))
+TASK_POLL_INTERVAL = float(os.getenv("TASK_POLL_INTERVAL", "1"))
+# Attempts per task; retry n waits TASK_RETRY_DELAY * 2**(n-1) seconds
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "3"))
+TASK_RETRY_DELAY = float(os.getenv("TASK_RETRY_DELAY", "5"))
+# A running task whose worker hasn't finished it by then (crashed, killed) is handed out again
+TASK_LOCK_TIMEOUT = float(os.getenv("TASK_LOCK_TIMEOUT", "300"))
+# While a task runs its worker refreshes locked_at this often, so long tasks (big PR reviews) aren't handed out twice
+TASK_HEARTBEAT_INTERVAL = float(os.getenv("TASK_HEARTBEAT_INTERVAL", str(TASK_LOCK_TIMEOUT / 3)))
+# Run a worker inside each web process; set to false when running `python worker.py` instead
+TASK_WORKER_IN_PROCESS = os.getenv("TASK_WORKER_IN_PROCESS", "true").lower() == "true"
+
+# kind -> async handler(payload)
+task_handlers: Dict[str, Callable[[dict], Awaitable[None]]] = {}
+
+
+def task_handler(kind: str):
+    """Registers the coroutine that runs tasks of `kind`."""
+    def decorator(fn):
+        task_handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def retry_delay(attempts: int) -> float:
+    return TASK_RETRY_DELAY * 2 ** max(0, attempts - 1)
+
+
+async def enqueue(kind: str, payload: dict, delay: float = 0, max_attempts: int = TASK_MAX_ATTEMPTS, db: Optional[AsyncSession] = None,
+                  key: Optional[str] = None, merge: Optional[Callable[[dict, dict], dict]] = None) -> int:
+    """
+    Queues a task to run `delay` seconds from now. With `db` the task is only
+    added to that session (it becomes visible when the caller commits, so it
+    can't outlive a rolled back request); otherwise it is committed right away.
+
+    Tasks with the same kind and `key` run one at a time (see claim_statement).
+    With `merge`, a task for a key that already has one waiting (queued and
+    not yet attempted) is folded into it: its payload becomes
+    merge(queued payload, payload) and no new row is added.
+    """
+    async def add(session: AsyncSession) -> int:
+        if key is not None and merge is not None:
+            # Serializes enqueuers of this key until commit, so two can't both miss the waiting task
+            await session.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"{kind}:{key}"))))
+            result = await session.execute(
+                select(Task)
+                .where(Task.kind == kind, Task.key == key, Task.status == "queued", Task.attempts == 0)
+                .order_by(Task.id.desc())
+                .limit(1)
+                .with_for_update()
+            )
+            waiting = result.scalar_one_or_none()
+            if waiting is not None:
+                waiting.payload = merge(waiting.payload, payload)
+                await session.flush()
+                return waiting.id
+        # Due times use the database clock, like claim_tasks
+        task = Task(kind=kind, key=key, payload=payload, status="queued", attempts=0, max_attempts=max_attempts,
+                    run_at=func.now() + timedelta(seconds=delay))
+        session.add(task)
+        await session.flush()
+        return task.id
+
+    if db is not None:
+        return await add(db)
+    async with AsyncSessionLocal() as session:
+        task_id = await add(session)
+        await session.commit()
+        return task_id
+
+
+def claim_statement(worker_id: str, limit: int):
+    """
+    Marks up to `limit` due tasks as running for this worker and returns them.
+    SKIP LOCKED lets any number of workers poll concurrently without handing
+    the same task out twice or waiting on each other's row locks. A keyed
+    task is only due once it is the oldest of its key and none of its key is
+    running.
+    """
+    stale = func.now() - timedelta(seconds=TASK_LOCK_TIMEOUT)
+    due = or_(
+        and_(Task.status == "queued", Task.run_at <= func.now()),
+        and_(Task.status == "running", Task.locked_at < stale)
+    )
+    other = aliased(Task)
+    blocked = exists().where(
+        other.kind == Task.kind,
+        other.key == Task.key,
+        other.id != Task.id,
+        or_(
+            and_(other.status.in_(["queued", "running"]), other.id < Task.id),
+            and_(other.status == "running", other.locked_at >= stale)
+        )
+    )
+    ids = (
+        select(Task.id)
+        .where(due, or_(Task.key.is_(None), ~blocked))
+        .order_by(Task.run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return (
+        update(Task)
+        .where(Task.id.in_(ids))
+        .values(status="running", locked_by=worker_id, locked_at=func.now(), attempts=Task.attempts + 1)
+        .returning(Task.id, Task.kind, Task.payload, Task.attempts, Task.max_attempts)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def claim_tasks(db: AsyncSession, worker_id: str, limit: int) -> list:
+    result = await db.execute(claim_statement(worker_id, limit))
+    rows = result.all()
+    await db.commit()
+    return rows
+
+
+async def heartbeat_task(db: AsyncSession, task_id: int, worker_id: str):
+    await db.execute(
+        update(Task)
+        .where(Task.id == task_id, Task.status == "running", Task.locked_by == worker_id)
+        .values(locked_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def complete_task(db: AsyncSession, task_id: int):
+    await db.execute(delete(Task).where(Task.id == task_id).execution_options(synchronize_session=False))
+    await db.commit()
+
+
+async def fail_task(db: AsyncSession, task, error: str) -> bool:
+    """
+    Schedules a retry with backoff, or marks the task failed for good. Returns
+    True on retry. The payload is written back, so progress a handler records
+    in it (e.g. what it already posted) is seen by the retry.
+    """
+    retry = task.attempts < task.max_attempts
+    values = {"payload": task.payload, "locked_by": None, "locked_at": None, "last_error": error[:2000]}
+    if retry:
+        values.update(status="queued", run_at=func.now() + timedelta(seconds=retry_delay(task.attempts)))
+    else:
+        values["status"] = "failed"
+    await db.execute(update(Task).where(Task.id == task.id).values(**values).execution_options(synchronize_session=False))
+    await db.commit()
+    return retry
+
+
+class TaskWorker:
+    """
+    Polls the tasks table and runs up to `concurrency` handlers at once. Start
+    one per web process (TASK_WORKER_IN_PROCESS) or any number of separate
+    `python worker.py` processes; they share the queue through SKIP LOCKED.
+    """
+
+    def __init__(self, concurrency: int = TASK_CONCURRENCY, poll_interval: float = TASK_POLL_INTERVAL, session_factory=None):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.running = set()
+        self.stopping = False
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def run(self):
+        print(f"Task worker {self.worker_id} started (concurrency={self.concurrency})")
+        while not self.stopping:
+            free = self.concurrency - len(self.running)
+            if free <= 0:
+                await asyncio.wait(self.running, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            claimed = []
+            try:
+                async with self.session_factory() as db:
+                    claimed = await claim_tasks(db, self.worker_id, free)
+            except Exception as e:
+                print(f"Task worker could not claim tasks: {e}")
+            for row in claimed:
+                task = asyncio.ensure_future(self._execute(row))
+                self.running.add(task)
+                task.add_done_callback(self.running.discard)
+            if len(claimed) < free:
+                # Queue drained: wait before polling again (a full batch polls right away)
+                await asyncio.sleep(self.poll_interval)
+        await self.drain()
+
+    async def _heartbeat(self, task):
+        while True:
+            await asyncio.sleep(TASK_HEARTBEAT_INTERVAL)
+            try:
+                async with self.session_factory() as db:
+                    await heartbeat_task(db, task.id, self.worker_id)
+            except Exception as e:
+                print(f"Could not refresh the lock of task {task.id}: {e}")
+
+    async def _execute(self, task):
+        handler = task_handlers.get(task.kind)
+        heartbeat = asyncio.ensure_future(self._heartbeat(task))
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for task kind {task.kind!r}")
+            try:
+                await handler(task.payload)
+            finally:
+                heartbeat.cancel()
+        except Exception as e:
+            print(f"Task {task.id} ({task.kind}) attempt {task.attempts}/{task.max_attempts} failed: {e!r}")
+            try:
+                async with self.session_factory() as db:
+                    retry = await fail_task(db, task, repr(e))
+                if retry:
+                    self.retried += 1
+                else:
+                    self.failed += 1
+            except Exception as db_error:
+                # Left running; claimed again once TASK_LOCK_TIMEOUT passes
+                print(f"Could not record failure of task {task.id}: {db_error}")
+            return
+        try:
+            async with self.session_factory() as db:
+                await complete_task(db, task.id)
+            self.succeeded += 1
+        except Exception as e:
+            print(f"Could not mark task {task.id} done: {e}")
+
+    def stop(self):
+        self.stopping = True
+
+    async def drain(self):
+        """Waits for the handlers already running."""
+        if self.running:
+            await asyncio.wait(self.running)
+
+    def stats(self) -> dict:
+        return {
+            "worker": self.worker_id,
+            "concurrency": self.concurrency,
+            "running": len(self.running),
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "failed": self.failed,
+            "handlers": sorted(task_handlers)
+        }
+
+
+# The web process's worker, when TASK_WORKER_IN_PROCESS is on (started by main.lifespan)
+task_worker: Optional[TaskWorker] = None
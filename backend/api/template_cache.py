@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import logging
+from typing import List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.getenv(
+    "TEMPLATE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "template_cache")
+)
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", "50"))
+# Cosine similarity between normalized descriptions needed to reuse a template
+TEMPLATE_SIMILARITY = float(os.getenv("TEMPLATE_SIMILARITY", "0.92"))
+
+
+def normalize_description(text: str) -> str:
+    text = re.sub(r"[^a-z0-9 ]+", " ", text.lower())
+    return " ".join(text.split())
+
+
+def stack_key(backend_stack: str, frontend_stack: str) -> str:
+    return f"{normalize_description(backend_stack)}|{normalize_description(frontend_stack)}"
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    denom = np.linalg.norm(a) * np.linalg.norm(b)
+    if denom == 0:
+        return 0.0
+    return float(np.dot(a, b) / denom)
+
+
+def reparameterize(project: dict, old_description: str, new_description: str) -> dict:
+    """Swaps the original description for the new one in files and tickets."""
+    def swap(value):
+        if isinstance(value, str) and old_description and old_description != new_description:
+            return value.replace(old_description, new_description)
+        return value
+
+    result = dict(project)
+    result["files"] = {path: swap(content) for path, content in project.get("files", {}).items()}
+    result["tickets"] = [
+        {key: swap(value) for key, value in ticket.items()}
+        for ticket in project.get("tickets", [])
+    ]
+    result["from_template"] = True
+    return result
+
+
+class TemplateCache:
+    """
+    On-disk library of generated projects keyed by (backend_stack, frontend_stack)
+    plus an embedding of the normalized description. A lookup whose description
+    is similar enough to a stored one reuses that project instead of generating.
+    The index lives in index.json; each project is stored in its own file and
+    the least recently used templates are evicted beyond max_entries.
+    """
+
+    def __init__(self, directory: str = TEMPLATE_DIR, max_entries: int = TEMPLATE_CACHE_SIZE, threshold: float = TEMPLATE_SIMILARITY):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.index_path = os.path.join(directory, "index.json")
+        self.entries = {}  # {id: {"stack", "description", "embedding", "last_used"}}
+        self.lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r") as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                logger.error(f"Failed to load template index: {e}")
+                self.entries = {}
+
+    def _write_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _project_path(self, template_id: str) -> str:
+        return os.path.join(self.directory, f"{template_id}.json")
+
+    def _read_project(self, template_id: str) -> Optional[dict]:
+        try:
+            with open(self._project_path(template_id), "r") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to read template {template_id}: {e}")
+            return None
+
+    def _write_project(self, template_id: str, project: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._project_path(template_id), "w") as f:
+            json.dump(project, f)
+
+    def _best_match(self, stack: str, embedding: List[float]):
+        best_id, best_score = None, 0.0
+        for template_id, entry in self.entries.items():
+            if entry["stack"] != stack:
+                continue
+            score = cosine_similarity(entry["embedding"], embedding)
+            if score > best_score:
+                best_id, best_score = template_id, score
+        return best_id, best_score
+
+    async def lookup(self, description: str, backend_stack: str, frontend_stack: str, embedding: List[float]) -> Optional[dict]:
+        stack = stack_key(backend_stack, frontend_stack)
+        async with self.lock:
+            template_id, score = self._best_match(stack, embedding)
+            if template_id is None or score < self.threshold:
+                self.misses += 1
+                return None
+
+            project = await asyncio.to_thread(self._read_project, template_id)
+            if project is None:
+                self.entries.pop(template_id, None)
+                await asyncio.to_thread(self._write_index)
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            entry = self.entries[template_id]
+            entry["last_used"] = time.time()
+            await asyncio.to_thread(self._write_index)
+            print(f"Template cache hit ({score:.3f}) for '{description}' -> '{entry['description']}'")
+            return reparameterize(project, entry["description"], description)
+
+    async def store(self, description: str, backend_stack: str, frontend_stack: str, embedding: List[float], project: dict):
+        if not any(embedding):
+            return
+        template_id = uuid.uuid4().hex
+        stored = {key: value for key, value in project.items() if key not in ("is_fallback", "from_template")}
+        async with self.lock:
+            self.entries[template_id] = {
+                "stack": stack_key(backend_stack, frontend_stack),
+                "description": description,
+                "embedding": list(embedding),
+                "last_used": time.time()
+            }
+            await asyncio.to_thread(self._write_project, template_id, stored)
+            evicted = self._evict()
+            await asyncio.to_thread(self._write_index)
+            for old_id in evicted:
+                try:
+                    await asyncio.to_thread(os.remove, self._project_path(old_id))
+                except OSError:
+                    pass
+
+    def _evict(self) -> List[str]:
+        if len(self.entries) <= self.max_entries:
+            return []
+        by_age = sorted(self.entries, key=lambda template_id: self.entries[template_id]["last_used"])
+        evicted = by_age[:len(self.entries) - self.max_entries]
+        for template_id in evicted:
+            del self.entries[template_id]
+        return evicted
+
+    def stats(self) -> dict:
+        return {"templates": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+template_cache = TemplateCache()
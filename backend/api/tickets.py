@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List, Optional
@@ -62,7 +62,7 @@ async def create_ticket(ticket: TicketCreate, db: AsyncSession = Depends(get_db)
     return db_ticket
 
 @router.patch("/{ticket_id}", response_model=TicketOut)
-async def update_ticket(ticket_id: int, ticket_update: TicketUpdate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+async def update_ticket(ticket_id: int, ticket_update: TicketUpdate, db: AsyncSession = Depends(get_db)):
     stmt = select(Ticket).options(selectinload(Ticket.assignee)).where(Ticket.id == ticket_id)
     result = await db.execute(stmt)
     db_ticket = result.scalar_one_or_none()
@@ -120,11 +120,12 @@ async def update_ticket(ticket_id: int, ticket_update: TicketUpdate, background_
     if "status" in update_data and update_data["status"] == "IN_TEST":
         from .ai_chat import trigger_proactive_message
         username = db_ticket.assignee.username if db_ticket.assignee else "Teammate"
-        background_tasks.add_task(
-            trigger_proactive_message,
+        # Queued with the ticket update, so it's only sent if the update commits
+        await trigger_proactive_message(
             "code-review",
             f"User {username} just moved ticket '{db_ticket.title}' to Testing/Review. Offer to help test or review.",
-            username
+            username,
+            db=db
         )
     
     # Validate priority if provided
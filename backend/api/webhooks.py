@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Request, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, Request, HTTPException, Depends
 import hashlib
 import hmac
 import os
-import httpx
-from database import get_db
+from database import get_db, AsyncSessionLocal
 from models import User
 from sqlalchemy.future import select
 from .gamification_utils import update_effort_and_collaboration, update_quality
-from .ai_utils import analyze_diff
+from .ai_utils import review_diff
+from .pr_cache import diff_cache
+from .providers import http_client
+from .github_utils import GITHUB_API_URL
+from .task_queue import enqueue, task_handler
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/webhooks", tags=["webhooks"])
@@ -39,18 +42,17 @@ async def process_pr_review(payload: dict, access_token: str):
         return
 
     # 1. Fetch Diff
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         # We need to send headers to get the diff format, but diff_url is a public-ish redirect URL usually.
         # But for private repos or better reliability we use API.
         # Let's use the diff_url provided by webhook but add auth if needed.
-        diff_res = await client.get(diff_url, headers={"Authorization": f"token {access_token}"}, follow_redirects=True)
-        if diff_res.status_code != 200:
-            print(f"Failed to fetch diff: {diff_res.status_code}")
+        status_code, diff_content = await diff_cache.fetch(client, diff_url, headers={"Authorization": f"token {access_token}"})
+        if status_code != 200:
+            print(f"Failed to fetch diff: {status_code}")
             return
-        diff_content = diff_res.text
 
     # 2. Analyze Code
-    review_data = await analyze_diff(diff_content, title)
+    review_data = await review_diff(diff_content, title)
     comments = review_data.get("comments", [])
     
     if not comments:
@@ -75,8 +77,8 @@ async def process_pr_review(payload: dict, access_token: str):
             "body": f"💡 {comment['message']}"  
         })
 
-    async with httpx.AsyncClient() as client:
-        post_url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pull_number}/reviews"
+    async with http_client() as client:
+        post_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pull_number}/reviews"
         post_res = await client.post(
             post_url,
             headers={
@@ -88,8 +90,15 @@ async def process_pr_review(payload: dict, access_token: str):
         if post_res.status_code not in [200, 201]:
              print(f"Failed to post review: {post_res.text}")
 
+@task_handler("pr_review")
+async def run_pr_review_task(task: dict):
+    # The token is looked up when the task runs rather than stored in the queue
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, task["user_id"])
+    await process_pr_review(task["payload"], getattr(user, "access_token", None))
+
 @router.post("/github")
-async def github_webhook(request: Request, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+async def github_webhook(request: Request, db: AsyncSession = Depends(get_db)):
     await verify_signature(request)
     
     payload = await request.json()
@@ -107,8 +116,16 @@ async def github_webhook(request: Request, background_tasks: BackgroundTasks, db
                 user = result.scalar_one_or_none()
                 
                 if user and user.access_token:
-                    # Run logic in background
-                    background_tasks.add_task(process_pr_review, payload, user.access_token)
+                    # Reviewed by a task worker; only the fields process_pr_review reads are queued
+                    pull_request = payload.get("pull_request", {})
+                    repository = payload.get("repository", {})
+                    await enqueue("pr_review", {
+                        "user_id": user.id,
+                        "payload": {
+                            "pull_request": {key: pull_request.get(key) for key in ("number", "diff_url", "title")},
+                            "repository": {"name": repository.get("name"), "owner": {"login": repository.get("owner", {}).get("login")}}
+                        }
+                    }, db=db)
                     
                     from .activity import log_activity
                     from models import ActivityType
@@ -0,0 +1,134 @@
+"""
+Message search benchmark.
+
+    python bench_search.py                      # in-process index, 1M messages
+    python bench_search.py --messages 200000
+    python bench_search.py --postgres           # GIN index in DATABASE_URL (run `alembic upgrade head` first)
+
+The Postgres run inserts the synthetic messages into the `bench` channel of
+the messages table and deletes them afterwards (unless --keep), so point
+DATABASE_URL at a scratch database.
+"""
+import argparse
+import asyncio
+import random
+import resource
+import statistics
+import time
+
+# Zipf-ish vocabulary: a few very common words, a long tail of rare ones
+COMMON = "build deploy review test merge branch bug fix ticket standup sprint release".split()
+VOCABULARY = COMMON + [f"term{i}" for i in range(20000)]
+CHANNELS = ["general", "dev", "code-review", "random"]
+
+QUERIES = {
+    "common term": "deploy",
+    "two common terms": "deploy review",
+    "rare term": "term15123",
+    "common + rare": "build term733",
+    "no match": "term5 term6 term7",
+}
+
+
+def word(rng: random.Random) -> str:
+    return VOCABULARY[int(rng.random() ** 4 * len(VOCABULARY))]
+
+
+def synthetic_messages(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    for msg_id in range(1, count + 1):
+        yield msg_id, CHANNELS[msg_id % len(CHANNELS)], " ".join(word(rng) for _ in range(rng.randint(4, 24)))
+
+
+def report(name: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"  {name:<18} p50 {statistics.median(timings) * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms")
+
+
+def bench_in_process(count: int, runs: int):
+    from api.search_index import InvertedIndex
+
+    index = InvertedIndex()
+    started = time.perf_counter()
+    for msg_id, channel, content in synthetic_messages(count):
+        index.add(msg_id, channel, content)
+    print(f"Indexed {count:,} messages in {time.perf_counter() - started:.1f}s "
+          f"({len(index.postings):,} terms, max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB)")
+
+    for channel in (None, "dev"):
+        print(f"Top 20{' in #' + channel if channel else ''}:")
+        for name, query in QUERIES.items():
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                index.search(query, 21, channel=channel)
+                timings.append(time.perf_counter() - started)
+            report(name, timings)
+
+
+# Same word distribution as synthetic_messages (the subquery references g so it runs per row)
+SEED_SQL = """
+INSERT INTO messages (channel, content, is_bot, timestamp)
+SELECT 'bench',
+       (SELECT string_agg(b.words[1 + floor(power(random(), 4) * array_length(b.words, 1))::int], ' ')
+        FROM generate_series(1, 4 + (g % 21)) AS w(n) WHERE g > 0),
+       false,
+       now() - make_interval(secs => CAST(:count AS integer) - g)
+FROM generate_series(1, CAST(:count AS integer)) AS g, bench_words AS b
+"""
+
+
+async def bench_postgres(count: int, runs: int, keep: bool):
+    from sqlalchemy import text, delete
+    from database import AsyncSessionLocal, engine
+    from models import Message
+    from api.messages import search_query
+
+    engine.echo = False
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        await db.execute(text(f"CREATE TEMP TABLE bench_words AS SELECT ARRAY[{', '.join(repr(w) for w in VOCABULARY)}] AS words"))
+        await db.execute(text(SEED_SQL), {"count": count})
+        await db.commit()
+        await db.execute(text("ANALYZE messages"))
+        print(f"Inserted {count:,} messages in {time.perf_counter() - started:.1f}s")
+
+        try:
+            for channel in (None, "bench"):
+                print(f"Top 20{' in #' + channel if channel else ''}:")
+                for name, query in QUERIES.items():
+                    timings = []
+                    for _ in range(runs):
+                        started = time.perf_counter()
+                        await db.execute(search_query(query, 21, 0, channel))
+                        timings.append(time.perf_counter() - started)
+                    report(name, timings)
+
+            plan = await db.execute(text("EXPLAIN " + str(search_query("deploy review", 21).compile(
+                dialect=engine.dialect, compile_kwargs={"literal_binds": True}))))
+            print("\nPlan for 'deploy review':")
+            for row in plan:
+                print("  " + row[0])
+        finally:
+            if not keep:
+                await db.execute(delete(Message).where(Message.channel == "bench"))
+                await db.commit()
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--postgres", action="store_true")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic messages (Postgres)")
+    args = parser.parse_args()
+    if args.postgres:
+        asyncio.run(bench_postgres(args.messages, args.runs, args.keep))
+    else:
+        bench_in_process(args.messages, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ import os
 load_dotenv()
 
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -11,7 +13,29 @@ from api import auth, tickets, messages, onboarding, webhooks, ai, features, act
 import socketio
 import os
 
-app = FastAPI(title="The New Hire API", description="API for The New Hire Job Simulator")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resolve the AI teammates' user rows once, so bot messages need no identity queries
+    from api.ai_chat import load_teammate_identities
+    try:
+        identities = await load_teammate_identities()
+        print(f"Loaded {len(identities)} AI teammate identities")
+    except Exception as e:
+        # Not fatal: they are loaded on first use instead
+        print(f"Could not load AI teammate identities at startup: {e}")
+
+    # Runs queued AI work (replies, reviews) unless separate `python worker.py` processes do
+    from api import task_queue
+    runner = None
+    if task_queue.TASK_WORKER_IN_PROCESS:
+        task_queue.task_worker = task_queue.TaskWorker()
+        runner = asyncio.create_task(task_queue.task_worker.run())
+    yield
+    if runner:
+        task_queue.task_worker.stop()
+        await runner
+
+app = FastAPI(title="The New Hire API", description="API for The New Hire Job Simulator", lifespan=lifespan)
 
 print("\n\n" + "="*50)
 print("STARTING THE NEW HIRES API... v3 (Audio Fixes Applied)")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, Text, JSON, Index, literal_column
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.mutable import MutableList
 from sqlalchemy.sql import func
@@ -81,11 +81,18 @@ class Sprint(Base):
     end_date = Column(DateTime)
     is_active = Column(Boolean, default=False)
 
+# Text search configuration of message search. It is a literal rather than a
+# bind parameter so search queries match the ix_messages_content_fts expression.
+MESSAGE_SEARCH_CONFIG = "english"
+
+def message_search_vector(content):
+    return func.to_tsvector(literal_column(f"'{MESSAGE_SEARCH_CONFIG}'::regconfig"), content)
+
 class Message(Base):
     __tablename__ = "messages"
 
     id = Column(Integer, primary_key=True, index=True)
-    channel = Column(String, index=True)
+    channel = Column(String)
     content = Column(Text)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=True) # Null for bot
     is_bot = Column(Boolean, default=False)
@@ -93,6 +100,14 @@ class Message(Base):
     
     sender = relationship("User", back_populates="messages")
 
+    __table_args__ = (
+        # Keyset pagination of channel history (see api/messages.py)
+        Index("ix_messages_channel_timestamp_id", "channel", "timestamp", "id"),
+        # Full-text search (see api/messages.py search_query)
+        # Postgres only: other databases search the in-process index instead
+        Index("ix_messages_content_fts", message_search_vector(content), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
 class StandupSession(Base):
     __tablename__ = "standups"
 
@@ -163,3 +178,28 @@ class Activity(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+
+class Task(Base):
+    """Durable background work (see api/task_queue.py)."""
+    __tablename__ = "tasks"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    # Tasks of a kind sharing a key run one at a time, and new work for the key is merged into its queued task
+    key = Column(String, nullable=True)
+    payload = Column(JSON, nullable=False, default=dict)
+    status = Column(String, nullable=False, default="queued")  # queued / running / failed (done tasks are deleted)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Workers claim the earliest due tasks of a status
+        Index("ix_tasks_status_run_at", "status", "run_at"),
+        # Per-key serialization and coalescing (see api/task_queue.py)
+        Index("ix_tasks_kind_key", "kind", "key"),
+    )
@@ -0,0 +1,78 @@
+import pytest
+from api import ai_chat, ai_utils
+from api.ai_chat import TeammateIdentity
+
+MIKE = TeammateIdentity(2, "Mike", "mike.svg")
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    events, posted = [], []
+
+    async def emit(event, data, channel):
+        events.append((event, data))
+
+    async def post(channel, user, content, stream_id=None):
+        posted.append((content, stream_id))
+        events.append(("new_message", {"content": content, "stream_id": stream_id}))
+
+    monkeypatch.setattr(ai_chat, "emit_to_channel", emit)
+    monkeypatch.setattr(ai_chat, "post_bot_message", post)
+    return events, posted
+
+
+@pytest.mark.asyncio
+async def test_reply_streams_deltas_then_posts(emitted):
+    events, posted = emitted
+
+    async def produce(on_delta):
+        for token in ("Have you ", "tried ", "rebasing?"):
+            await on_delta(token)
+        return "Have you tried rebasing?"
+
+    await ai_chat.stream_bot_message("dev", MIKE, produce)
+
+    deltas = [data for event, data in events if event == "message_delta"]
+    assert "".join(d["delta"] for d in deltas) == "Have you tried rebasing?"
+    assert {d["stream_id"] for d in deltas} == {posted[0][1]}
+    assert deltas[0]["sender_name"] == "Mike" and deltas[0]["channel"] == "dev"
+    # The persisted message closes the stream
+    assert events[-1] == ("new_message", {"content": "Have you tried rebasing?", "stream_id": posted[0][1]})
+
+
+@pytest.mark.asyncio
+async def test_failed_generation_aborts_the_draft(emitted):
+    events, posted = emitted
+
+    async def produce(on_delta):
+        await on_delta("Let me")
+        raise RuntimeError("stream reset")
+
+    with pytest.raises(RuntimeError):
+        await ai_chat.stream_bot_message("dev", MIKE, produce)
+    assert posted == []
+    assert events[-1][0] == "message_delta" and events[-1][1]["aborted"] is True
+
+
+@pytest.mark.asyncio
+async def test_pr_review_draft_streams_findings(monkeypatch):
+    async def fetch(url):
+        return "diff --git a/app.py b/app.py"
+
+    async def review(diff, title, on_item=None):
+        comment = {"file": "app.py", "line": 3, "category": "Security", "message": "SQL injection"}
+        await on_item("summary", None, "Risky but fixable.")
+        await on_item("comments", 0, comment)
+        return {"summary": "Risky but fixable.", "comments": [comment]}
+
+    monkeypatch.setattr(ai_utils, "fetch_pr_diff", fetch)
+    monkeypatch.setattr(ai_utils, "review_diff", review)
+    deltas = []
+
+    async def on_delta(text):
+        deltas.append(text)
+
+    message = await ai_utils.process_pr_link("https://github.com/o/r/pull/1", on_delta=on_delta)
+    assert len(deltas) == 3
+    assert "Risky but fixable." in deltas[1] and "🔒 **app.py** (Line 3): SQL injection" in deltas[2]
+    assert message.startswith(deltas[0]) and deltas[2].split("\n", 1)[1] in message
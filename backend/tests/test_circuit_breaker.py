@@ -0,0 +1,160 @@
+import time
+import asyncio
+import pytest
+from types import SimpleNamespace
+from api import ai_utils, providers
+from api.circuit_breaker import CircuitBreaker, CircuitOpenError, breakers, CLOSED, OPEN, HALF_OPEN, LLM_CALL_TIMEOUT
+from api.fakes import FakeGemini, FakeGenAIClient, FakeProviderError, LatencyModel
+
+
+class ClientError(Exception):
+    code = 400
+
+
+async def fail():
+    raise FakeProviderError("down")
+
+
+async def ok():
+    return "ok"
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    breakers.breakers.clear()
+    yield
+    breakers.breakers.clear()
+
+
+@pytest.mark.asyncio
+async def test_opens_after_threshold_and_rejects_immediately():
+    breaker = CircuitBreaker("t", failure_threshold=3, reset_seconds=60)
+    for _ in range(3):
+        with pytest.raises(FakeProviderError):
+            await breaker.call(fail)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(ok)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    stats = breaker.stats()
+    assert stats["rejected"] == 2 and stats["times_opened"] == 1 and stats["retry_in"] > 0
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker("t", failure_threshold=1, reset_seconds=60)
+    with pytest.raises(FakeProviderError):
+        await breaker.call(fail)
+
+    breaker.opened_at = time.monotonic() - 61
+    with pytest.raises(FakeProviderError):
+        await breaker.call(fail)
+    assert breaker.state == OPEN and breaker.times_opened == 2
+
+    breaker.opened_at = time.monotonic() - 61
+    assert await breaker.call(ok) == "ok"
+    assert breaker.state == CLOSED and breaker.consecutive_failures == 0
+
+
+@pytest.mark.asyncio
+async def test_half_open_lets_only_one_probe_through():
+    breaker = CircuitBreaker("t", failure_threshold=1, reset_seconds=0)
+    with pytest.raises(FakeProviderError):
+        await breaker.call(fail)
+
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return "ok"
+
+    probe = asyncio.create_task(breaker.call(slow))
+    await asyncio.sleep(0)
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(ok)
+    release.set()
+    assert await probe == "ok"
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_trip_but_timeouts_do():
+    breaker = CircuitBreaker("t", failure_threshold=2, reset_seconds=60)
+
+    async def bad_request():
+        raise ClientError("invalid argument")
+
+    for _ in range(5):
+        with pytest.raises(ClientError):
+            await breaker.call(bad_request)
+    assert breaker.state == CLOSED
+
+    for _ in range(2):
+        with pytest.raises(asyncio.TimeoutError):
+            await breaker.call(lambda: asyncio.sleep(1), timeout=0.01)
+    assert breaker.state == OPEN
+
+
+@pytest.mark.asyncio
+async def test_generate_text_fails_fast_when_backend_is_down(monkeypatch):
+    gemini = FakeGemini(latency=LatencyModel(0, error_rate=1.0), tokens_per_sec=0)
+    monkeypatch.setattr(providers, "AI_PROVIDER", "fake")
+    monkeypatch.setattr(ai_utils, "client", FakeGenAIClient(gemini))
+
+    for i in range(5):
+        with pytest.raises(FakeProviderError):
+            await ai_utils.generate_text(f"prompt {i}")
+    with pytest.raises(CircuitOpenError):
+        await ai_utils.generate_text("one more")
+
+    stats = breakers.stats()[f"{ai_utils.AI_PROVIDER}:{ai_utils.MODEL}"]
+    assert stats["state"] == OPEN and stats["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_media_calls_have_their_own_breaker_and_timeout(monkeypatch):
+    gemini = FakeGemini(latency=LatencyModel(0, error_rate=1.0), tokens_per_sec=0)
+    monkeypatch.setattr(providers, "AI_PROVIDER", "fake")
+    monkeypatch.setattr(ai_utils, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(ai_utils, "client", FakeGenAIClient(gemini))
+    monkeypatch.setattr(ai_utils, "upload_media_file", lambda path, mime: asyncio.sleep(0, result=SimpleNamespace(name="files/1")))
+    monkeypatch.setattr(ai_utils.file_poller, "wait_active", lambda name: asyncio.sleep(0, result=name))
+    timeouts = []
+    real_call = CircuitBreaker.call
+
+    def call(self, fn, timeout=None):
+        timeouts.append((self.name, timeout))
+        return real_call(self, fn, timeout)
+
+    monkeypatch.setattr(CircuitBreaker, "call", call)
+
+    for _ in range(5):
+        assert await ai_utils.transcribe_audio("standup.webm") == "Error transcribing audio."
+
+    media = f"{ai_utils.AI_PROVIDER}:{ai_utils.MODEL}:media"
+    assert breakers.stats()[media]["state"] == OPEN
+    assert timeouts[0] == (media, ai_utils.LLM_MEDIA_CALL_TIMEOUT)
+    assert ai_utils.LLM_MEDIA_CALL_TIMEOUT > LLM_CALL_TIMEOUT
+    # Chat still gets through to its own breaker
+    assert breakers.get(ai_utils.AI_PROVIDER, ai_utils.MODEL).state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_stream_timeout_covers_the_whole_stream(monkeypatch):
+    # ~8 tokens per chunk at 40 tokens/s: the first chunk arrives quickly, the rest don't
+    gemini = FakeGemini(latency=LatencyModel(0), tokens_per_sec=40)
+    monkeypatch.setattr(providers, "AI_PROVIDER", "fake")
+    monkeypatch.setattr(ai_utils, "client", FakeGenAIClient(gemini))
+    monkeypatch.setattr(ai_utils, "LLM_STREAM_TIMEOUT", 0.3)
+    deltas = []
+
+    async def on_delta(text):
+        deltas.append(text)
+
+    with pytest.raises(TimeoutError):
+        await ai_utils.stream_text("write a long essay", on_delta)
+    assert deltas
+    assert breakers.get(ai_utils.AI_PROVIDER, ai_utils.MODEL).stats()["failures"] == 1
@@ -0,0 +1,99 @@
+import pytest
+from api.diff_utils import parse_diff, split_diff, merge_reviews
+
+
+def make_file_diff(path: str, hunks: int, lines_per_hunk: int = 20) -> str:
+    diff = f"diff --git a/{path} b/{path}\nindex 111..222 100644\n--- a/{path}\n+++ b/{path}\n"
+    for h in range(hunks):
+        diff += f"@@ -{h * 100 + 1},{lines_per_hunk} +{h * 100 + 1},{lines_per_hunk} @@\n"
+        for i in range(lines_per_hunk):
+            diff += f"+line {i} of hunk {h} in {path}\n"
+    return diff
+
+
+def test_parse_diff_files_and_hunks():
+    diff = make_file_diff("src/app.py", 2) + make_file_diff("README.md", 1)
+    files = parse_diff(diff)
+    assert [f["path"] for f in files] == ["src/app.py", "README.md"]
+    assert len(files[0]["hunks"]) == 2
+    assert files[0]["header"].startswith("diff --git a/src/app.py")
+    assert "".join(f["header"] + "".join(f["hunks"]) for f in files) == diff
+
+
+def test_parse_diff_deleted_file_uses_old_path():
+    diff = "diff --git a/old.js b/old.js\ndeleted file mode 100644\n--- a/old.js\n+++ /dev/null\n@@ -1 +0,0 @@\n-gone\n"
+    assert parse_diff(diff)[0]["path"] == "old.js"
+
+
+def test_small_diff_is_single_shard():
+    diff = make_file_diff("a.py", 1)
+    assert split_diff(diff, max_chars=100000) == [diff]
+
+
+def test_large_diff_is_split_without_losing_content():
+    diff = "".join(make_file_diff(f"file_{i}.py", 3) for i in range(10))
+    shards = split_diff(diff, max_chars=3000)
+    assert len(shards) > 1
+    assert all(len(s) <= 3000 for s in shards)
+    # Every hunk line survives the split
+    for i in range(10):
+        for h in range(3):
+            assert any(f"+line 19 of hunk {h} in file_{i}.py" in s for s in shards)
+
+
+def test_oversized_file_repeats_header_per_shard():
+    diff = make_file_diff("big.py", 6, lines_per_hunk=40)
+    shards = split_diff(diff, max_chars=2000)
+    assert len(shards) > 1
+    for shard in shards:
+        assert shard.startswith("diff --git a/big.py b/big.py")
+
+
+def test_split_respects_max_shards_and_reports_skipped_files():
+    diff = "".join(make_file_diff(f"file_{i}.py", 1) for i in range(30))
+    skipped = []
+    shards = split_diff(diff, max_chars=1000, max_shards=5, skipped=skipped)
+    assert len(shards) == 5
+    assert skipped and skipped[-1] == "file_29.py"
+    # Every file is either reviewed or listed as skipped
+    for i in range(30):
+        assert (f"+++ b/file_{i}.py" in "".join(shards)) != (f"file_{i}.py" in skipped)
+
+
+def test_merge_reviews_dedups_and_orders_comments():
+    reviews = [
+        {"summary": "Part one looks fine.", "comments": [
+            {"file": "a.py", "line": 3, "category": "Opinion", "message": "Rename this"},
+            {"file": "a.py", "line": 9, "category": "Security", "message": "SQL injection"},
+        ]},
+        {"summary": "Part two has issues.", "comments": [
+            {"file": "a.py", "line": 3, "category": "Opinion", "message": "rename  this"},
+            {"file": "b.py", "line": 1, "category": "Performance", "message": "N+1 query"},
+        ]},
+    ]
+    merged = merge_reviews(reviews)
+    assert "Part one" in merged["summary"] and "Part two" in merged["summary"]
+    assert [c["category"] for c in merged["comments"]] == ["Security", "Performance", "Opinion"]
+
+
+def test_merge_reviews_drops_failed_shard_summaries():
+    reviews = [
+        {"summary": "Yikes! I hit a snag while reading your code. (Error: timeout)", "comments": [], "error": "timeout"},
+        {"summary": "Solid work.", "comments": []},
+    ]
+    merged = merge_reviews(reviews)
+    assert merged["summary"].startswith("Solid work.")
+    assert "1 of 2 parts" in merged["summary"]
+    assert merged["incomplete"] and "error" not in merged
+
+    # A summary that merely starts like an error message is not a failure
+    merged = merge_reviews([{"summary": "Yikes, this is clean.", "comments": []}, reviews[1]])
+    assert "Yikes, this is clean." in merged["summary"] and "incomplete" not in merged
+
+    assert merge_reviews([reviews[0], reviews[0]])["error"] == "timeout"
+
+
+def test_merge_reviews_lists_skipped_files():
+    merged = merge_reviews([{"summary": "Fine.", "comments": []}], skipped=["vendor/a.js", "vendor/b.js"])
+    assert "skipped 2 file(s): vendor/a.js, vendor/b.js" in merged["summary"]
+    assert merged["skipped_files"] == ["vendor/a.js", "vendor/b.js"]
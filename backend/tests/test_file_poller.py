@@ -0,0 +1,80 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from api.file_poller import FilePoller, FileProcessingFailed
+
+
+def file(name: str, state: str):
+    return SimpleNamespace(name=name, state=SimpleNamespace(name=state))
+
+
+class FakeFiles:
+    def __init__(self):
+        self.states = {}
+        self.batches = []
+
+    async def fetch(self, names):
+        self.batches.append(list(names))
+        return {name: file(name, self.states[name]) for name in names if name in self.states}
+
+
+@pytest.mark.asyncio
+async def test_pending_files_share_batched_checks():
+    files = FakeFiles()
+    files.states = {"files/a": "PROCESSING", "files/b": "PROCESSING"}
+    poller = FilePoller(files.fetch, initial=0.01, maximum=0.05)
+
+    waiters = [asyncio.create_task(poller.wait_active(name, timeout=2)) for name in ("files/a", "files/b")]
+    await asyncio.sleep(0.05)
+    files.states["files/a"] = "ACTIVE"
+    files.states["files/b"] = "ACTIVE"
+    results = await asyncio.gather(*waiters)
+
+    assert [f.name for f in results] == ["files/a", "files/b"]
+    # every check covered both files in one fetch
+    assert all(sorted(batch) == ["files/a", "files/b"] for batch in files.batches)
+    assert poller.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_interval_backs_off_until_progress():
+    files = FakeFiles()
+    files.states = {"files/a": "PROCESSING"}
+    poller = FilePoller(files.fetch, initial=0.01, maximum=0.04)
+
+    waiter = asyncio.create_task(poller.wait_active("files/a", timeout=2))
+    await asyncio.sleep(0.1)
+    assert poller.interval == 0.04
+    files.states["files/a"] = "ACTIVE"
+    await waiter
+    assert poller.interval == 0.01
+
+
+@pytest.mark.asyncio
+async def test_failed_file_and_timeout():
+    files = FakeFiles()
+    files.states = {"files/bad": "FAILED", "files/slow": "PROCESSING"}
+    poller = FilePoller(files.fetch, initial=0.01, maximum=0.02)
+
+    with pytest.raises(FileProcessingFailed):
+        await poller.wait_active("files/bad", timeout=1)
+    with pytest.raises(TimeoutError):
+        await poller.wait_active("files/slow", timeout=0.05)
+    assert poller.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_steady_arrivals_do_not_starve_checks():
+    files = FakeFiles()
+    poller = FilePoller(files.fetch, initial=0.05, maximum=0.2)
+
+    waiters = []
+    for i in range(10):
+        # Uploads arrive faster than the poll interval
+        files.states[f"files/{i}"] = "ACTIVE"
+        waiters.append(asyncio.create_task(poller.wait_active(f"files/{i}", timeout=1)))
+        await asyncio.sleep(0.02)
+    results = await asyncio.gather(*waiters)
+
+    assert len(results) == 10
+    assert files.batches and len(files.batches[0]) < 10  # checked while files kept arriving
@@ -0,0 +1,70 @@
+import pytest
+import httpx
+from api.github_utils import RepoBootstrapper, GITHUB_API_URL
+from api.fake_github import FakeGitHub
+
+REPO = "sim-owner/todo-app"
+
+
+FILES = {f"src/file_{i}.js": f"console.log({i});" for i in range(25)}
+
+
+async def bootstrap(fake: FakeGitHub, files=FILES) -> str:
+    async with httpx.AsyncClient(transport=httpx.MockTransport(fake.handler)) as client:
+        bootstrapper = RepoBootstrapper(client, "token", REPO, "main")
+        for path, content in files.items():
+            bootstrapper.add_file(path, content)
+        return await bootstrapper.commit("Initial project scaffold")
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_creates_single_commit_on_top_of_auto_init():
+    fake = FakeGitHub(auto_init=True)
+    repo = fake.repo(REPO)
+    initial = repo.refs["heads/main"]
+
+    assert await bootstrap(fake) == "git_data"
+
+    head = repo.commits[repo.refs["heads/main"]]
+    assert head["parents"] == [initial]
+    assert head["message"] == "Initial project scaffold"
+    files = repo.head_files()
+    assert files["README.md"] == "# todo-app"
+    assert all(files[path] == content for path, content in FILES.items())
+    # one blob per file + exactly one tree, commit and ref update
+    methods = [call for call in fake.calls if call[1] != "/git/blobs"]
+    assert len([c for c in fake.calls if c[1] == "/git/blobs"]) == len(FILES)
+    assert [m for m, _ in methods].count("POST") == 2
+    assert repo.contents_puts == []
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_empty_repository_creates_ref():
+    fake = FakeGitHub(auto_init=False)
+    assert await bootstrap(fake, {"README.md": "hi"}) == "git_data"
+    repo = fake.repo(REPO)
+    assert repo.commits[repo.refs["heads/main"]]["parents"] == []
+    assert repo.head_files() == {"README.md": "hi"}
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_falls_back_to_contents_api_on_error():
+    fake = FakeGitHub(fail_on=("POST", "/git/trees"))
+    assert await bootstrap(fake) == "contents_api"
+    assert sorted(fake.repo(REPO).contents_puts) == sorted(FILES)
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_uses_configured_api_url():
+    fake = FakeGitHub()
+    seen_hosts = set()
+
+    def handler(request):
+        seen_hosts.add(f"{request.url.scheme}://{request.url.host}")
+        return fake.handler(request)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        bootstrapper = RepoBootstrapper(client, "token", REPO)
+        bootstrapper.add_file("a.txt", "a")
+        await bootstrapper.commit("init")
+    assert seen_hosts == {GITHUB_API_URL}
@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from api.jobs import JobManager
+
+
+@pytest.fixture
+def emitted():
+    events = []
+
+    async def emit(event, data, room=None, **kwargs):
+        events.append((event, data["stage"], room))
+
+    with patch("api.jobs.sio.emit", side_effect=emit):
+        yield events
+
+
+async def wait_finished(job):
+    await asyncio.wait_for(job.task, timeout=2)
+
+
+@pytest.mark.asyncio
+async def test_job_runs_and_reports_to_user_room(emitted):
+    manager = JobManager("test")
+
+    async def run(job):
+        await job.report("working", step=1)
+        return {"ok": True}
+
+    job = manager.submit(7, run)
+    assert job.to_dict()["status"] in ("queued", "running")
+    await wait_finished(job)
+
+    assert job.status == "succeeded"
+    assert job.result == {"ok": True}
+    assert [stage for _, stage, _ in emitted] == ["started", "working", "done"]
+    assert all(room == "user_7" for _, _, room in emitted)
+
+
+@pytest.mark.asyncio
+async def test_failed_job_records_error(emitted):
+    manager = JobManager("test")
+
+    async def run(job):
+        raise RuntimeError("GitHub is down")
+
+    job = manager.submit(1, run)
+    await wait_finished(job)
+    assert job.status == "failed"
+    assert job.error == "GitHub is down"
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_returns_same_job(emitted):
+    manager = JobManager("test")
+    runs = 0
+
+    async def run(job):
+        nonlocal runs
+        runs += 1
+        return {}
+
+    first = manager.submit(1, run, idempotency_key="click-1")
+    await wait_finished(first)
+    again = manager.submit(1, run, idempotency_key="click-1")
+    other_user = manager.submit(2, run, idempotency_key="click-1")
+    await wait_finished(other_user)
+
+    assert again is first
+    assert other_user is not first
+    assert runs == 2
+
+
+@pytest.mark.asyncio
+async def test_active_job_is_reused_without_key(emitted):
+    manager = JobManager("test")
+    release = asyncio.Event()
+
+    async def run(job):
+        await release.wait()
+        return {}
+
+    first = manager.submit(1, run)
+    assert manager.submit(1, run) is first
+    release.set()
+    await wait_finished(first)
+    assert manager.submit(1, run) is not first
+
+
+@pytest.mark.asyncio
+async def test_only_identical_requests_share_an_active_job(emitted):
+    manager = JobManager("test")
+    release = asyncio.Event()
+
+    async def run(job):
+        await release.wait()
+        return {}
+
+    todo = manager.submit(1, run, request_key='{"project_description": "todo app"}')
+    assert manager.submit(1, run, request_key='{"project_description": "todo app"}') is todo
+    chat = manager.submit(1, run, request_key='{"project_description": "chat app"}')
+    assert chat is not todo
+    release.set()
+    await asyncio.gather(todo.task, chat.task)
+
+
+@pytest.mark.asyncio
+async def test_pool_is_bounded(emitted):
+    manager = JobManager("test", concurrency=2)
+    running = 0
+    peak = 0
+
+    async def run(job):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {}
+
+    jobs = [manager.submit(user_id, run) for user_id in range(6)]
+    await asyncio.gather(*(job.task for job in jobs))
+    assert peak == 2
+    assert all(job.status == "succeeded" for job in jobs)
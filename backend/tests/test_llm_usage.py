@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from api import ai_utils, providers
+from api.circuit_breaker import breakers
+from api.fakes import FakeGemini, FakeGenAIClient, LatencyModel
+from api.llm_usage import UsageTracker, llm_user, estimate_cost
+from api.singleflight import SingleFlight
+from api.structured_output import PROJECT_SCHEMA
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    gemini = FakeGemini(latency=LatencyModel(20), tokens_per_sec=0)
+    tracker = UsageTracker()
+    monkeypatch.setattr(providers, "AI_PROVIDER", "fake")
+    monkeypatch.setattr(ai_utils, "client", FakeGenAIClient(gemini))
+    monkeypatch.setattr(ai_utils, "usage_tracker", tracker)
+    monkeypatch.setattr(ai_utils, "llm_flight", SingleFlight())
+    breakers.breakers.clear()
+    return tracker
+
+
+def test_rollups_and_cost():
+    tracker = UsageTracker()
+    tracker.record("analyze_diff", "m", 1000, 200, 0.5, user_id=1)
+    tracker.record("analyze_diff", "m", 0, 0, 0.01, cache="hit", user_id=1)
+    tracker.record("generate_coworker_update", "m", 50, 20, 0.2)
+
+    stats = tracker.stats()
+    assert list(stats["by_caller"]) == ["analyze_diff", "generate_coworker_update"]
+    diff = stats["by_caller"]["analyze_diff"]
+    assert diff["upstream_calls"] == 1 and diff["cache_hits"] == 1 and diff["cache_hit_rate"] == 0.5
+    assert diff["avg_prompt_tokens"] == 1000
+    assert stats["totals"]["prompt_tokens"] == 1050
+    assert stats["totals"]["cost_usd"] == pytest.approx(estimate_cost(1050, 220), abs=1e-6)
+
+    assert tracker.user_rollup(1)["calls"] == 2
+    assert tracker.user_rollup(2)["calls"] == 0
+    assert set(tracker.user_rollup()) == {"1"}
+
+
+@pytest.mark.asyncio
+async def test_generate_text_records_caller_tokens_and_single_flight_hits(tracker):
+    async def generate_coworker_update():
+        return await ai_utils.generate_text("same prompt")
+
+    async def for_user(user_id):
+        llm_user.set(user_id)
+        return await generate_coworker_update()
+
+    await asyncio.gather(for_user(1), for_user(2), for_user(3))
+
+    caller = tracker.stats()["by_caller"]["generate_coworker_update"]
+    assert caller["calls"] == 3 and caller["upstream_calls"] == 1 and caller["cache_hits"] == 2
+    assert caller["prompt_tokens"] > 0 and caller["output_tokens"] > 0
+    assert sorted(entry["user_id"] for entry in tracker.recent) == [1, 2, 3]
+    assert sum(tracker.user_rollup(uid)["prompt_tokens"] for uid in (1, 2, 3)) == caller["prompt_tokens"]
+
+
+@pytest.mark.asyncio
+async def test_streamed_json_records_final_usage(tracker):
+    async def on_item(field, index, value):
+        pass
+
+    await ai_utils.generate_json("build a todo app", schema=PROJECT_SCHEMA, on_item=on_item, caller="generate_project_with_bugs")
+
+    entry = tracker.recent[-1]
+    assert entry["caller"] == "generate_project_with_bugs" and entry["cache"] == "miss"
+    response = await ai_utils.client.aio.models.generate_content(model=ai_utils.MODEL, contents="build a todo app", config={"response_mime_type": "application/json", "response_schema": PROJECT_SCHEMA})
+    assert entry["output_tokens"] == response.usage_metadata.candidates_token_count
+
+
+@pytest.mark.asyncio
+async def test_identical_streams_share_one_upstream_call(tracker):
+    async def reader(user_id):
+        llm_user.set(user_id)
+        deltas = []
+
+        async def on_delta(text):
+            deltas.append(text)
+
+        text = await ai_utils.stream_text("review this PR", on_delta, caller="analyze_diff")
+        return text, deltas
+
+    (first, first_deltas), (second, second_deltas) = await asyncio.gather(reader(1), reader(2))
+
+    assert first == second and "".join(first_deltas) == "".join(second_deltas) == first
+    caller = tracker.stats()["by_caller"]["analyze_diff"]
+    assert caller["upstream_calls"] == 1 and caller["cache_hits"] == 1
+    assert ai_utils.client.aio.models.gemini.latency.calls == 1
@@ -0,0 +1,64 @@
+import os
+import sys
+import pytest
+from api import media_transcode
+from api.media_transcode import PROFILES, audio_command, video_command, preprocess_audio, discard_preprocessed
+
+# Stand-in for ffmpeg: writes a quarter of the input to the output path
+FAKE_FFMPEG = f"""#!{sys.executable}
+import sys
+args = sys.argv[1:]
+src = args[args.index("-i") + 1]
+data = open(src, "rb").read()
+open(args[-1], "wb").write(data[:len(data) // 4])
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    path = tmp_path / "ffmpeg"
+    path.write_text(FAKE_FFMPEG)
+    path.chmod(0o755)
+    monkeypatch.setattr(media_transcode, "FFMPEG_BIN", str(path))
+    monkeypatch.setattr(media_transcode, "transcode_stats", media_transcode.TranscodeStats())
+    return path
+
+
+def test_commands_follow_profile():
+    audio = audio_command("in.webm", "out.ogg", PROFILES["low"])
+    assert audio[audio.index("-ac") + 1] == "1"
+    assert audio[audio.index("-ar") + 1] == "16000"
+    assert audio[audio.index("-c:a") + 1] == "libopus"
+    assert audio[audio.index("-b:a") + 1] == "16k"
+
+    video = video_command("in.mov", "out.mp4", PROFILES["high"])
+    assert "min(720,ih)" in video[video.index("-vf") + 1]
+    assert "fps=5" in video[video.index("-vf") + 1]
+
+
+@pytest.mark.asyncio
+async def test_preprocess_shrinks_and_records_savings(tmp_path, fake_ffmpeg):
+    src = tmp_path / "standup.webm"
+    src.write_bytes(b"a" * 4000)
+
+    out = await preprocess_audio(str(src))
+    assert out != str(src) and out.endswith(".ogg")
+    assert os.path.getsize(out) == 1000
+
+    stats = media_transcode.transcode_stats.to_dict()
+    assert stats["bytes_saved"] == 3000
+    assert stats["ratio"] == 0.25
+
+    await discard_preprocessed(str(src), out)
+    assert not os.path.exists(out)
+    assert src.exists()
+
+
+@pytest.mark.asyncio
+async def test_preprocess_passthrough_when_off_or_missing(tmp_path, monkeypatch):
+    src = tmp_path / "standup.webm"
+    src.write_bytes(b"a" * 100)
+    assert await preprocess_audio(str(src), profile="off") == str(src)
+
+    monkeypatch.setattr(media_transcode, "FFMPEG_BIN", str(tmp_path / "missing-ffmpeg"))
+    assert await preprocess_audio(str(src)) == str(src)
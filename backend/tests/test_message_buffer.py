@@ -0,0 +1,62 @@
+import json
+from datetime import datetime, timedelta, timezone
+from api.message_buffer import MessageBuffer
+from api.socket_manager import notify_emit
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def message(msg_id: int, seconds: int = None, channel: str = "dev") -> dict:
+    return {
+        "id": msg_id,
+        "channel": channel,
+        "content": f"message {msg_id}",
+        "sender_id": 1,
+        "is_bot": False,
+        "timestamp": (T0 + timedelta(seconds=msg_id if seconds is None else seconds)).isoformat(),
+        "sender_name": "alice",
+        "sender_avatar": None
+    }
+
+
+def ids(page: bytes) -> list:
+    return [m["id"] for m in json.loads(page)]
+
+
+def test_cold_channel_misses_until_filled():
+    buffer = MessageBuffer(size=5)
+    buffer.append(message(10))
+    assert buffer.page("dev", 2) is None
+
+    buffer.fill("dev", [message(8), message(9)], complete=True)
+    assert ids(buffer.page("dev", 2)) == [9, 10]
+    assert ids(buffer.page("dev", 50)) == [8, 9, 10]  # whole history fits
+
+
+def test_ring_keeps_newest_and_orders_late_arrivals():
+    buffer = MessageBuffer(size=3)
+    buffer.fill("dev", [], complete=True)
+    for msg_id in (1, 2, 4, 5):
+        buffer.append(message(msg_id))
+    buffer.append(message(3))  # e.g. relayed late from another worker
+    buffer.append(message(5))  # duplicate
+
+    assert ids(buffer.page("dev", 3)) == [3, 4, 5]
+    # Only 3 of 5 messages are held, so deeper pages must go to the database
+    assert buffer.page("dev", 4) is None
+    assert ids(buffer.page("dev", 2, before=5)) == [3, 4]
+    assert buffer.page("dev", 3, before=5) is None
+
+
+def test_new_message_emits_feed_the_buffer(monkeypatch):
+    import api.message_buffer as module
+    buffer = MessageBuffer(size=10)
+    monkeypatch.setattr(module, "message_buffer", buffer)
+    buffer.fill("general", [], complete=True)
+
+    notify_emit("new_message", message(1, channel="general"), "channel_general")
+    notify_emit("new_message", {**message(2, channel="general"), "ephemeral": True}, "channel_general")
+
+    page = json.loads(buffer.page("general", 10))
+    assert [m["id"] for m in page] == [1]
+    assert page[0]["sender_name"] == "alice"
@@ -0,0 +1,39 @@
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+from api.messages import history_query, serialize_messages
+
+
+def compiled(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_newest_page_reads_backwards_with_limit():
+    sql = compiled(history_query("dev", 50))
+    assert "messages.channel = 'dev'" in sql
+    assert "ORDER BY messages.timestamp DESC, messages.id DESC" in sql
+    assert "LIMIT 50" in sql
+
+
+def test_cursors_compare_timestamp_then_id():
+    ts = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    before = compiled(history_query("dev", 20, before=(ts, 7)))
+    assert "messages.timestamp < '2026-01-01 00:00:00+00:00'" in before
+    assert "messages.id < 7" in before
+
+    after = compiled(history_query("dev", 20, after=(ts, 7)))
+    assert "messages.id > 7" in after
+    assert "ORDER BY messages.timestamp ASC, messages.id ASC" in after
+
+
+def test_serialize_messages_fills_sender_fallbacks():
+    ts = datetime(2026, 1, 1, 12, 30, tzinfo=timezone.utc)
+    rows = [
+        SimpleNamespace(id=1, channel="general", content="hi", sender_id=3, is_bot=False, timestamp=ts, username="alice", avatar_url="a.png"),
+        SimpleNamespace(id=2, channel="general", content="welcome", sender_id=None, is_bot=True, timestamp=ts, username=None, avatar_url=None),
+    ]
+    payload = json.loads(serialize_messages(rows))
+    assert [m["sender_name"] for m in payload] == ["alice", "Bot"]
+    assert payload[0]["timestamp"] == "2026-01-01T12:30:00Z"
+    assert payload[1]["sender_avatar"] is None
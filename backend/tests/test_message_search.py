@@ -0,0 +1,106 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+from api.messages import search_query
+from api.search_index import InvertedIndex, tokenize
+from api.socket_manager import notify_emit
+
+
+def test_search_uses_the_gin_index_expression():
+    sql = str(search_query("deploy -staging", 21, 20, "dev").compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    # Must be the indexed expression verbatim, config included, for the planner to use it
+    assert "to_tsvector('english'::regconfig, messages.content) @@ websearch_to_tsquery('english'::regconfig, 'deploy -staging')" in sql
+    assert "ORDER BY rank DESC, messages.id DESC" in sql
+    assert "LIMIT 21 OFFSET 20" in sql
+
+
+def test_tokenize_drops_stopwords_and_folds_suffixes():
+    assert tokenize("The builds are FAILING on Mike's branch") == ["build", "fail", "mike", "branch"]
+
+
+def index_of(*messages) -> InvertedIndex:
+    index = InvertedIndex()
+    for msg_id, channel, content in messages:
+        index.add(msg_id, channel, content)
+    return index
+
+
+def test_all_terms_must_match_and_ranking_favours_focused_messages():
+    index = index_of(
+        (1, "dev", "deploy failed again"),
+        (2, "dev", "the deploy to staging failed, deploy logs attached"),
+        (3, "general", "lunch plans"),
+        (4, "dev", "failed to parse config during a very long and rambling deploy of the staging cluster"),
+    )
+    # Short, on-topic messages rank above a long one that mentions the terms in passing
+    assert [msg_id for msg_id, _ in index.search("deploy failed", 10)] == [1, 2, 4]
+    assert index.search("deploy lunch", 10) == []
+    assert index.search("the", 10) == []
+
+
+def test_channel_filter_and_pages():
+    index = index_of(*[(i, "dev" if i % 2 else "random", f"standup notes {i}") for i in range(1, 11)])
+    dev = [msg_id for msg_id, _ in index.search("standup", 10, channel="dev")]
+    assert dev == [9, 7, 5, 3, 1]  # equal scores: newest first
+    page = [msg_id for msg_id, _ in index.search("standup", 2, offset=2, channel="dev")]
+    assert page == [5, 3]
+    assert index.search("standup", 10, channel="nope") == []
+
+
+def test_new_messages_are_indexed_once_loaded(monkeypatch):
+    import api.search_index as module
+    index = InvertedIndex()
+    monkeypatch.setattr(module, "message_index", index)
+
+    notify_emit("new_message", {"id": 1, "channel": "dev", "content": "rollback done"}, "channel_dev")
+    assert len(index) == 0  # Postgres deployments never load it
+
+    index.loaded = True
+    notify_emit("new_message", {"id": 2, "channel": "dev", "content": "rollback done"}, "channel_dev")
+    notify_emit("new_message", {"id": 3, "channel": "dev", "content": "rollback ack", "ephemeral": True}, "channel_dev")
+    notify_emit("new_message", {"id": 2, "channel": "dev", "content": "rollback done"}, "channel_dev")
+    assert [msg_id for msg_id, _ in index.search("rollback", 10)] == [2]
+
+
+@pytest.mark.asyncio
+async def test_search_endpoint_on_sqlite(tmp_path, monkeypatch):
+    """End to end on SQLite: the schema creates and /messages/search uses the in-process index."""
+    from httpx import AsyncClient, ASGITransport
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    from database import Base, get_db
+    from models import Message
+    from main import app
+    import api.messages as messages_module
+    import api.search_index as index_module
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'search.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with Session() as db:
+        db.add_all([
+            Message(channel="dev", content="deploy failed again"),
+            Message(channel="dev", content="lunch anyone?"),
+            Message(channel="random", content="the deploy went fine"),
+        ])
+        await db.commit()
+
+    async def sqlite_db():
+        async with Session() as db:
+            yield db
+
+    index = InvertedIndex()
+    monkeypatch.setattr(messages_module, "message_index", index)
+    monkeypatch.setattr(index_module, "message_index", index)
+    app.dependency_overrides[get_db] = sqlite_db
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            everywhere = (await client.get("/api/messages/search", params={"q": "deploy"})).json()
+            dev = (await client.get("/api/messages/search", params={"q": "deploy", "channel": "dev"})).json()
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        await engine.dispose()
+
+    assert sorted(hit["content"] for hit in everywhere["results"]) == ["deploy failed again", "the deploy went fine"]
+    assert [hit["content"] for hit in dev["results"]] == ["deploy failed again"]
+    assert dev["next_offset"] is None and index.loaded
@@ -48,3 +48,29 @@ async def test_onboarding_checklist_persistence():
                 await session.execute(delete(Activity).where(Activity.user_id == user_id))
                 await session.execute(delete(User).where(User.id == user_id))
                 await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_stream_failing_midway_fails_the_job_instead_of_mixing_in_the_fallback(monkeypatch):
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock
+    from api import ai_utils, onboarding, providers
+    from api.rag_utils import rag_engine
+
+    async def generate(description, backend_stack, frontend_stack, on_item=None):
+        await on_item("repo_name", None, "todo-simulation")
+        await on_item("files", 0, {"path": "src/App.jsx", "content": "export default App"})
+        # ...then the stream breaks and the fallback project comes back
+        return {"repo_name": "simple-web-app-simulation", "is_fallback": True, "files": {"index.html": "TODO"}, "tickets": []}
+
+    monkeypatch.setattr(ai_utils, "generate_project_with_bugs", generate)
+    monkeypatch.setattr(providers, "github_token", lambda: None)
+    monkeypatch.setattr(rag_engine, "index_file", AsyncMock())
+    job = SimpleNamespace(report=AsyncMock())
+    db = AsyncMock()
+
+    with pytest.raises(RuntimeError, match="partway"):
+        await onboarding._generate_repository(job, SimpleNamespace(id=1), onboarding.RepoRequest(), db)
+    pushed = [call.kwargs.get("path") for call in job.report.await_args_list if call.args[0] == "file_pushed"]
+    assert "index.html" not in pushed
+    db.commit.assert_not_awaited()
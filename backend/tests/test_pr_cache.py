@@ -0,0 +1,82 @@
+import pytest
+import httpx
+from api.pr_cache import DiffCache, ReviewCache
+
+DIFF_URL = "https://github.com/owner/repo/pull/1.diff"
+
+
+def make_transport(calls: list):
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(dict(request.headers))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text="diff --git a/x b/x\n", headers={"ETag": '"v1"'})
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+async def test_diff_cache_revalidates_with_etag():
+    calls = []
+    cache = DiffCache()
+    async with httpx.AsyncClient(transport=make_transport(calls)) as client:
+        first = await cache.fetch(client, DIFF_URL)
+        second = await cache.fetch(client, DIFF_URL)
+
+    assert first == (200, "diff --git a/x b/x\n")
+    assert second == first
+    assert "if-none-match" not in calls[0]
+    assert calls[1]["if-none-match"] == '"v1"'
+    assert cache.hits == 1 and cache.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_diff_cache_does_not_store_errors():
+    cache = DiffCache()
+    transport = httpx.MockTransport(lambda request: httpx.Response(404, text="Not Found"))
+    async with httpx.AsyncClient(transport=transport) as client:
+        status, _ = await cache.fetch(client, DIFF_URL)
+    assert status == 404
+    assert DIFF_URL not in cache.entries
+
+
+@pytest.mark.asyncio
+async def test_diff_cache_evicts_lru():
+    calls = []
+    cache = DiffCache(max_entries=2)
+    async with httpx.AsyncClient(transport=make_transport(calls)) as client:
+        for i in range(3):
+            await cache.fetch(client, f"https://github.com/o/r/pull/{i}.diff")
+    assert list(cache.entries) == ["https://github.com/o/r/pull/1.diff", "https://github.com/o/r/pull/2.diff"]
+
+
+def test_review_cache_keyed_by_diff_and_expires():
+    cache = ReviewCache(ttl=60)
+    review = {"summary": "LGTM", "comments": []}
+    cache.set("diff-a", review)
+    assert cache.get("diff-a") == review
+    assert cache.get("diff-b") is None
+
+    cache.ttl = 0
+    assert cache.get("diff-a") is None
+
+
+@pytest.mark.asyncio
+async def test_review_diff_caches_only_complete_reviews_and_hands_out_copies(monkeypatch):
+    from api import ai_utils
+    calls = []
+
+    async def analyze_diff(diff, pr_title, on_item=None):
+        calls.append(diff)
+        if len(calls) == 1:
+            return {"summary": "Yikes! I hit a snag while reading your code. (Error: 503)", "comments": [], "error": "503"}
+        return {"summary": "Yikes, that's tidy.", "comments": [{"file": "x", "line": 1, "message": "ok"}]}
+
+    monkeypatch.setattr(ai_utils, "analyze_diff", analyze_diff)
+    monkeypatch.setattr(ai_utils, "review_cache", ReviewCache(ttl=60))
+
+    assert (await ai_utils.review_diff("diff --git a/x b/x\n", "t"))["error"] == "503"
+    first = await ai_utils.review_diff("diff --git a/x b/x\n", "t")
+    first["comments"].clear()
+    second = await ai_utils.review_diff("diff --git a/x b/x\n", "t")
+    assert len(calls) == 2
+    assert second["comments"] == [{"file": "x", "line": 1, "message": "ok"}]
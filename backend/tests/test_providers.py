@@ -0,0 +1,118 @@
+import json
+import httpx
+import pytest
+from api import ai_utils, providers
+from api.fakes import FakeGemini, FakeGenAIClient, FakeProviderError, LatencyModel
+from api.fake_github import FakeGitHub
+from api.pr_cache import DiffCache
+from api.structured_output import REVIEW_SCHEMA, PROJECT_SCHEMA
+
+
+def instant_gemini(**kwargs) -> FakeGemini:
+    return FakeGemini(latency=LatencyModel(0), tokens_per_sec=0, **kwargs)
+
+
+@pytest.fixture
+def fake_ai(monkeypatch):
+    gemini = instant_gemini(processing_ms=0)
+    monkeypatch.setattr(providers, "AI_PROVIDER", "fake")
+    monkeypatch.setattr(providers, "_fake_gemini", gemini)
+    monkeypatch.setattr(ai_utils, "client", FakeGenAIClient(gemini))
+    monkeypatch.setattr(ai_utils, "GEMINI_API_KEY", "fake")
+    monkeypatch.setattr(ai_utils, "GEMINI_UPLOAD_URL", gemini.upload_url)
+    return gemini
+
+
+@pytest.mark.asyncio
+async def test_fake_structured_output_is_valid_and_deterministic(fake_ai):
+    config = {"response_mime_type": "application/json", "response_schema": REVIEW_SCHEMA}
+    first = await ai_utils.client.aio.models.generate_content(model="m", contents="review this", config=config)
+    second = await ai_utils.client.aio.models.generate_content(model="m", contents="review this", config=config)
+
+    review = json.loads(first.text)
+    assert first.text == second.text
+    assert set(review) == {"summary", "comments"}
+    assert all(c["category"] in ("Opinion", "Security", "Performance", "Pro-Tip") for c in review["comments"])
+    assert first.usage_metadata.candidates_token_count > 0
+
+
+@pytest.mark.asyncio
+async def test_fake_stream_feeds_incremental_parser(fake_ai):
+    items = []
+
+    async def on_item(field, index, value):
+        items.append((field, index))
+
+    project = await ai_utils.generate_json("build a todo app", schema=PROJECT_SCHEMA, on_item=on_item)
+    assert len(project["files"]) == 3
+    assert ("files", 0) in items and ("repo_name", None) in items
+
+
+@pytest.mark.asyncio
+async def test_fake_error_rate():
+    gemini = FakeGemini(latency=LatencyModel(0, error_rate=1.0), tokens_per_sec=0)
+    with pytest.raises(FakeProviderError):
+        await gemini.generate_content("m", "hi")
+
+
+@pytest.mark.asyncio
+async def test_fake_media_upload_and_processing(fake_ai):
+    async def chunks():
+        yield b"a" * 10
+        yield b"b" * 5
+
+    myfile = await ai_utils.upload_media_stream(chunks(), 15, "audio/webm", "standup.webm")
+    assert myfile.size_bytes == 15
+    active = await ai_utils.client.aio.files.get(name=myfile.name)
+    assert active.state.name == "ACTIVE"
+
+    # A deleted file's name is not handed out again
+    await ai_utils.client.aio.files.delete(name=myfile.name)
+    again = await ai_utils.upload_media_stream(chunks(), 15, "audio/webm", "standup.webm")
+    assert again.name != myfile.name
+
+
+@pytest.mark.asyncio
+async def test_file_states_follow_list_pages(fake_ai, monkeypatch):
+    from google.genai import types
+    for i in range(250):
+        name = f"files/f{i}"
+        fake_ai.files[name] = {"file": types.File(name=name, state=types.FileState.PROCESSING), "ready_at": 0}
+    gets = []
+    original_get = ai_utils.client.aio.files.get
+
+    async def get(name):
+        gets.append(name)
+        return await original_get(name)
+
+    monkeypatch.setattr(ai_utils.client.aio.files, "get", get)
+    # The oldest file is on the third page of the newest-first listing
+    states = await ai_utils._fetch_file_states(["files/f0", "files/f249"])
+    assert set(states) == {"files/f0", "files/f249"} and gets == []
+
+
+@pytest.mark.asyncio
+async def test_fake_github_repo_creation_and_diff_revalidation():
+    fake = FakeGitHub()
+    cache = DiffCache()
+    async with httpx.AsyncClient(transport=httpx.MockTransport(fake.handler)) as client:
+        created = await client.post("https://api.github.com/user/repos", json={"name": "todo", "auto_init": True})
+        assert created.status_code == 201
+        assert (await client.post("https://api.github.com/user/repos", json={"name": "todo"})).status_code == 422
+
+        url = "https://github.com/fake-owner/todo/pull/3.diff"
+        status, diff = await cache.fetch(client, url)
+        assert status == 200 and diff.startswith("diff --git")
+        assert await cache.fetch(client, url) == (200, diff)
+    assert fake.repo("fake-owner/todo").head_files() == {"README.md": "# todo"}
+
+
+@pytest.mark.asyncio
+async def test_http_client_routes_github_to_fake(monkeypatch):
+    fake = FakeGitHub()
+    monkeypatch.setattr(providers, "GITHUB_PROVIDER", "fake")
+    monkeypatch.setattr(providers, "_fake_github", fake)
+    async with providers.http_client() as client:
+        response = await client.post("https://api.github.com/user/repos", json={"name": "offline"})
+    assert response.status_code == 201
+    assert "fake-owner/offline" in fake.repos
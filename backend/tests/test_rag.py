@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from api.rag_utils import RepositoryRAG
 
 @pytest.fixture
@@ -41,3 +41,38 @@ async def test_index_files_basic(rag_engine_real):
             args, kwargs = mock_collection.add.call_args
             assert kwargs['ids'][0] == "main.py_chunk_0"
             assert kwargs['metadatas'][0]['path'] == "main.py"
+
+@pytest.mark.asyncio
+async def test_get_embedding_is_recorded(rag_engine_real, monkeypatch):
+    from api import rag_utils
+    from api.llm_usage import UsageTracker
+    tracker = UsageTracker()
+    monkeypatch.setattr(rag_utils, "usage_tracker", tracker)
+    client = MagicMock()
+    client.aio.models.embed_content = AsyncMock(return_value=MagicMock(embeddings=[MagicMock(values=[0.5] * 768)], usage_metadata=None))
+    with patch('api.rag_utils.client', client):
+        await rag_engine_real.get_embedding("hello")
+        client.aio.models.embed_content.side_effect = RuntimeError("quota")
+        await rag_engine_real.get_embedding("hello")
+    stats = tracker.stats()["by_caller"]["get_embedding"]
+    assert stats["calls"] == 2 and stats["errors"] == 1 and stats["prompt_chars"] == 10
+
+@pytest.mark.asyncio
+async def test_get_embedding_does_not_block_the_loop(rag_engine_real, monkeypatch):
+    import asyncio
+    from api import rag_utils
+    from api.fakes import FakeGemini, FakeGenAIClient, LatencyModel
+    monkeypatch.setattr(rag_utils, "client", FakeGenAIClient(FakeGemini(latency=LatencyModel(50))))
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    running = asyncio.ensure_future(ticker())
+    await asyncio.gather(*[rag_engine_real.get_embedding(f"chunk {i}") for i in range(4)])
+    running.cancel()
+    # Four 50 ms embeddings run concurrently while the loop keeps ticking
+    assert ticks >= 5
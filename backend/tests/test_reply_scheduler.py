@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from api import ai_chat
+from api.ai_chat import TeammateIdentity
+from api.reply_scheduler import ReplyScheduler
+
+
+def msg(content: str, sender: str = "alice") -> dict:
+    return {"sender": sender, "content": content}
+
+
+@pytest.mark.asyncio
+async def test_burst_becomes_one_batch_per_channel():
+    calls = []
+
+    async def handler(channel, messages):
+        calls.append((channel, [m["content"] for m in messages]))
+
+    scheduler = ReplyScheduler(handler, debounce=0.05, max_wait=1)
+    for text in ("hey", "quick question", "about the build"):
+        scheduler.submit("dev", msg(text))
+        await asyncio.sleep(0.01)
+    scheduler.submit("random", msg("lol"))
+    await asyncio.sleep(0.15)
+
+    assert sorted(calls) == [("dev", ["hey", "quick question", "about the build"]), ("random", ["lol"])]
+    assert scheduler.stats()["coalesced"] == 2
+
+
+@pytest.mark.asyncio
+async def test_max_wait_bounds_a_steady_stream():
+    calls = []
+
+    async def handler(channel, messages):
+        calls.append(len(messages))
+
+    scheduler = ReplyScheduler(handler, debounce=0.05, max_wait=0.1)
+    for _ in range(8):
+        scheduler.submit("general", msg("still typing"))
+        await asyncio.sleep(0.03)
+    await asyncio.sleep(0.1)
+
+    assert len(calls) >= 2 and sum(calls) == 8
+
+
+def test_batches_arriving_during_a_reply_are_merged():
+    queued = {"channel": "dev", "messages": [msg("second")]}
+    merged = ai_chat.merge_reply_payloads(queued, {"channel": "dev", "messages": [msg("third", "bob")]})
+    assert [m["content"] for m in merged["messages"]] == ["second", "third"]
+    assert queued["messages"] == [msg("second")]  # a new dict, so the ORM sees the change
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    posted, prompts = [], []
+
+    async def identity(teammate):
+        return TeammateIdentity(1, teammate["name"], None)
+
+    async def post(channel, user, content, stream_id=None):
+        posted.append(content)
+
+    async def stream_text(prompt, on_delta, **kwargs):
+        prompts.append(prompt)
+        await on_delta("On it!")
+        return "On it!"
+
+    async def review(link, on_delta=None):
+        return f"review of {link}"
+
+    async def emit(*args):
+        pass
+
+    monkeypatch.setattr(ai_chat, "GEMINI_API_KEY", "key")
+    monkeypatch.setattr(ai_chat, "teammate_identity", identity)
+    monkeypatch.setattr(ai_chat, "post_bot_message", post)
+    monkeypatch.setattr(ai_chat, "stream_text", stream_text)
+    monkeypatch.setattr(ai_chat, "process_pr_link", review)
+    monkeypatch.setattr(ai_chat, "emit_to_channel", emit)
+    return posted, prompts
+
+
+@pytest.mark.asyncio
+async def test_batch_is_answered_with_one_llm_call(chat):
+    posted, prompts = chat
+    await ai_chat.reply_to_messages("dev", [msg("is CI red?"), msg("the deploy failed", "bob")])
+    assert len(prompts) == 1 and posted == ["On it!"]
+    assert '- alice: "is CI red?"' in prompts[0] and '- bob: "the deploy failed"' in prompts[0]
+
+
+@pytest.mark.asyncio
+async def test_each_pr_link_still_gets_a_review(chat):
+    posted, prompts = chat
+    a, b = "https://github.com/o/r/pull/1", "https://github.com/o/r/pull/2"
+    await ai_chat.reply_to_messages("code-review", [msg(f"please look at {a}"), msg(f"and {b}"), msg(a)])
+    assert posted == [f"review of {a}", f"review of {b}"]
+    assert prompts == []
+
+
+@pytest.mark.asyncio
+async def test_retried_review_task_skips_what_was_already_sent(chat, monkeypatch):
+    posted, _ = chat
+    a, b = "https://github.com/o/r/pull/1", "https://github.com/o/r/pull/2"
+    acks, attempts = [], []
+
+    async def emit(event, data, channel):
+        if event == "new_message":
+            acks.append(data["content"])
+
+    async def review(link, on_delta=None):
+        attempts.append(link)
+        if link == b and attempts.count(b) == 1:
+            raise RuntimeError("503")
+        return f"review of {link}"
+
+    monkeypatch.setattr(ai_chat, "emit_to_channel", emit)
+    monkeypatch.setattr(ai_chat, "process_pr_link", review)
+    payload = {"channel": "code-review", "messages": [msg(f"{a} {b}")]}
+
+    with pytest.raises(RuntimeError):
+        await ai_chat.run_reply_task(payload)
+    # The payload is persisted by fail_task and handed to the retry
+    await ai_chat.run_reply_task(payload)
+
+    assert len(acks) == 1
+    assert posted == [f"review of {a}", f"review of {b}"]
+    assert attempts == [a, b, b]
@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from api.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    upstream = 0
+
+    async def call():
+        nonlocal upstream
+        upstream += 1
+        await asyncio.sleep(0.01)
+        return "reply"
+
+    results = await asyncio.gather(*[flight.do("same-prompt", call) for _ in range(5)])
+    assert results == ["reply"] * 5
+    assert upstream == 1
+    stats = flight.stats()
+    assert stats["upstream_calls"] == 1
+    assert stats["shared"] == 4
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_waiters_and_are_not_memoized():
+    flight = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota exceeded")
+
+    results = await asyncio.gather(*[flight.do("k", boom, memo_ttl=60) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert "k" not in flight.memo
+
+
+@pytest.mark.asyncio
+async def test_memo_reuses_result_within_ttl():
+    flight = SingleFlight()
+    upstream = 0
+
+    async def call():
+        nonlocal upstream
+        upstream += 1
+        return upstream
+
+    assert await flight.do("k", call, memo_ttl=60) == 1
+    assert await flight.do("k", call, memo_ttl=60) == 1
+    # Without memo the next call goes upstream again
+    assert await flight.do("k", call) == 2
+    assert flight.stats()["memo_hits"] == 1
+    assert flight.stats()["saved"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    first = asyncio.ensure_future(flight.do("k", call))
+    second = asyncio.ensure_future(flight.do("k", call))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "done"
+
+
+@pytest.mark.asyncio
+async def test_stream_fans_chunks_out_to_late_and_failing_callers():
+    flight = SingleFlight()
+    upstream = 0
+    release = asyncio.Event()
+
+    async def call(publish):
+        nonlocal upstream
+        upstream += 1
+        publish("a")
+        await release.wait()
+        publish("b")
+        return "ab"
+
+    first_chunks, late_chunks = [], []
+
+    def collect(chunks):
+        async def on_chunk(chunk):
+            chunks.append(chunk)
+        return on_chunk
+
+    async def broken(chunk):
+        raise RuntimeError("socket gone")
+
+    first = asyncio.ensure_future(flight.stream("k", call, collect(first_chunks)))
+    failing = asyncio.ensure_future(flight.stream("k", call, broken))
+    await asyncio.sleep(0)
+    late = asyncio.ensure_future(flight.stream("k", call, collect(late_chunks)))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await first == "ab" and await late == "ab"
+    with pytest.raises(RuntimeError):
+        await failing
+    assert first_chunks == late_chunks == ["a", "b"]
+    assert upstream == 1 and flight.stats()["shared"] == 2 and flight.stats()["in_flight"] == 0
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+import socketio
+from api import socket_manager
+from api.socket_manager import BoundedServer, ObservedManager
+from api.gamification_utils import update_stat
+
+
+class FakeEioSocket:
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.closing = self.closed = False
+        self.close = AsyncMock()
+
+    def fill(self, count: int):
+        for _ in range(count):
+            self.queue.put_nowait("packet")
+
+
+async def make_server(*eio_sids):
+    server = BoundedServer(async_mode="asgi", client_manager=ObservedManager())
+    server.manager.initialize()
+    server.eio.send_packet = AsyncMock()
+    sockets = {}
+    for eio_sid in eio_sids:
+        sockets[eio_sid] = server.eio.sockets[eio_sid] = FakeEioSocket()
+        sid = await server.manager.connect(eio_sid, "/")
+        await server.manager.enter_room(sid, "/", "user_1")
+    return server, sockets
+
+
+def sent(server, eio_sid: str) -> list:
+    """(event, data) of the Socket.IO events sent to a connection."""
+    events = []
+    for call in server.eio.send_packet.call_args_list:
+        if call.args[0] == eio_sid:
+            events.append(tuple(json.loads(call.args[1].data[1:])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_stats_updates_merge_while_a_client_is_behind(monkeypatch):
+    monkeypatch.setattr(socket_manager, "SOCKETIO_FLUSH_INTERVAL", 0.01)
+    server, sockets = await make_server("fast", "slow")
+    sockets["slow"].fill(socket_manager.SOCKETIO_QUEUE_SOFT_LIMIT)
+
+    await server.emit("stats_update", {"user_id": 1, "xp": 110}, room="user_1")
+    await server.emit("stats_update", {"user_id": 1, "effort": 55}, room="user_1")
+    await server.emit("stats_update", {"user_id": 1, "xp": 120}, room="user_1")
+    await server.emit("new_activity", {"id": 7}, room="user_1")
+
+    assert [event for event, _ in sent(server, "fast")] == ["stats_update"] * 3 + ["new_activity"]
+    # Unmergeable events still go out; stats wait for the queue to drain
+    assert sent(server, "slow") == [("new_activity", {"id": 7})]
+
+    while not sockets["slow"].queue.empty():
+        sockets["slow"].queue.get_nowait()
+    await asyncio.sleep(0.05)
+    assert sent(server, "slow")[1:] == [("stats_update", {"user_id": 1, "xp": 120, "effort": 55})]
+    assert server.stats()["merged"] == 3 and server.stats()["held"] == 0
+
+
+@pytest.mark.asyncio
+async def test_client_at_the_queue_limit_is_dropped():
+    server, sockets = await make_server("stuck")
+    sockets["stuck"].fill(socket_manager.SOCKETIO_QUEUE_LIMIT)
+
+    await server.emit("new_message", {"content": "hi"}, room="user_1")
+
+    server.eio.send_packet.assert_not_called()
+    sockets["stuck"].close.assert_awaited_once_with(wait=False, abort=True)
+    # Backlog discarded; the writer is woken up to exit
+    assert sockets["stuck"].queue.qsize() == 1 and sockets["stuck"].queue.get_nowait() is None
+    assert server.stats()["slow_disconnects"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stat_changes_send_only_changed_fields():
+    payloads = []
+
+    async def emit(event, data, room=None, **kwargs):
+        payloads.append((event, data))
+
+    user = SimpleNamespace(id=9, username="bob", xp=95, level=1, truthfulness=50, effort=50, collaboration=50, reliability=50, quality=100)
+    with patch("api.socket_instance.sio.emit", side_effect=emit):
+        await update_stat(user, "collaboration", 1)
+        await update_stat(user, "effort", -5)
+        await update_stat(user, "quality", 0)  # no change, no emit
+
+    assert payloads == [
+        ("level_up", {"level": 2, "username": "bob"}),
+        ("stats_update", {"user_id": 9, "collaboration": 51, "xp": 105, "level": 2}),
+        ("stats_update", {"user_id": 9, "effort": 45}),
+    ]
+
+
+def test_server_refuses_to_start_without_the_hooked_internals(monkeypatch):
+    BoundedServer(async_mode="asgi")
+    monkeypatch.delattr(socketio.AsyncServer, "_send_packet")
+    with pytest.raises(RuntimeError, match="AsyncServer._send_packet"):
+        BoundedServer(async_mode="asgi")
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+import socketio
+from unittest.mock import AsyncMock
+from api.socket_manager import LocalBus, LocalPubSubManager, ObservedManager, make_client_manager, emit_listeners
+
+
+def make_worker(bus: LocalBus) -> socketio.AsyncServer:
+    server = socketio.AsyncServer(async_mode="asgi", client_manager=LocalPubSubManager(bus))
+    server._send_eio_packet = AsyncMock()
+    server.manager.initialize()
+    return server
+
+
+async def connect(server: socketio.AsyncServer, eio_sid: str, room: str):
+    sid = await server.manager.connect(eio_sid, "/")
+    await server.manager.enter_room(sid, "/", room)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def delivered_to(server: socketio.AsyncServer) -> list:
+    return [call.args[0] for call in server._send_eio_packet.call_args_list]
+
+
+@pytest.mark.asyncio
+async def test_emit_on_one_worker_reaches_sockets_on_another():
+    bus = LocalBus()
+    worker_a, worker_b = make_worker(bus), make_worker(bus)
+    await connect(worker_a, "eio-a", "user_1")
+    await connect(worker_b, "eio-b", "user_1")
+    await connect(worker_b, "eio-c", "user_2")
+
+    await worker_a.emit("stats_update", {"xp": 10}, room="user_1")
+    await settle()
+
+    assert delivered_to(worker_a) == ["eio-a"]
+    assert delivered_to(worker_b) == ["eio-b"]
+    worker_a.manager.thread.cancel()
+    worker_b.manager.thread.cancel()
+
+
+@pytest.mark.asyncio
+async def test_write_only_emitter_reaches_workers():
+    bus = LocalBus()
+    worker = make_worker(bus)
+    await connect(worker, "eio-a", "channel_dev")
+
+    emitter = LocalPubSubManager(bus, write_only=True)
+    await emitter.emit("new_message", {"content": "hi"}, room="channel_dev")
+    await settle()
+
+    assert delivered_to(worker) == ["eio-a"]
+    worker.manager.thread.cancel()
+
+
+def test_manager_selection():
+    assert isinstance(make_client_manager("memory"), ObservedManager)
+    assert isinstance(make_client_manager("local"), LocalPubSubManager)
+    with pytest.raises(ValueError):
+        make_client_manager("carrier-pigeon")
+
+
+@pytest.mark.asyncio
+async def test_emit_listeners_run_on_every_worker(monkeypatch):
+    seen = []
+    monkeypatch.setitem(emit_listeners, "new_message", [lambda data, room: seen.append((data["id"], room))])
+    bus = LocalBus()
+    worker_a, worker_b = make_worker(bus), make_worker(bus)
+
+    await worker_a.emit("new_message", {"id": 1}, room="channel_dev")
+    await settle()
+
+    assert seen == [(1, "channel_dev"), (1, "channel_dev")]
+    worker_a.manager.thread.cancel()
+    worker_b.manager.thread.cancel()
@@ -0,0 +1,69 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from api import socket_instance
+from api.auth_utils import create_access_token
+from api.gamification_utils import update_stat
+
+
+@pytest.fixture
+def emitted():
+    events = []
+
+    async def emit(event, data, room=None, **kwargs):
+        events.append((event, room))
+
+    with patch("api.socket_instance.sio.emit", side_effect=emit):
+        yield events
+
+
+@pytest.mark.asyncio
+async def test_authenticated_connect_joins_user_and_members_rooms_only():
+    token = create_access_token({"sub": "alice", "id": 5})
+    with patch.object(socket_instance.sio, "save_session", AsyncMock()), \
+         patch.object(socket_instance.sio, "enter_room", AsyncMock()) as enter_room:
+        await socket_instance.connect("sid1", {}, {"token": token})
+    rooms = {call.args[1] for call in enter_room.call_args_list}
+    assert rooms == {"user_5", "members"}
+
+
+@pytest.mark.asyncio
+async def test_channel_rooms_are_joined_on_subscribe_and_left_on_unsubscribe():
+    with patch.object(socket_instance.sio, "get_session", AsyncMock(return_value={"user_id": 5})), \
+         patch.object(socket_instance.sio, "enter_room", AsyncMock()) as enter_room, \
+         patch.object(socket_instance.sio, "leave_room", AsyncMock()) as leave_room:
+        await socket_instance.subscribe("sid1", {"channel": "dev"})
+        await socket_instance.subscribe("sid1", {"channel": "not-a-channel"})
+        await socket_instance.unsubscribe("sid1", {"channel": "dev"})
+    assert [call.args for call in enter_room.call_args_list] == [("sid1", "channel_dev")]
+    assert [call.args for call in leave_room.call_args_list] == [("sid1", "channel_dev")]
+
+
+@pytest.mark.asyncio
+async def test_anonymous_sockets_cannot_subscribe():
+    with patch.object(socket_instance.sio, "get_session", AsyncMock(return_value={})), \
+         patch.object(socket_instance.sio, "enter_room", AsyncMock()) as enter_room:
+        await socket_instance.subscribe("sid2", {"channel": "dev"})
+    enter_room.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_anonymous_connect_joins_nothing():
+    with patch.object(socket_instance.sio, "enter_room", AsyncMock()) as enter_room:
+        await socket_instance.connect("sid2", {}, None)
+    enter_room.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_stat_changes_only_reach_the_user(emitted):
+    user = SimpleNamespace(id=9, username="bob", xp=95, level=1, truthfulness=50, effort=50, collaboration=50, reliability=50, quality=50)
+    await update_stat(user, "collaboration", 1)
+    assert emitted == [("level_up", "user_9"), ("stats_update", "user_9")]
+
+
+@pytest.mark.asyncio
+async def test_channel_emit_targets_channel_room(emitted):
+    await socket_instance.emit_to_channel("message_delta", {"channel": "dev"}, "dev")
+    await socket_instance.emit_to_channel("new_message", {"channel": "dev"}, "dev")
+    # Members outside the channel only hear that it has something new
+    assert emitted == [("message_delta", "channel_dev"), ("new_message", "channel_dev"), ("channel_activity", "members")]
@@ -0,0 +1,69 @@
+import io
+import os
+import pytest
+from fastapi import HTTPException, UploadFile
+from api import storage_utils
+from api.storage_utils import stream_upload, save_to_static
+
+DATA = bytes(range(256)) * 40  # 10 KiB
+
+
+def make_upload(data: bytes = DATA, declared: bool = True) -> UploadFile:
+    return UploadFile(io.BytesIO(data), size=len(data) if declared else None, filename="clip.webm")
+
+
+def collect(sizes: list):
+    async def consumer(chunks):
+        data = b""
+        async for chunk in chunks:
+            sizes.append(len(chunk))
+            data += chunk
+        return data
+    return consumer
+
+
+@pytest.mark.asyncio
+async def test_stream_upload_hands_over_fixed_size_chunks():
+    sizes = []
+    upload = make_upload()
+    assert await stream_upload(upload, collect(sizes), chunk_size=4096) == DATA
+    assert sizes == [4096, 4096, 2048]
+    assert upload.file.closed
+
+
+@pytest.mark.asyncio
+async def test_declared_size_over_limit_rejected_before_reading():
+    upload = make_upload()
+    with pytest.raises(HTTPException) as exc:
+        await stream_upload(upload, collect([]), max_bytes=1024)
+    assert exc.value.status_code == 413
+    assert upload.file.tell() == 0
+
+
+@pytest.mark.asyncio
+async def test_undeclared_size_over_limit_aborts_and_removes_partial_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_utils, "UPLOAD_DIR", str(tmp_path))
+    with pytest.raises(HTTPException) as exc:
+        await stream_upload(make_upload(declared=False), save_to_static("big.webm"), max_bytes=5000, chunk_size=4096)
+    assert exc.value.status_code == 413
+    assert not os.path.exists(tmp_path / "big.webm")
+
+
+@pytest.mark.asyncio
+async def test_consumer_stopping_early_reads_no_further():
+    upload = make_upload()
+
+    async def first_chunk(chunks):
+        async for chunk in chunks:
+            return chunk
+
+    assert await stream_upload(upload, first_chunk, chunk_size=1024) == DATA[:1024]
+    assert upload.file.closed
+
+
+@pytest.mark.asyncio
+async def test_save_to_static_writes_the_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_utils, "UPLOAD_DIR", str(tmp_path))
+    url = await stream_upload(make_upload(), save_to_static("clip.webm"), chunk_size=1024)
+    assert url.endswith("/static/clip.webm")
+    assert (tmp_path / "clip.webm").read_bytes() == DATA
@@ -0,0 +1,77 @@
+import json
+import pytest
+from api.structured_output import IncrementalJSONParser, strip_code_fences, parse_json_response
+
+PROJECT = {
+    "project_name": "Todo",
+    "repo_name": "todo-simulation",
+    "files": [
+        {"path": "README.md", "content": "# Todo\n\nSome \"quoted\" text and a brace } here"},
+        {"path": "src/App.jsx", "content": "export default () => [1, 2, {a: 3}];\\n"},
+    ],
+    "tickets": [{"title": "Fix bug", "story_points": 3, "done": False, "owner": None}],
+}
+
+
+def feed_in_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 17, 10000])
+def test_emits_items_as_they_complete(chunk_size):
+    text = "```json\n" + json.dumps(PROJECT, indent=2) + "\n```"
+    parser = IncrementalJSONParser()
+    events = feed_in_chunks(parser, text, chunk_size)
+
+    items = [(f, i, v) for f, i, v in events if i is not None]
+    assert [(f, i) for f, i, _ in items] == [("files", 0), ("files", 1), ("tickets", 0)]
+    assert items[0][2] == PROJECT["files"][0]
+    assert items[2][2] == PROJECT["tickets"][0]
+
+    fields = {f: v for f, i, v in events if i is None}
+    assert fields["repo_name"] == "todo-simulation"
+    assert fields["files"] == PROJECT["files"]
+    assert parser.result() == PROJECT
+
+
+def test_file_item_is_available_before_document_finishes():
+    text = json.dumps(PROJECT)
+    cut = text.index('"tickets"')
+    parser = IncrementalJSONParser()
+    events = parser.feed(text[:cut])
+    assert ("files", 1, PROJECT["files"][1]) in events
+
+
+def test_scalars_and_object_members():
+    parser = IncrementalJSONParser()
+    events = feed_in_chunks(parser, '{"score": -5, "meta": {"a": 1.5, "b": true}, "explanation": "ok"}', 2)
+    assert ("score", None, -5) in events
+    assert ("meta", "a", 1.5) in events
+    assert ("meta", "b", True) in events
+    assert ("explanation", None, "ok") in events
+
+
+def test_truncated_response_recovers_completed_items():
+    text = json.dumps(PROJECT)
+    cut = text.index('"tickets"') + 20
+    parser = IncrementalJSONParser()
+    parser.feed(text[:cut])
+    partial = parser.result()
+    assert partial["repo_name"] == "todo-simulation"
+    assert partial["files"] == PROJECT["files"]
+
+
+def test_result_raises_when_nothing_completed():
+    parser = IncrementalJSONParser()
+    parser.feed('{"summary": "unterminated')
+    with pytest.raises(ValueError):
+        parser.result()
+
+
+def test_strip_code_fences():
+    assert strip_code_fences('```json\n{"a": 1}\n```') == '{"a": 1}'
+    assert parse_json_response('```\n[1]\n```') == [1]
+    assert parse_json_response('{"a": 1}') == {"a": 1}
@@ -0,0 +1,178 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+from api import task_queue, ai_chat, webhooks  # noqa: F401 (registers pr_review)
+from api.task_queue import TaskWorker, claim_statement, retry_delay, task_handlers
+
+
+class FakeQueue:
+    """Stands in for the tasks table: claim/complete/fail against a list."""
+
+    def __init__(self, tasks):
+        self.queued = [SimpleNamespace(id=i + 1, attempts=0, max_attempts=3, **t) for i, t in enumerate(tasks)]
+        self.done, self.failed = [], []
+
+    async def claim(self, db, worker_id, limit):
+        claimed, self.queued = self.queued[:limit], self.queued[limit:]
+        for task in claimed:
+            task.attempts += 1
+        return claimed
+
+    async def complete(self, db, task_id):
+        self.done.append(task_id)
+
+    async def fail(self, db, task, error):
+        if task.attempts < task.max_attempts:
+            self.queued.append(task)
+            return True
+        self.failed.append(task.id)
+        return False
+
+
+class NullSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    def make(tasks, handlers):
+        fake = FakeQueue(tasks)
+        monkeypatch.setattr(task_queue, "claim_tasks", fake.claim)
+        monkeypatch.setattr(task_queue, "complete_task", fake.complete)
+        monkeypatch.setattr(task_queue, "fail_task", fake.fail)
+        for kind, handler in handlers.items():
+            monkeypatch.setitem(task_handlers, kind, handler)
+        return fake
+    return make
+
+
+async def run_worker(worker, seconds):
+    runner = asyncio.ensure_future(worker.run())
+    await asyncio.sleep(seconds)
+    worker.stop()
+    await runner
+
+
+def test_claim_skips_rows_locked_by_other_workers():
+    sql = str(claim_statement("w1", 4).compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "RETURNING" in sql
+    # Tasks of a crashed worker are handed out again
+    assert "tasks.locked_at <" in sql
+    # Keyed tasks wait for older and running tasks of their key
+    assert "tasks.key IS NULL OR NOT (EXISTS" in sql
+
+
+def test_retry_backoff_doubles():
+    assert [retry_delay(n) / retry_delay(1) for n in (1, 2, 3)] == [1, 2, 4]
+
+
+@pytest.mark.asyncio
+async def test_worker_caps_concurrency_and_retries(queue):
+    active, peak, seen = 0, 0, []
+
+    async def handler(payload):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.02)
+        active -= 1
+        seen.append(payload["n"])
+        if payload["n"] == 0 and seen.count(0) == 1:
+            raise RuntimeError("flaky")
+
+    fake = queue([{"kind": "test", "payload": {"n": n}} for n in range(5)] + [{"kind": "unknown", "payload": {}}], {"test": handler})
+    worker = TaskWorker(concurrency=2, poll_interval=0.01, session_factory=NullSession)
+    await run_worker(worker, 0.3)
+
+    assert peak == 2
+    assert sorted(fake.done) == [1, 2, 3, 4, 5]
+    assert seen.count(0) == 2
+    # No handler: retried, then failed for good
+    assert fake.failed == [6]
+    assert worker.stats()["retried"] == 3 and worker.stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_reply_batches_are_queued(monkeypatch):
+    queued = []
+
+    async def enqueue(kind, payload, **kwargs):
+        queued.append((kind, payload))
+
+    monkeypatch.setattr(ai_chat, "enqueue", enqueue)
+    await ai_chat.reply_scheduler.handler("dev", [{"sender": "alice", "content": "hi"}])
+    assert queued == [("ai_reply", {"channel": "dev", "messages": [{"sender": "alice", "content": "hi"}]})]
+    assert {"ai_reply", "proactive_message", "pr_review"} <= set(task_handlers)
+
+
+@pytest.fixture
+async def pg_tasks():
+    """A session on DATABASE_URL's tasks table (migrated), emptied; skipped without a Postgres server."""
+    from sqlalchemy import delete
+    from database import AsyncSessionLocal, engine
+    from models import Task
+    await engine.dispose()  # pooled connections may belong to another test's loop
+    try:
+        async with engine.connect() as conn:
+            if conn.dialect.name != "postgresql":
+                pytest.skip("needs Postgres")
+    except OSError:
+        pytest.skip("no Postgres server")
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Task))
+        await db.commit()
+        yield db
+        await db.execute(delete(Task))
+        await db.commit()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_reply_batches_coalesce_per_channel_in_the_queue(pg_tasks):
+    def batch(*texts):
+        return [{"sender": "alice", "content": text} for text in texts]
+
+    await asyncio.gather(*[ai_chat.enqueue_reply("dev", batch(str(i))) for i in range(4)])
+    await ai_chat.enqueue_reply("random", batch("lol"))
+    claimed = await task_queue.claim_tasks(pg_tasks, "w1", 10)
+    assert sorted(len(task.payload["messages"]) for task in claimed) == [1, 4]
+
+    # While #dev's reply runs, new batches wait in one task and aren't handed out
+    await ai_chat.enqueue_reply("dev", batch("5"))
+    await ai_chat.enqueue_reply("dev", batch("6"))
+    assert await task_queue.claim_tasks(pg_tasks, "w2", 10) == []
+
+    dev = next(task for task in claimed if task.payload["channel"] == "dev")
+    await task_queue.complete_task(pg_tasks, dev.id)
+    [follow_up] = await task_queue.claim_tasks(pg_tasks, "w2", 10)
+    assert follow_up.payload["messages"] == batch("5", "6")
+
+
+@pytest.mark.asyncio
+async def test_long_tasks_keep_their_lock_fresh(queue, monkeypatch):
+    beats = []
+
+    async def heartbeat(db, task_id, worker_id):
+        beats.append(task_id)
+
+    async def slow(payload):
+        await asyncio.sleep(0.1)
+
+    monkeypatch.setattr(task_queue, "TASK_HEARTBEAT_INTERVAL", 0.02)
+    monkeypatch.setattr(task_queue, "heartbeat_task", heartbeat)
+    fake = queue([{"kind": "slow", "payload": {}}], {"slow": slow})
+    await run_worker(TaskWorker(concurrency=1, poll_interval=0.01, session_factory=NullSession), 0.2)
+
+    assert fake.done == [1]
+    assert 3 <= len(beats) <= 5
+    # No heartbeats after the task finished
+    count = len(beats)
+    await asyncio.sleep(0.05)
+    assert len(beats) == count
+
@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+from types import MappingProxyType, SimpleNamespace
+from sqlalchemy.dialects import postgresql
+from api import ai_chat
+
+
+class FakeSession:
+    def __init__(self, log):
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        self.log.append(str(stmt.compile(dialect=postgresql.dialect())))
+        await asyncio.sleep(0)
+        return [SimpleNamespace(id=i + 1, username=t["name"], avatar_url=t["avatar_url"]) for i, t in enumerate(ai_chat.AI_TEAMMATES)]
+
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def statements(monkeypatch):
+    log = []
+    monkeypatch.setattr(ai_chat, "AsyncSessionLocal", lambda: FakeSession(log))
+    monkeypatch.setattr(ai_chat, "teammate_identities", MappingProxyType({}))
+    return log
+
+
+@pytest.mark.asyncio
+async def test_roster_is_upserted_in_one_statement(statements):
+    identities = await ai_chat.load_teammate_identities()
+    assert len(statements) == 1
+    assert "ON CONFLICT (username) DO UPDATE" in statements[0]
+    assert identities["Mike"].id == 2
+    with pytest.raises(TypeError):
+        identities["Mike"] = None
+
+
+@pytest.mark.asyncio
+async def test_identity_lookups_hit_the_cache(statements):
+    sarah, mike = ai_chat.AI_TEAMMATES[0], ai_chat.AI_TEAMMATES[1]
+    # Concurrent first lookups (startup load failed) resolve the roster once
+    results = await asyncio.gather(*[ai_chat.teammate_identity(t) for t in (sarah, mike, sarah)])
+    assert [r.username for r in results] == ["Sarah", "Mike", "Sarah"]
+    assert len(statements) == 1
+
+    await ai_chat.teammate_identity(mike)
+    assert len(statements) == 1
@@ -0,0 +1,79 @@
+import os
+import pytest
+from api.template_cache import TemplateCache, normalize_description, reparameterize
+
+PROJECT = {
+    "project_name": "Todo",
+    "repo_name": "todo-simulation",
+    "files": {"README.md": "# A simple todo app\n"},
+    "tickets": [{"title": "Build A simple todo app", "description": "Core feature", "story_points": 3}],
+    "is_fallback": False,
+}
+
+
+def test_normalize_description():
+    assert normalize_description("  A Simple, TODO app!! ") == "a simple todo app"
+
+
+def test_reparameterize_swaps_description():
+    project = reparameterize(PROJECT, "A simple todo app", "A shopping list")
+    assert project["files"]["README.md"] == "# A shopping list\n"
+    assert project["tickets"][0]["title"] == "Build A shopping list"
+    assert project["from_template"] is True
+    assert PROJECT["files"]["README.md"] == "# A simple todo app\n"
+
+
+@pytest.mark.asyncio
+async def test_lookup_hits_similar_description_for_same_stack(tmp_path):
+    cache = TemplateCache(directory=str(tmp_path), threshold=0.9)
+    await cache.store("A simple todo app", "Flask", "React", [1.0, 0.0, 0.1], PROJECT)
+
+    hit = await cache.lookup("A simple todo app", "flask", "react", [0.99, 0.01, 0.1])
+    assert hit["files"] == PROJECT["files"]
+    assert "is_fallback" not in hit
+
+    assert await cache.lookup("A simple todo app", "Django", "React", [1.0, 0.0, 0.1]) is None
+    assert await cache.lookup("A chess engine", "Flask", "React", [0.0, 1.0, 0.0]) is None
+    assert cache.stats() == {"templates": 1, "hits": 1, "misses": 2}
+
+
+@pytest.mark.asyncio
+async def test_templates_persist_and_evict_lru(tmp_path):
+    cache = TemplateCache(directory=str(tmp_path), max_entries=2)
+    await cache.store("one", "Flask", "React", [1.0, 0.0, 0.0], PROJECT)
+    await cache.store("two", "Flask", "React", [0.0, 1.0, 0.0], PROJECT)
+    # Touch "one" so "two" is the least recently used
+    assert await cache.lookup("one", "Flask", "React", [1.0, 0.0, 0.0]) is not None
+    await cache.store("three", "Flask", "React", [0.0, 0.0, 1.0], PROJECT)
+
+    reloaded = TemplateCache(directory=str(tmp_path), max_entries=2)
+    assert sorted(e["description"] for e in reloaded.entries.values()) == ["one", "three"]
+    assert len([f for f in os.listdir(tmp_path) if f != "index.json"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_zero_embedding_is_not_stored(tmp_path):
+    cache = TemplateCache(directory=str(tmp_path))
+    await cache.store("anything", "Flask", "React", [0.0] * 768, PROJECT)
+    assert cache.entries == {}
+
+
+@pytest.mark.asyncio
+async def test_embedding_outage_skips_the_cache_and_still_generates(monkeypatch):
+    from api import ai_utils
+    from api.rag_utils import rag_engine
+    prompts = []
+
+    async def get_embedding(text):
+        raise ConnectionError("embeddings down")
+
+    async def generate_json(prompt, schema=None, on_item=None, **kwargs):
+        prompts.append(prompt)
+        return {"project_name": "Todo", "repo_name": "todo-simulation", "files": [{"path": "app.js", "content": "//"}], "tickets": []}
+
+    monkeypatch.setattr(ai_utils, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(ai_utils, "generate_json", generate_json)
+    monkeypatch.setattr(rag_engine, "get_embedding", get_embedding)
+    project = await ai_utils.generate_project_with_bugs("A simple todo app")
+    assert len(prompts) == 1
+    assert project["is_fallback"] is False and project["files"] == {"app.js": "//"}
@@ -0,0 +1,78 @@
+import re
+import pytest
+from api import ai_utils
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    prompts = []
+
+    async def generate_json(prompt, schema=None, **kwargs):
+        prompts.append(prompt)
+        if "FAIL" in prompt:
+            raise RuntimeError("quota")
+        ids = [int(i) for i in re.findall(r'^\s*\[(\d+)\] "', prompt, re.M)]
+        # Skip the last standup of each batch to exercise the neutral fallback
+        return {"results": [{"id": i, "score": -9 if i == 0 else 2, "explanation": f"ok {i}"} for i in ids[:-1]]}
+
+    monkeypatch.setattr(ai_utils, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(ai_utils, "generate_json", generate_json)
+    return prompts
+
+
+def standup(i, board="- [IN_PROGRESS] Login"):
+    return {"id": f"s{i}", "transcript": f"working on login {i}", "ticket_summary": board}
+
+
+@pytest.mark.asyncio
+async def test_batches_share_prompts_and_boards(fake_llm):
+    items = [standup(i) for i in range(5)]
+    results = await ai_utils.verify_standups_batch(items, batch_size=3)
+
+    assert len(fake_llm) == 2
+    # one board listed once for all standups of the same user
+    assert fake_llm[0].count("- [IN_PROGRESS] Login") == 1
+    assert results["s0"]["score"] == -5  # clamped to the rules' range
+    assert results["s1"] == {"score": 2, "explanation": "ok 1"}
+    assert results["s2"]["score"] == 0  # missing from the response
+    assert set(results) == {f"s{i}" for i in range(5)}
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_neutral(fake_llm):
+    items = [standup(0, board="FAIL"), standup(1, board="FAIL")]
+    results = await ai_utils.verify_standups_batch(items)
+    assert [r["score"] for r in results.values()] == [0, 0]
+
+
+@pytest.mark.asyncio
+async def test_batch_applies_each_standup_like_the_single_path(monkeypatch):
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock, MagicMock
+    from api import gamification_utils
+
+    async def verify(items):
+        return {0: {"score": 5, "explanation": "done"}, 1: {"score": -5, "explanation": "not done"}}
+
+    monkeypatch.setattr(ai_utils, "verify_standups_batch", verify)
+    monkeypatch.setattr(gamification_utils, "emit_stats", AsyncMock())
+    monkeypatch.setattr(gamification_utils, "award_xp", award := AsyncMock())
+    db = SimpleNamespace(execute=AsyncMock(return_value=MagicMock()))
+    user = SimpleNamespace(id=1, username="ann", truthfulness=98)
+
+    await gamification_utils.calculate_truthfulness_batch([(user, "shipped it"), (user, "also shipped")], db)
+    # +5 clamps at 100 and earns XP before the -5; a summed 0 would have done neither
+    assert user.truthfulness == 95
+    award.assert_awaited_once_with(user, 50, {"truthfulness": 100})
+
+
+@pytest.mark.asyncio
+async def test_single_path_clamps_like_the_batch(monkeypatch):
+    async def generate_json(prompt, schema=None, **kwargs):
+        return {"score": 7, "explanation": "very honest"}
+
+    monkeypatch.setattr(ai_utils, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(ai_utils, "generate_json", generate_json)
+
+    result = await ai_utils.verify_standup_truthfulness("shipped login", "- [DONE] Login")
+    assert result == {"score": 2, "explanation": "very honest"}
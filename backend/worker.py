@@ -0,0 +1,34 @@
+"""
+Standalone task worker: `python worker.py`.
+
+Runs the AI tasks queued by the web app (see api/task_queue.py). Start any
+number of these and set TASK_WORKER_IN_PROCESS=false on the web processes.
+Messages they post reach browsers only through a shared socket manager, so
+set SOCKETIO_MANAGER=redis for both.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import asyncio
+import signal
+from api.task_queue import TaskWorker
+from api.socket_manager import SOCKETIO_MANAGER
+# Registers the task handlers
+import api.ai_chat  # noqa: F401
+import api.webhooks  # noqa: F401
+
+
+async def main():
+    worker = TaskWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Finish the running tasks, then exit
+        loop.add_signal_handler(sig, worker.stop)
+    if SOCKETIO_MANAGER == "memory":
+        print("Warning: SOCKETIO_MANAGER=memory, messages from this worker won't reach connected clients")
+    await worker.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
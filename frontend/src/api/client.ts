@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { reconnectSocket } from './socket';
 
 const api = axios.create({
     baseURL: `${import.meta.env.VITE_BASE_API_URL}/api`, // Backend URL
@@ -18,6 +19,7 @@ api.interceptors.response.use(
         if (error.response && error.response.status === 401) {
             localStorage.removeItem('token');
             localStorage.removeItem('user');
+            reconnectSocket();
             if (window.location.pathname !== '/login') {
                 window.location.href = '/login';
             }
@@ -0,0 +1,49 @@
+import api from './client';
+import socket from './socket';
+
+export interface Job {
+    job_id: string;
+    status: 'queued' | 'running' | 'succeeded' | 'failed';
+    stage: string;
+    // eslint-disable-next-line @typescript-eslint/no-explicit-any
+    result: any;
+    error: string | null;
+}
+
+// Resolves when a background job finishes. Completion normally arrives as a
+// `job_progress` socket event; polling (with backoff) is only a safety net
+// for a dropped socket.
+export const waitForJob = (statusUrl: string, job: Job, onStage?: (stage: string) => void): Promise<Job> =>
+    new Promise((resolve, reject) => {
+        let done = false;
+        let timer: ReturnType<typeof setTimeout>;
+        let delay = 2000;
+
+        const finish = (finished: Job) => {
+            if (done) return;
+            done = true;
+            clearTimeout(timer);
+            socket.off('job_progress', onProgress);
+            if (finished.status === 'failed') reject(new Error(finished.error || 'Job failed'));
+            else resolve(finished);
+        };
+        const onProgress = (data: Job) => {
+            if (data.job_id !== job.job_id) return;
+            onStage?.(data.stage);
+            if (data.status === 'succeeded' || data.status === 'failed') finish(data);
+        };
+        const poll = async () => {
+            try {
+                const latest: Job = (await api.get(statusUrl)).data;
+                if (latest.status === 'succeeded' || latest.status === 'failed') return finish(latest);
+            } catch (error) {
+                console.error('Job status check failed', error);
+            }
+            delay = Math.min(delay * 2, 15000);
+            if (!done) timer = setTimeout(poll, delay);
+        };
+
+        socket.on('job_progress', onProgress);
+        if (job.status === 'succeeded' || job.status === 'failed') finish(job);
+        else timer = setTimeout(poll, delay);
+    });
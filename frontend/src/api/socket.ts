@@ -3,7 +3,14 @@ import { io } from "socket.io-client";
 const socket = io(import.meta.env.VITE_BASE_API_URL, {
     transports: ['websocket'],
     autoConnect: true,
-    withCredentials: false
+    withCredentials: false,
+    // Sent on every (re)connect so the server can put us in our user room
+    auth: (cb) => cb({ token: localStorage.getItem('token') })
 });
 
+// Reconnect with the current token (e.g. right after logging in)
+export const reconnectSocket = () => {
+    socket.disconnect().connect();
+};
+
 export default socket;
@@ -1,7 +1,7 @@
 import { Outlet, Link, useLocation } from 'react-router-dom';
 
 import { useState, useEffect } from 'react';
-import socket from '../api/socket';
+import socket, { reconnectSocket } from '../api/socket';
 import api from '../api/client';
 import SeniorColleagueChat from '../components/SeniorColleagueChat';
 
@@ -26,7 +26,9 @@ export default function DashboardLayout() {
     useEffect(() => {
         fetchDay();
 
-        const onNewMessage = () => {
+        // Sent for every new message in any channel (the messages themselves
+        // only go to the channel open on the chat page)
+        const onChannelActivity = () => {
             // Only show dot if we are NOT on the messages page
             if (!location.pathname.startsWith('/messages')) {
                 setHasUnread(true);
@@ -37,11 +39,11 @@ export default function DashboardLayout() {
             setSprintDay(data.current_day);
         };
 
-        socket.on('new_message', onNewMessage);
+        socket.on('channel_activity', onChannelActivity);
         socket.on('sprint_updated', onSprintUpdated);
 
         return () => {
-            socket.off('new_message', onNewMessage);
+            socket.off('channel_activity', onChannelActivity);
             socket.off('sprint_updated', onSprintUpdated);
         };
     }, [location.pathname]);
@@ -65,6 +67,9 @@ export default function DashboardLayout() {
 
     const handleLogout = () => {
         localStorage.removeItem('token');
+        localStorage.removeItem('user');
+        // Drop the previous user's rooms right away
+        reconnectSocket();
         window.location.href = '/login';
     };
 
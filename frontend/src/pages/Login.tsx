@@ -1,6 +1,7 @@
 import { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import api from '../api/client';
+import { reconnectSocket } from '../api/socket';
 import { User, Lock, ArrowRight, UserPlus } from 'lucide-react';
 
 export default function Login() {
@@ -23,6 +24,7 @@ export default function Login() {
       if (res.data.access_token) {
         localStorage.setItem('token', res.data.access_token);
         localStorage.setItem('user', JSON.stringify(res.data.user));
+        reconnectSocket();
         navigate('/');
       }
     } catch (err: any) {
@@ -1,7 +1,7 @@
 import { useState, useEffect, useRef } from 'react';
 import { useParams, NavLink } from 'react-router-dom';
 import api from '../api/client';
-import { Send, Hash, Users } from 'lucide-react';
+import { Send, Hash, Users, Search, X } from 'lucide-react';
 import socket from '../api/socket';
 
 interface Message {
@@ -12,20 +12,53 @@ interface Message {
     timestamp: string;
     is_bot: boolean;
     sender_avatar: string | null;
+    stream_id?: string;
 }
 
+// A chunk of a teammate's reply that is still being generated
+interface MessageDelta {
+    stream_id: string;
+    channel: string;
+    delta: string;
+    sender_name: string;
+    sender_avatar: string | null;
+    is_bot: boolean;
+    aborted?: boolean;
+}
+
+interface SearchHit extends Message {
+    rank: number;
+}
+
+// History is paged: the newest page on open, older pages on demand
+const PAGE_SIZE = 50;
+
 export default function Messages() {
     const { channel = 'general' } = useParams();
     const [messages, setMessages] = useState<Message[]>([]);
+    // Replies being streamed, by stream_id; replaced by their new_message when done
+    const [drafts, setDrafts] = useState<Record<string, Message>>({});
     const [input, setInput] = useState('');
+    const [hasOlder, setHasOlder] = useState(false);
+    const [loadingOlder, setLoadingOlder] = useState(false);
+    const [query, setQuery] = useState('');
+    // Search results for the channel (null when not searching) and the offset of the next page
+    const [results, setResults] = useState<SearchHit[] | null>(null);
+    const [nextOffset, setNextOffset] = useState<number | null>(null);
     const isInitialLoad = useRef(true);
+    // scrollHeight before older messages were prepended, to keep the view in place
+    const prependHeight = useRef<number | null>(null);
     const messagesEndRef = useRef<HTMLDivElement>(null);
+    const listRef = useRef<HTMLDivElement>(null);
 
     useEffect(() => {
         isInitialLoad.current = true;
+        setDrafts({});
+        setResults(null);
+        setQuery('');
         const fetchMessages = async () => {
             try {
-                const res = await api.get(`/messages/${channel}`);
+                const res = await api.get(`/messages/${channel}`, { params: { limit: PAGE_SIZE } });
 
                 // If this is the general channel and there are no messages, add HR welcome
                 if (channel === 'general' && res.data.length === 0) {
@@ -46,6 +79,7 @@ export default function Messages() {
                 }
 
                 setMessages(res.data);
+                setHasOlder(res.data.length === PAGE_SIZE);
             } catch (error) {
                 console.log("Error fetching messages", error);
             }
@@ -56,16 +90,60 @@ export default function Messages() {
 
 
         // Socket Listener
+        const dropDraft = (streamId: string) => {
+            setDrafts(prev => {
+                const { [streamId]: _done, ...rest } = prev;
+                return rest;
+            });
+        };
+
         const onNewMessage = (msg: Message) => {
             if (msg.channel === channel) {
+                if (msg.stream_id) dropDraft(msg.stream_id);
                 setMessages(prev => [...prev, msg]);
             }
         };
 
+        const onMessageDelta = (chunk: MessageDelta) => {
+            if (chunk.channel !== channel) return;
+            if (chunk.aborted) {
+                dropDraft(chunk.stream_id);
+                return;
+            }
+            setDrafts(prev => {
+                const draft = prev[chunk.stream_id];
+                return {
+                    ...prev,
+                    [chunk.stream_id]: draft
+                        ? { ...draft, content: draft.content + chunk.delta }
+                        : {
+                            id: -1,
+                            channel: chunk.channel,
+                            content: chunk.delta,
+                            sender_name: chunk.sender_name,
+                            sender_avatar: chunk.sender_avatar,
+                            is_bot: chunk.is_bot,
+                            timestamp: new Date().toISOString(),
+                            stream_id: chunk.stream_id
+                        }
+                };
+            });
+        };
+
+        // The server only sends a channel's messages to sockets subscribed to
+        // it; rooms are lost on reconnect, so subscribe again every time
+        const subscribe = () => socket.emit('subscribe', { channel });
+
         socket.on('new_message', onNewMessage);
+        socket.on('message_delta', onMessageDelta);
+        socket.on('connect', subscribe);
+        subscribe();
 
         return () => {
+            socket.emit('unsubscribe', { channel });
             socket.off('new_message', onNewMessage);
+            socket.off('message_delta', onMessageDelta);
+            socket.off('connect', subscribe);
         };
     }, [channel]);
 
@@ -74,6 +152,11 @@ export default function Messages() {
     };
 
     useEffect(() => {
+        if (prependHeight.current !== null && listRef.current) {
+            listRef.current.scrollTop += listRef.current.scrollHeight - prependHeight.current;
+            prependHeight.current = null;
+            return;
+        }
         if (messages.length > 0) {
             if (isInitialLoad.current) {
                 scrollToBottom("auto");
@@ -84,8 +167,43 @@ export default function Messages() {
         }
     }, [messages]);
 
+    useEffect(() => {
+        if (Object.keys(drafts).length > 0) scrollToBottom("auto");
+    }, [drafts]);
+
 
 
+    const loadOlder = async () => {
+        if (!messages.length || loadingOlder) return;
+        setLoadingOlder(true);
+        try {
+            const res = await api.get(`/messages/${channel}`, { params: { before: messages[0].id, limit: PAGE_SIZE } });
+            prependHeight.current = listRef.current?.scrollHeight ?? null;
+            setMessages(prev => [...res.data, ...prev]);
+            setHasOlder(res.data.length === PAGE_SIZE);
+        } catch (error) {
+            console.error("Failed to load older messages", error);
+        } finally {
+            setLoadingOlder(false);
+        }
+    };
+
+    const search = async (offset = 0) => {
+        if (!query.trim()) return;
+        try {
+            const res = await api.get('/messages/search', { params: { q: query, channel, offset } });
+            setResults(prev => offset > 0 && prev ? [...prev, ...res.data.results] : res.data.results);
+            setNextOffset(res.data.next_offset);
+        } catch (error) {
+            console.error("Search failed", error);
+        }
+    };
+
+    const clearSearch = () => {
+        setResults(null);
+        setQuery('');
+    };
+
     const sendMessage = async (e: React.FormEvent) => {
         e.preventDefault();
         if (!input.trim()) return;
@@ -131,16 +249,60 @@ export default function Messages() {
 
             {/* Chat Area */}
             <div className="flex-1 flex flex-col">
-                <div className="p-4 border-b border-gray-700 bg-gray-900 shadow-sm z-10">
+                <div className="p-4 border-b border-gray-700 bg-gray-900 shadow-sm z-10 flex items-center justify-between">
                     <h3 className="font-bold text-white flex items-center">
                         <Hash className="w-5 h-5 mr-2 text-gray-400" />
                         {channel}
                     </h3>
+                    <form onSubmit={(e) => { e.preventDefault(); search(); }} className="relative">
+                        <Search className="w-4 h-4 absolute left-2 top-2 text-gray-500" />
+                        <input
+                            type="text"
+                            value={query}
+                            onChange={(e) => setQuery(e.target.value)}
+                            placeholder={`Search #${channel}`}
+                            className="bg-gray-800 border-none rounded-md py-1.5 pl-8 pr-8 text-sm text-white placeholder-gray-500 focus:ring-1 focus:ring-blue-500"
+                        />
+                        {results !== null && (
+                            <button type="button" onClick={clearSearch} className="absolute right-2 top-2 text-gray-500 hover:text-white">
+                                <X className="w-4 h-4" />
+                            </button>
+                        )}
+                    </form>
                 </div>
 
-                <div className="flex-1 overflow-y-auto p-4 space-y-4">
-                    {messages.map((msg) => (
-                        <div key={msg.id} className="flex items-start group">
+                {results !== null && (
+                    <div className="max-h-[50%] overflow-y-auto p-4 space-y-3 border-b border-gray-700 bg-gray-800/30">
+                        <p className="text-xs text-gray-400">{results.length === 0 ? 'No messages found' : `Results for "${query}"`}</p>
+                        {results.map((hit) => (
+                            <div key={hit.id} className="text-sm">
+                                <span className="font-medium text-white mr-2">{hit.sender_name}</span>
+                                <span className="text-xs text-gray-400">{new Date(hit.timestamp).toLocaleString()}</span>
+                                <p className="text-gray-300 mt-0.5">{hit.content}</p>
+                            </div>
+                        ))}
+                        {nextOffset !== null && (
+                            <button onClick={() => search(nextOffset)} className="text-xs text-gray-400 hover:text-white px-3 py-1 rounded-md bg-gray-800">
+                                More results
+                            </button>
+                        )}
+                    </div>
+                )}
+
+                <div ref={listRef} className="flex-1 overflow-y-auto p-4 space-y-4">
+                    {hasOlder && (
+                        <div className="flex justify-center">
+                            <button
+                                onClick={loadOlder}
+                                disabled={loadingOlder}
+                                className="text-xs text-gray-400 hover:text-white px-3 py-1 rounded-md bg-gray-800 disabled:opacity-50"
+                            >
+                                {loadingOlder ? 'Loading...' : 'Load older messages'}
+                            </button>
+                        </div>
+                    )}
+                    {[...messages, ...Object.values(drafts)].map((msg) => (
+                        <div key={msg.id === -1 ? msg.stream_id : msg.id} className="flex items-start group">
                             {msg.sender_avatar ? (
                                 <img src={msg.sender_avatar} alt={msg.sender_name} className="w-10 h-10 rounded-full object-cover mr-3 bg-gray-700" />
                             ) : (
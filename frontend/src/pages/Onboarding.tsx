@@ -1,5 +1,6 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import api from '../api/client';
+import { waitForJob, type Job } from '../api/jobs';
 import { CheckCircle, Circle, Sparkles, Loader2 } from 'lucide-react';
 
 interface Task {
@@ -12,6 +13,7 @@ interface Task {
 export default function Onboarding() {
     const [tasks, setTasks] = useState<Task[]>([]);
     const [loading, setLoading] = useState(false);
+    const [jobStage, setJobStage] = useState('');
     const [projectDescription, setProjectDescription] = useState('');
     const [generatedResult, setGeneratedResult] = useState<{
         repo_url?: string;
@@ -24,6 +26,7 @@ export default function Onboarding() {
     const [backendStack, setBackendStack] = useState('Python Flask');
     const [frontendStack, setFrontendStack] = useState('React');
     const [githubUsername, setGithubUsername] = useState('');
+    const submission = useRef<{ key: string; body: string } | null>(null);
 
     useEffect(() => {
         const fetchTasks = async () => {
@@ -58,20 +61,39 @@ export default function Onboarding() {
             }
             const user = JSON.parse(userJson);
 
-            const res = await api.post(`/onboarding/generate-repo?user_id=${user.id}`, {
+            const body = {
                 project_description: projectDescription,
                 backend_stack: backendStack,
                 frontend_stack: frontendStack,
                 github_username: githubUsername || null
+            };
+            // One key per submission, reused when the same form is resent after the POST
+            // failed (so a request that did reach the server isn't run twice)
+            const bodyJson = JSON.stringify(body);
+            if (!submission.current || submission.current.body !== bodyJson) {
+                submission.current = { key: crypto.randomUUID(), body: bodyJson };
+            }
+            const res = await api.post(`/onboarding/generate-repo?user_id=${user.id}`, body, {
+                headers: { 'Idempotency-Key': submission.current.key }
             });
+            // Accepted: the next click is a new submission, even if this job fails
+            submission.current = null;
+
+            // Generation runs as a background job: show live stages until it finishes
+            let job: Job;
+            try {
+                job = await waitForJob(`/onboarding/jobs/${res.data.job_id}?user_id=${user.id}`, res.data, setJobStage);
+            } finally {
+                setJobStage('');
+            }
 
             setGeneratedResult({
-                repo_url: res.data.repo_url,
-                project_name: res.data.project_name,
-                tickets_created: res.data.tickets_created,
-                is_fallback: res.data.is_fallback,
-                invite_status: res.data.invite_status,
-                github_username: res.data.github_username
+                repo_url: job.result.repo_url,
+                project_name: job.result.project_name,
+                tickets_created: job.result.tickets_created,
+                is_fallback: job.result.is_fallback,
+                invite_status: job.result.invite_status,
+                github_username: job.result.github_username
             });
 
             // Reset checklist tasks locally
@@ -80,7 +102,7 @@ export default function Onboarding() {
             // eslint-disable-next-line @typescript-eslint/no-explicit-any
         } catch (e: any) {
             console.error(e);
-            const detail = e.response?.data?.detail || "Failed to generate repo";
+            const detail = e.response?.data?.detail || e.message || "Failed to generate repo";
             alert(detail);
         } finally {
             setLoading(false);
@@ -224,7 +246,7 @@ export default function Onboarding() {
                             {loading ? (
                                 <>
                                     <Loader2 className="w-5 h-5 animate-spin" />
-                                    <span>Building your project...</span>
+                                    <span>Building your project...{jobStage && ` (${jobStage.replace(/_/g, ' ')})`}</span>
                                 </>
                             ) : (
                                 <>
@@ -113,8 +113,9 @@ export default function Overview() {
     useEffect(() => {
         fetchStats();
 
+        // Only the changed stats are sent; until fetchStats has loaded the rest, it covers them
         const onStatsUpdate = (data: Partial<UserStats>) => {
-            setStats(prev => prev ? { ...prev, ...data } : data as UserStats);
+            setStats(prev => prev ? { ...prev, ...data } : prev);
         };
 
         const onLevelUp = (data: unknown) => {
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import api from '../api/client';
+import { waitForJob } from '../api/jobs';
 
 export default function SprintReview() {
     const [file, setFile] = useState<File | null>(null);
@@ -59,7 +60,9 @@ export default function SprintReview() {
                     'Content-Type': 'multipart/form-data',
                 },
             });
-            setReport(response.data.report);
+            // Analysis runs in the background; the report is pushed when ready
+            const job = await waitForJob(`/features/jobs/${response.data.job_id}?user_id=${userData.id}`, response.data);
+            setReport(job.result.report);
             fetchHistory();
         } catch (error) {
             console.error("Analysis failed:", error);
@@ -1,6 +1,7 @@
 import { useState, useRef, useEffect } from 'react';
 import { Mic, Play, Square, User as UserIcon, Loader } from 'lucide-react';
 import api from '../api/client';
+import { waitForJob } from '../api/jobs';
 
 export default function StandupMeeting() {
     const [step, setStep] = useState<'waiting' | 'coworker' | 'user' | 'done'>('waiting');
@@ -90,7 +91,9 @@ export default function StandupMeeting() {
 
         try {
             const res = await api.post(`/features/standups/upload?user_id=${user.id}`, formData);
-            setTranscript(res.data.transcript);
+            // Transcription runs in the background; the result is pushed when ready
+            const job = await waitForJob(`/features/jobs/${res.data.job_id}?user_id=${user.id}`, res.data);
+            setTranscript(job.result.transcript);
             setStep('done');
         } catch (error) {
             console.error("Upload failed", error);